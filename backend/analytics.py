@@ -0,0 +1,218 @@
+"""Vectorized mood analytics.
+
+Mood entries are projected into parallel NumPy arrays once per request, and every
+statistic (trend labels, daily and weekly means, rolling averages, volatility,
+trigger histograms, day x trigger cells, correlations) is computed on those
+columns instead of looping over documents in Python.
+"""
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+def _naive_utc(value) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _to_datetime64(value) -> np.datetime64:
+    if isinstance(value, datetime):
+        return np.datetime64(_naive_utc(value), "s")
+    if not isinstance(value, str):
+        return np.datetime64("NaT", "s")
+    try:
+        return np.datetime64(value[:19], "s")
+    except ValueError:
+        return np.datetime64("NaT", "s")
+
+
+def to_datetime64(values: Sequence) -> np.ndarray:
+    """Convert UTC ISO strings and/or datetimes to a datetime64[s] array; anything else becomes NaT"""
+    if all(isinstance(value, str) for value in values):
+        # Writers store UTC isoformat, so the first 19 characters are the UTC wall time
+        try:
+            return np.array(values, dtype="U19").astype("datetime64[s]")
+        except ValueError:
+            pass
+    return np.array([_to_datetime64(value) for value in values], dtype="datetime64[s]")
+
+
+def week_start(days: np.ndarray) -> np.ndarray:
+    """Monday of the week for each datetime64[D] value"""
+    # 1970-01-01 was a Thursday, so shifting by 3 makes Monday weekday 0
+    return days - (days.astype(np.int64) + 3) % 7
+
+
+def _round(value: float, digits: int = 2) -> Optional[float]:
+    return None if np.isnan(value) else round(float(value), digits)
+
+
+class MoodColumns:
+    """Projected mood entry fields as parallel arrays, in the order they were loaded"""
+
+    def __init__(self, timestamps: np.ndarray, emotions: np.ndarray, triggers: np.ndarray, levels: Dict[str, np.ndarray]):
+        self.timestamps = timestamps
+        self.emotions = emotions
+        self.triggers = triggers
+        self.levels = levels
+
+    @classmethod
+    def from_docs(cls, docs: List[dict], level_fields: Sequence[str],
+                  normalize_trigger: Optional[Callable[[str], str]] = None) -> "MoodColumns":
+        normalize = normalize_trigger or (lambda text: (text or "").lower().strip())
+        timestamps = to_datetime64([doc.get("timestamp") for doc in docs])
+        # Legacy rows without a usable timestamp cannot be placed in time, so they are left out
+        dated = ~np.isnat(timestamps)
+        if not dated.all():
+            docs = [doc for doc, keep in zip(docs, dated) if keep]
+            timestamps = timestamps[dated]
+        return cls(
+            timestamps=timestamps,
+            emotions=np.array([doc.get("emotion") or "" for doc in docs], dtype=object),
+            triggers=np.array([normalize(doc.get("trigger")) for doc in docs], dtype=object),
+            levels={field: np.array([doc.get(field, 0) for doc in docs], dtype=np.float64) for field in level_fields}
+        )
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    @property
+    def days(self) -> np.ndarray:
+        return self.timestamps.astype("datetime64[D]")
+
+    def trend_labels(self) -> List[str]:
+        """'YYYY-MM-DD HH:MM' label for every entry"""
+        # np.char reduces over the array to size its output, which fails when empty
+        if not len(self):
+            return []
+        labels = np.datetime_as_string(self.timestamps, unit="m")
+        return np.char.replace(labels, "T", " ").tolist()
+
+    def grouped_means(self, keys: np.ndarray) -> tuple:
+        """(unique keys ascending, entry counts, {field: mean}) grouped by the given key array"""
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, minlength=len(unique_keys))
+        means = {
+            field: np.bincount(inverse, weights=values, minlength=len(unique_keys)) / counts
+            for field, values in self.levels.items()
+        }
+        return unique_keys, counts, means
+
+    def daily_means(self) -> List[dict]:
+        """Newest-first per-day entry counts, level means and most frequent emotion (ties alphabetical)"""
+        if not len(self):
+            return []
+        days, counts, means = self.grouped_means(self.days)
+        emotions, emotion_index = np.unique(self.emotions.astype(str), return_inverse=True)
+        histogram = np.zeros((len(days), len(emotions)), dtype=np.int64)
+        np.add.at(histogram, (np.searchsorted(days, self.days), emotion_index), 1)
+        dominant = emotions[histogram.argmax(axis=1)]
+        return [
+            {
+                "date": str(days[i]),
+                "entries_count": int(counts[i]),
+                "emotion": str(dominant[i]),
+                **{field: float(means[field][i]) for field in self.levels}
+            }
+            for i in range(len(days) - 1, -1, -1)
+        ]
+
+    def weekly_means(self, weeks: int) -> List[dict]:
+        """Newest-first per-week entry counts and level means, weeks starting Monday"""
+        if not len(self):
+            return []
+        starts, counts, means = self.grouped_means(week_start(self.days))
+        return [
+            {
+                "week": str(starts[i]),
+                "entries_count": int(counts[i]),
+                **{field: _round(means[field][i]) for field in self.levels}
+            }
+            for i in range(len(starts) - 1, max(len(starts) - weeks, 0) - 1, -1)
+        ]
+
+    def rolling(self, window: int, points: int) -> List[dict]:
+        """Trailing `window`-day entry-weighted mean and standard deviation, one row per calendar day"""
+        if not len(self):
+            return []
+        days = self.days
+        first = days.min()
+        offsets = (days - first).astype(np.int64)
+        span = int(offsets.max()) + 1
+
+        def windowed(weights=None) -> np.ndarray:
+            daily = np.bincount(offsets, weights=weights, minlength=span)
+            cumulative = np.concatenate(([0.0], np.cumsum(daily)))
+            lower = np.maximum(np.arange(1, span + 1) - window, 0)
+            return cumulative[1:] - cumulative[lower]
+
+        counts = windowed()
+        start = max(span - points, 0)
+        rows = {"date": np.datetime_as_string(first + np.arange(start, span), unit="D").tolist(),
+                "entries_count": counts[start:].astype(np.int64).tolist()}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            for field, values in self.levels.items():
+                mean = windowed(values) / counts
+                variance = np.maximum(windowed(values * values) / counts - mean * mean, 0.0)
+                rows[f"{field}_mean"] = [_round(v) for v in mean[start:]]
+                rows[f"{field}_volatility"] = [_round(v) for v in np.sqrt(variance)[start:]]
+        return [dict(zip(rows, values)) for values in zip(*rows.values())]
+
+    def trigger_histogram(self, top: int) -> List[dict]:
+        """Most frequent non-empty triggers with their emotion counts, ties in first-seen order"""
+        mask = self.triggers != ""
+        if not mask.any():
+            return []
+        triggers, first_seen, trigger_index, trigger_counts = np.unique(
+            self.triggers[mask].astype(str), return_index=True, return_inverse=True, return_counts=True
+        )
+        emotions, emotion_index = np.unique(self.emotions[mask].astype(str), return_inverse=True)
+        histogram = np.zeros((len(triggers), len(emotions)), dtype=np.int64)
+        np.add.at(histogram, (trigger_index, emotion_index), 1)
+
+        order = np.lexsort((first_seen, -trigger_counts))[:top]
+        return [
+            {
+                "trigger": str(triggers[t]),
+                "count": int(trigger_counts[t]),
+                "emotions": {str(emotions[e]): int(histogram[t, e]) for e in np.flatnonzero(histogram[t])}
+            }
+            for t in order
+        ]
+
+    def trigger_day_cells(self, intensity_field: str) -> List[tuple]:
+        """(day, trigger, count, intensity sum, {emotion: count}) for every day x non-empty trigger pair"""
+        mask = self.triggers != ""
+        if not mask.any():
+            return []
+        days, day_index = np.unique(self.days[mask], return_inverse=True)
+        triggers, trigger_index = np.unique(self.triggers[mask].astype(str), return_inverse=True)
+        emotions, emotion_index = np.unique(self.emotions[mask].astype(str), return_inverse=True)
+
+        cells, cell_index, counts = np.unique(
+            day_index * len(triggers) + trigger_index, return_inverse=True, return_counts=True
+        )
+        intensity = np.bincount(cell_index, weights=self.levels[intensity_field][mask], minlength=len(cells))
+        histogram = np.zeros((len(cells), len(emotions)), dtype=np.int64)
+        np.add.at(histogram, (cell_index, emotion_index), 1)
+        return [
+            (
+                str(days[cell // len(triggers)]),
+                str(triggers[cell % len(triggers)]),
+                int(counts[i]),
+                float(intensity[i]),
+                {str(emotions[e]): int(histogram[i, e]) for e in np.flatnonzero(histogram[i])}
+            )
+            for i, cell in enumerate(cells)
+        ]
+
+    def correlations(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """Pearson correlations between level fields; None where a field never varies"""
+        fields = list(self.levels)
+        if len(self) < 2:
+            return {a: {b: None for b in fields} for a in fields}
+        with np.errstate(invalid="ignore", divide="ignore"):
+            matrix = np.corrcoef(np.vstack([self.levels[field] for field in fields]))
+        return {a: {b: _round(matrix[i, j], 3) for j, b in enumerate(fields)} for i, a in enumerate(fields)}
@@ -0,0 +1,92 @@
+"""Maintenance commands for the Mood Sync backend.
+
+Usage:
+    python manage.py rebuild-rollups [--user-id USER_ID]
+    python manage.py rebuild-trigger-index [--user-id USER_ID]
+    python manage.py migrate-dates [--batch-size N] [--pause SECONDS]
+    python manage.py profile-imports [--llm] [--top N]
+"""
+import argparse
+import asyncio
+import subprocess
+import sys
+from pathlib import Path
+
+import server
+
+
+async def rebuild_rollups(args):
+    totals = await server.rebuild_rollups(args.user_id)
+    print(f"Rebuilt rollups for {totals['users']} users "
+          f"({totals['mood_entries']} mood entries, {totals['lifestyle_assessments']} lifestyle assessments)")
+
+
+async def rebuild_trigger_index(args):
+    totals = await server.rebuild_trigger_index(args.user_id)
+    print(f"Rebuilt trigger index for {totals['users']} users ({totals['terms']} terms)")
+
+
+async def migrate_dates(args):
+    totals = await server.migrate_dates(args.batch_size, args.pause)
+    for field, counts in totals.items():
+        print(f"{field}: {counts['converted']} converted, {counts['skipped']} unparseable")
+
+
+async def profile_imports(args):
+    # A fresh interpreter, so modules already imported by this process don't hide their cost
+    code = "import server" + ("; server.load_llm_client()" if args.llm else "")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=Path(__file__).parent, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        print(result.stderr.splitlines()[-1] if result.stderr else "Import failed")
+        sys.exit(result.returncode)
+
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), int(self_us), name.rstrip()))
+
+    total = sum(cumulative for cumulative, _, name in rows if not name.startswith("  "))
+    print(f"Imported {len(rows)} modules in {total / 1e6:.3f}s")
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for cumulative, self_time, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"{cumulative / 1000:>14.1f} {self_time / 1000:>9.1f}  {name.strip()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mood Sync maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    rollups_parser = subparsers.add_parser("rebuild-rollups", help="Backfill per-user rollups from raw entries")
+    rollups_parser.add_argument("--user-id", help="Only rebuild rollups for this user")
+    rollups_parser.set_defaults(handler=rebuild_rollups)
+
+    triggers_parser = subparsers.add_parser("rebuild-trigger-index", help="Backfill the per-user trigger index")
+    triggers_parser.add_argument("--user-id", help="Only rebuild the index for this user")
+    triggers_parser.set_defaults(handler=rebuild_trigger_index)
+
+    dates_parser = subparsers.add_parser("migrate-dates", help="Convert ISO string dates to native BSON dates")
+    dates_parser.add_argument("--batch-size", type=int, default=server.DATE_MIGRATION_BATCH_SIZE,
+                              help="Documents converted per batch")
+    dates_parser.add_argument("--pause", type=float, default=server.DATE_MIGRATION_PAUSE_SECONDS,
+                              help="Seconds to sleep between batches")
+    dates_parser.set_defaults(handler=migrate_dates)
+
+    imports_parser = subparsers.add_parser("profile-imports", help="Show the slowest imports when loading the server")
+    imports_parser.add_argument("--llm", action="store_true", help="Also import the deferred LLM client")
+    imports_parser.add_argument("--top", type=int, default=25, help="Number of modules to list")
+    imports_parser.set_defaults(handler=profile_imports)
+
+    args = parser.parse_args()
+    try:
+        asyncio.run(args.handler(args))
+    finally:
+        server.client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,44 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Request
+import time
+MODULE_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.datastructures import Headers, MutableHeaders
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, IndexModel, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import BulkWriteError
+from pymongo.write_concern import WriteConcern
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+from pydantic import ValidationError
 import os
+import sys
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional
 import uuid
-from datetime import datetime, timezone
-from emergentintegrations.llm.chat import LlmChat, UserMessage
+import asyncio
+import base64
+import csv
+import gzip
+import hashlib
+import hmac
+import importlib
+import io
+import json
+import math
+import re
+import secrets
+import threading
+import unicodedata
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone, timedelta
+from analytics import MoodColumns
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -18,7 +47,247 @@ load_dotenv(ROOT_DIR / '.env')
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# MongoDB connection with error handling
+# Metrics
+# A small in-process registry rendered in the Prometheus text exposition format
+# on /metrics. Updates take a lock because Mongo command events arrive on
+# driver threads.
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+def _escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape_label_value(value)}"' for key, value in labels) + "}"
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class MetricsRegistry:
+    """Counters, gauges and histograms keyed by sorted label tuples"""
+
+    def __init__(self):
+        self.families: Dict[str, dict] = {}
+        self.collectors: List = []
+        self.lock = threading.Lock()
+
+    def _declare(self, name: str, kind: str, help_text: str, buckets: tuple = ()):
+        self.families[name] = {"kind": kind, "help": help_text, "buckets": buckets, "series": {}}
+
+    def counter(self, name: str, help_text: str):
+        self._declare(name, "counter", help_text)
+
+    def gauge(self, name: str, help_text: str):
+        self._declare(name, "gauge", help_text)
+
+    def histogram(self, name: str, help_text: str, buckets: tuple = DEFAULT_LATENCY_BUCKETS):
+        self._declare(name, "histogram", help_text, buckets)
+
+    def add_collector(self, collector):
+        """Register a callable that refreshes gauges right before each scrape"""
+        self.collectors.append(collector)
+
+    def inc(self, name: str, amount: float = 1.0, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            series = self.families[name]["series"]
+            series[key] = series.get(key, 0.0) + amount
+
+    def set(self, name: str, value: float, **labels):
+        with self.lock:
+            self.families[name]["series"][tuple(sorted(labels.items()))] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            family = self.families[name]
+            state = family["series"].get(key)
+            if state is None:
+                state = family["series"][key] = {"buckets": [0] * len(family["buckets"]), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(family["buckets"]):
+                if value <= bound:
+                    state["buckets"][index] += 1
+            state["sum"] += value
+            state["count"] += 1
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            try:
+                collector()
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {str(e)}")
+        
+        lines = []
+        with self.lock:
+            for name, family in self.families.items():
+                lines.append(f"# HELP {name} {family['help']}")
+                lines.append(f"# TYPE {name} {family['kind']}")
+                for labels, value in family["series"].items():
+                    if family["kind"] != "histogram":
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                        continue
+                    for bound, count in zip(family["buckets"], value["buckets"]):
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', bound),))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {value['count']}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value['sum'])}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {value['count']}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+metrics.histogram("http_request_duration_seconds", "HTTP request latency by route")
+metrics.histogram("mongo_command_duration_seconds", "MongoDB command latency by collection and operation")
+metrics.counter("mongo_command_failures_total", "Failed MongoDB commands by collection and operation")
+metrics.histogram("llm_request_duration_seconds", "LLM guidance request latency by outcome")
+metrics.counter("llm_timeouts_total", "LLM guidance requests that timed out")
+metrics.counter("llm_fallbacks_total", "Mood submissions served the canned fallback guidance")
+metrics.gauge("event_loop_lag_last_seconds", "Most recent event loop scheduling delay")
+metrics.histogram("event_loop_lag_seconds", "Event loop scheduling delay", (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every MongoDB command by collection and operation"""
+
+    def __init__(self):
+        self.in_flight: Dict[int, tuple] = {}
+
+    def started(self, event):
+        # Most commands name their collection as the command's value; getMore's value is the cursor id
+        field = "collection" if event.command_name == "getMore" else event.command_name
+        collection = event.command.get(field)
+        if not isinstance(collection, str):
+            collection = "unknown"
+        self.in_flight[event.request_id] = (collection, event.command_name)
+
+    def _finish(self, event, failed: bool):
+        collection, operation = self.in_flight.pop(event.request_id, ("unknown", event.command_name))
+        metrics.observe("mongo_command_duration_seconds", event.duration_micros / 1e6,
+                        collection=collection, operation=operation)
+        if failed:
+            metrics.inc("mongo_command_failures_total", collection=collection, operation=operation)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+metrics.histogram("mongo_pool_checkout_wait_seconds", "Time spent waiting to check a connection out of the pool",
+                  (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+metrics.counter("mongo_pool_checkout_failures_total", "Failed connection checkouts by server and reason")
+metrics.gauge("mongo_pool_connections", "Pooled connections by server and state (open, checked_out)")
+metrics.counter("mongo_pool_cleared_total", "Times a server's connection pool was cleared")
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Tracks pool size, checked-out connections and checkout wait time per server"""
+
+    def __init__(self):
+        # Checkout events fire synchronously on the driver thread doing the checkout
+        self.local = threading.local()
+
+    @staticmethod
+    def _server(event) -> str:
+        return "%s:%s" % event.address
+
+    def connection_check_out_started(self, event):
+        self.local.started = time.perf_counter()
+
+    def _finish_checkout(self):
+        started = getattr(self.local, "started", None)
+        self.local.started = None
+        return time.perf_counter() - started if started is not None else None
+
+    def connection_checked_out(self, event):
+        waited = self._finish_checkout()
+        if waited is not None:
+            metrics.observe("mongo_pool_checkout_wait_seconds", waited, server=self._server(event))
+        metrics.inc("mongo_pool_connections", 1, server=self._server(event), state="checked_out")
+
+    def connection_check_out_failed(self, event):
+        waited = self._finish_checkout()
+        if waited is not None:
+            metrics.observe("mongo_pool_checkout_wait_seconds", waited, server=self._server(event))
+        metrics.inc("mongo_pool_checkout_failures_total", server=self._server(event), reason=event.reason)
+
+    def connection_checked_in(self, event):
+        metrics.inc("mongo_pool_connections", -1, server=self._server(event), state="checked_out")
+
+    def connection_created(self, event):
+        metrics.inc("mongo_pool_connections", 1, server=self._server(event), state="open")
+
+    def connection_closed(self, event):
+        metrics.inc("mongo_pool_connections", -1, server=self._server(event), state="open")
+
+    def pool_cleared(self, event):
+        metrics.inc("mongo_pool_cleared_total", server=self._server(event))
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+EVENT_LOOP_LAG_INTERVAL = 0.5
+
+async def monitor_event_loop_lag():
+    """Measure how late a fixed-interval sleep wakes up"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(EVENT_LOOP_LAG_INTERVAL)
+        lag = max(0.0, loop.time() - started - EVENT_LOOP_LAG_INTERVAL)
+        metrics.set("event_loop_lag_last_seconds", lag)
+        admission.loop_lag = lag
+        metrics.observe("event_loop_lag_seconds", lag)
+
+# MongoDB connection
+# Pool size, timeouts and wire compression come from the environment; unset
+# values keep the driver defaults. Writes and user-facing reads use the
+# primary, while analytics reads (trends, reports, trigger stats) go through
+# analytics_db so they can be served by secondaries.
+MONGO_CLIENT_OPTIONS = {
+    "maxPoolSize": ('MONGO_MAX_POOL_SIZE', int),
+    "minPoolSize": ('MONGO_MIN_POOL_SIZE', int),
+    "maxIdleTimeMS": ('MONGO_MAX_IDLE_TIME_MS', int),
+    "waitQueueTimeoutMS": ('MONGO_WAIT_QUEUE_TIMEOUT_MS', int),
+    "serverSelectionTimeoutMS": ('MONGO_SERVER_SELECTION_TIMEOUT_MS', int),
+    "connectTimeoutMS": ('MONGO_CONNECT_TIMEOUT_MS', int),
+    "socketTimeoutMS": ('MONGO_SOCKET_TIMEOUT_MS', int),
+    # e.g. "zstd,snappy,zlib"; zstd and snappy need the zstandard / python-snappy packages
+    "compressors": ('MONGO_COMPRESSORS', str),
+}
+MONGO_ANALYTICS_READ_PREFERENCE = os.environ.get('MONGO_ANALYTICS_READ_PREFERENCE', 'secondaryPreferred')
+MONGO_ANALYTICS_MAX_STALENESS_SECONDS = int(os.environ.get('MONGO_ANALYTICS_MAX_STALENESS_SECONDS', '-1'))
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+def mongo_client_options() -> dict:
+    options = {}
+    for option, (env_name, parse) in MONGO_CLIENT_OPTIONS.items():
+        value = os.environ.get(env_name)
+        if value:
+            options[option] = parse(value)
+    return options
+
+def analytics_read_preference():
+    mode = READ_PREFERENCES.get(MONGO_ANALYTICS_READ_PREFERENCE)
+    if mode is None:
+        raise ValueError(f"Unknown MONGO_ANALYTICS_READ_PREFERENCE: {MONGO_ANALYTICS_READ_PREFERENCE}")
+    if mode is Primary:
+        return Primary()
+    return mode(max_staleness=MONGO_ANALYTICS_MAX_STALENESS_SECONDS)
+
 try:
     mongo_url = os.environ.get('MONGO_URL')
     db_name = os.environ.get('DB_NAME')
@@ -31,23 +300,454 @@ try:
         logger.warning("DB_NAME not set, using default: test_database")
         db_name = 'test_database'
     
-    client = AsyncIOMotorClient(mongo_url)
+    client_options = mongo_client_options()
+    # tz_aware so native BSON dates come back as UTC-aware datetimes
+    client = AsyncIOMotorClient(
+        mongo_url,
+        tz_aware=True,
+        event_listeners=[MongoCommandMetrics(), MongoPoolMetrics()],
+        **client_options
+    )
     db = client[db_name]
-    logger.info(f"MongoDB client initialized for database: {db_name}")
+    analytics_db = client.get_database(db_name, read_preference=analytics_read_preference())
+    logger.info(f"MongoDB client initialized for database: {db_name} "
+                f"(options: {client_options}, analytics reads: {MONGO_ANALYTICS_READ_PREFERENCE})")
 except Exception as e:
     logger.error(f"Failed to initialize MongoDB: {str(e)}")
     raise
 
+# Response encoding
+# JSON is rendered with orjson when it is installed, and buffered responses
+# larger than COMPRESSION_MIN_BYTES are sent brotli- or gzip-compressed
+# according to Accept-Encoding. Streaming responses (SSE, exports) are passed
+# through untouched so chunks still reach the client as they are produced.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+COMPRESSION_GZIP_LEVEL = int(os.environ.get('COMPRESSION_GZIP_LEVEL', '6'))
+COMPRESSION_BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', '4'))
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when available; also accepts raw Mongo documents"""
+
+    def render(self, content) -> bytes:
+        if orjson is None:
+            return super().render(jsonable_encoder(content))
+        return orjson.dumps(content, option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+def accepted_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred supported content coding ("br" or "gzip") from an Accept-Encoding header"""
+    offered = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        offered[coding.strip()] = quality
+    if brotli is not None and offered.get("br", 0) > 0:
+        return "br"
+    if offered.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.startswith("text/") or "json" in content_type or "javascript" in content_type
+
+class CompressionMiddleware:
+    """Compress fully rendered (Content-Length) response bodies of at least `minimum_size` bytes"""
+
+    def __init__(self, app, minimum_size: int):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = accepted_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        
+        start_message = None
+        chunks: List[bytes] = []
+        
+        async def send_compressed(message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                length = headers.get("content-length")
+                # Streaming responses have no Content-Length and are passed through as they flow
+                if (length is not None and int(length) >= self.minimum_size and "content-encoding" not in headers
+                        and is_compressible(headers.get("content-type", ""))):
+                    start_message = message
+                    return
+                if length is not None:
+                    MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+                await send(message)
+                return
+            if start_message is None or message["type"] != "http.response.body":
+                await send(message)
+                return
+            
+            # Middleware above us may split one rendered body into several messages
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            if encoding == "br":
+                body = brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+            else:
+                body = gzip.compress(body, compresslevel=COMPRESSION_GZIP_LEVEL)
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            # A strong validator promises these exact bytes, which compression just changed
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+        
+        await self.app(scope, receive, send_compressed)
+
+def response_fields(model) -> tuple:
+    """(projection, defaults) that give raw documents the model's serialized shape"""
+    projection = {"_id": 0, **{name: 1 for name in model.model_fields}}
+    defaults = {
+        name: field.default for name, field in model.model_fields.items()
+        if not field.is_required() and field.default_factory is None
+    }
+    return projection, defaults
+
+def with_defaults(docs: List[dict], defaults: dict) -> List[dict]:
+    for doc in docs:
+        for name, value in defaults.items():
+            doc.setdefault(name, value)
+    return docs
+
 # Create the main app without a prefix
-app = FastAPI(title="Mood Sync API", version="1.0.0")
+app = FastAPI(title="Mood Sync API", version="1.0.0", default_response_class=FastJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template so path parameters don't explode cardinality
+        route = request.scope.get("route")
+        metrics.observe(
+            "http_request_duration_seconds", time.perf_counter() - started,
+            method=request.method, route=getattr(route, "path", "unmatched"), status=status
+        )
+
+# Clients that predate session tokens identify themselves with a bare X-User-Id
+# header, which anyone can forge. Only enable this while such clients are still
+# being migrated to bearer tokens.
+ALLOW_USER_ID_HEADER = os.environ.get('ALLOW_USER_ID_HEADER', 'false').lower() == 'true'
+
 # Helper function to get user_id from headers
 def get_user_id_from_header(request) -> Optional[str]:
-    """Extract user_id from X-User-Id header"""
-    return request.headers.get('X-User-Id')
+    """User id from the verified session token, else the legacy X-User-Id header"""
+    identity = getattr(request.state, "identity", None)
+    if identity:
+        return identity["sub"]
+    if ALLOW_USER_ID_HEADER:
+        return request.headers.get('X-User-Id')
+    return None
+
+async def get_user_name(request, user_id: Optional[str]) -> Optional[str]:
+    """Display name carried by the session token, looked up only for legacy callers"""
+    identity = getattr(request.state, "identity", None)
+    if identity and identity["sub"] == user_id:
+        return identity.get("name")
+    if not user_id:
+        return None
+    user = await db.users.find_one({"id": user_id}, {"_id": 0, "name": 1})
+    return user.get("name") if user else None
+
+# Rate limiting and admission control
+# Every caller (user id from a verified session token, else client IP) gets a
+# token bucket refilled at RATE_LIMIT_RATE tokens per second up to
+# RATE_LIMIT_BURST, and each request spends its route's cost: an LLM-backed
+# submit costs far more than a history read, and a batch submit pays that cost
+# once per entry. The bare X-User-Id header is never used as a key because any
+# client can pick its value. Behind a reverse proxy the client IP is taken from
+# X-Forwarded-For, RATE_LIMIT_PROXY_HOPS entries from the right: the address
+# the outermost trusted proxy saw, which the client cannot forge. The default
+# of 1 matches the Kubernetes ingress; set it to 0 when clients connect
+# directly, or unauthenticated signups and logins from one address could spread
+# over many buckets. Buckets live in process memory
+# unless RATE_LIMIT_BACKEND=mongo, which keeps them in the shared `rate_limits`
+# collection so all replicas enforce one budget. Separately, admission control
+# sheds work with 503 while too many requests or LLM calls are in flight or the
+# event loop is lagging, so well-behaved callers keep their latency.
+RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory').lower()
+RATE_LIMIT_RATE = float(os.environ.get('RATE_LIMIT_RATE', '5'))
+RATE_LIMIT_BURST = float(os.environ.get('RATE_LIMIT_BURST', '300'))
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '10000'))
+# Reverse proxies in front of the server that append to X-Forwarded-For
+RATE_LIMIT_PROXY_HOPS = int(os.environ.get('RATE_LIMIT_PROXY_HOPS', '1'))
+# Zero disables a threshold
+ADMISSION_MAX_IN_FLIGHT = int(os.environ.get('ADMISSION_MAX_IN_FLIGHT', '0'))
+ADMISSION_MAX_LLM_IN_FLIGHT = int(os.environ.get('ADMISSION_MAX_LLM_IN_FLIGHT', '32'))
+ADMISSION_MAX_EVENT_LOOP_LAG_SECONDS = float(os.environ.get('ADMISSION_MAX_EVENT_LOOP_LAG_SECONDS', '0.5'))
+
+# Probes, scrapes and CORS preflights are never limited
+RATE_LIMIT_EXEMPT_PATHS = {"/health", "/healthz", "/metrics"}
+RATE_LIMIT_DEFAULT_COST = 1.0
+
+# "METHOD path": (cost, whether the route calls the LLM). With the defaults a
+# caller can make 30 check-ins back to back and one more every two seconds.
+ROUTE_COSTS = {
+    "POST /api/mood/submit": (10.0, True),
+    "POST /api/mood/submit/stream": (10.0, True),
+    # Per entry: the route is charged for one up front and for the rest once parsed
+    "POST /api/mood/submit/batch": (10.0, True),
+    "GET /api/mood/trends": (2.0, False),
+    "GET /api/mood/analytics": (5.0, False),
+    "GET /api/mood/trigger-insights": (2.0, False),
+    "GET /api/mood/trigger-heatmap": (5.0, False),
+    "GET /api/lifestyle/weekly-report": (2.0, False),
+    "GET /api/user/export": (20.0, False),
+    "DELETE /api/user/data": (10.0, False),
+    "POST /api/auth/signup": (10.0, False),
+    "POST /api/auth/login": (10.0, False),
+}
+
+def parse_route_costs(value: str) -> Dict[str, float]:
+    """Overrides like "POST /api/mood/submit=30,GET /api/mood/trends=1" """
+    costs = {}
+    for item in value.split(','):
+        route, _, cost = item.rpartition('=')
+        if route.strip():
+            costs[route.strip()] = float(cost)
+    return costs
+
+for _route, _cost in parse_route_costs(os.environ.get('RATE_LIMIT_ROUTE_COSTS', '')).items():
+    ROUTE_COSTS[_route] = (_cost, ROUTE_COSTS.get(_route, (0.0, False))[1])
+
+class TokenBucket:
+    """Token bucket refilled at `rate` tokens per second up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, amount: float = 1) -> bool:
+        self._refill()
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return True
+        return False
+
+    async def acquire(self, amount: float = 1):
+        """Wait until `amount` tokens are available, then take them"""
+        amount = min(amount, self.capacity)
+        while not self.try_acquire(amount):
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+
+class MemoryRateLimitStore:
+    """Token buckets for the most recently seen callers, local to this process"""
+
+    def __init__(self, rate: float, capacity: float, max_keys: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    async def consume(self, key: str, cost: float) -> float:
+        """Spend `cost` tokens, returning 0 when allowed, else seconds until they would be"""
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.rate, self.capacity)
+            while len(self.buckets) > self.max_keys:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        if bucket.try_acquire(cost):
+            return 0.0
+        return (cost - bucket.tokens) / self.rate
+
+class MongoRateLimitStore:
+    """Token buckets shared by every replica, refilled and spent in one atomic update"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+
+    async def consume(self, key: str, cost: float) -> float:
+        now = time.time()
+        elapsed = {"$max": [0, {"$subtract": [now, {"$ifNull": ["$updated", now]}]}]}
+        refilled = {"$min": [self.capacity, {"$add": [{"$ifNull": ["$tokens", self.capacity]}, {"$multiply": [elapsed, self.rate]}]}]}
+        # An idle bucket is full again after capacity / rate seconds, so it can expire then
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.capacity / self.rate)
+        doc = await db.rate_limits.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "updated": now, "expires_at": expires_at}},
+                {"$set": {"allowed": {"$gte": ["$tokens", cost]}}},
+                {"$set": {"tokens": {"$cond": ["$allowed", {"$subtract": ["$tokens", cost]}, "$tokens"]}}},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if doc["allowed"]:
+            return 0.0
+        return (cost - doc["tokens"]) / self.rate
+
+class AdmissionControl:
+    """Per-caller token buckets plus global load shedding"""
+
+    def __init__(self, store, max_in_flight: int, max_llm_in_flight: int, max_loop_lag: float):
+        self.store = store
+        self.max_in_flight = max_in_flight
+        self.max_llm_in_flight = max_llm_in_flight
+        self.max_loop_lag = max_loop_lag
+        self.in_flight = 0
+        self.llm_in_flight = 0
+        self.loop_lag = 0.0
+        self.stats = {"admitted": 0, "rate_limited": 0, "shed_in_flight": 0, "shed_llm": 0, "shed_loop_lag": 0}
+
+    @contextmanager
+    def llm_call(self):
+        """Count an LLM request as in flight for the duration of the block"""
+        self.llm_in_flight += 1
+        try:
+            yield
+        finally:
+            self.llm_in_flight -= 1
+
+    def shed_reason(self, cost: float, uses_llm: bool) -> Optional[str]:
+        """Why a request of this kind should be shed right now, if it should"""
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            return "in_flight"
+        if uses_llm and self.max_llm_in_flight and self.llm_in_flight >= self.max_llm_in_flight:
+            return "llm"
+        # Cheap requests still go through while the loop catches up
+        if self.max_loop_lag and cost > RATE_LIMIT_DEFAULT_COST and self.loop_lag > self.max_loop_lag:
+            return "loop_lag"
+        return None
+
+    async def retry_after(self, key: str, cost: float) -> float:
+        """Seconds the caller must wait before this request fits its budget (0 to admit)"""
+        try:
+            return await self.store.consume(key, min(cost, RATE_LIMIT_BURST))
+        except Exception as e:
+            # Fail open: a broken shared store must not take the API down with it
+            logger.warning(f"Rate limit store unavailable: {str(e)}")
+            return 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "rate_limit_enabled": RATE_LIMIT_ENABLED,
+            "backend": RATE_LIMIT_BACKEND,
+            "in_flight": self.in_flight,
+            "llm_in_flight": self.llm_in_flight,
+            "event_loop_lag_seconds": round(self.loop_lag, 4),
+            **self.stats
+        }
+
+if RATE_LIMIT_BACKEND == "mongo":
+    rate_limit_store = MongoRateLimitStore(RATE_LIMIT_RATE, RATE_LIMIT_BURST)
+else:
+    rate_limit_store = MemoryRateLimitStore(RATE_LIMIT_RATE, RATE_LIMIT_BURST, RATE_LIMIT_MAX_KEYS)
+
+admission = AdmissionControl(
+    rate_limit_store, ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_LLM_IN_FLIGHT, ADMISSION_MAX_EVENT_LOOP_LAG_SECONDS
+)
+
+metrics.counter("requests_rejected_total", "Requests refused by rate limiting or load shedding, by reason")
+
+def client_address(request: Request) -> str:
+    """Address of the caller as seen by the outermost trusted proxy"""
+    if RATE_LIMIT_PROXY_HOPS > 0:
+        forwarded = [hop.strip() for hop in request.headers.get("X-Forwarded-For", "").split(',') if hop.strip()]
+        if forwarded:
+            # Entries left of the trusted hops were written by the client itself
+            return forwarded[-min(RATE_LIMIT_PROXY_HOPS, len(forwarded))]
+    return request.client.host if request.client else "unknown"
+
+def rate_limit_key(request: Request) -> str:
+    identity = getattr(request.state, "identity", None)
+    if identity:
+        return f"user:{identity['sub']}"
+    return f"ip:{client_address(request)}"
+
+def retry_after_header(retry_after: float) -> dict:
+    return {"Retry-After": str(max(1, math.ceil(retry_after)))}
+
+def reject_request(status_code: int, reason: str, detail: str, retry_after: float) -> JSONResponse:
+    admission.stats["rate_limited" if reason == "rate_limited" else f"shed_{reason}"] += 1
+    metrics.inc("requests_rejected_total", reason=reason)
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": detail},
+        headers=retry_after_header(retry_after)
+    )
+
+async def charge_rate_limit(request: Request, cost: float):
+    """Spend tokens for work whose size the middleware could not see, or raise 429"""
+    if not RATE_LIMIT_ENABLED or cost <= 0:
+        return
+    wait = await admission.retry_after(rate_limit_key(request), cost)
+    if wait > 0:
+        admission.stats["rate_limited"] += 1
+        metrics.inc("requests_rejected_total", reason="rate_limited")
+        raise HTTPException(
+            status_code=429, detail="Too many requests, please slow down", headers=retry_after_header(wait)
+        )
+
+# Registered before authenticate_request, so it runs after it and sees the verified identity
+@app.middleware("http")
+async def admit_request(request: Request, call_next):
+    if request.method == "OPTIONS" or request.url.path in RATE_LIMIT_EXEMPT_PATHS:
+        return await call_next(request)
+    
+    cost, uses_llm = ROUTE_COSTS.get(f"{request.method} {request.url.path}", (RATE_LIMIT_DEFAULT_COST, False))
+    reason = admission.shed_reason(cost, uses_llm)
+    if reason:
+        return reject_request(503, reason, "Server busy, please retry", 1)
+    
+    if RATE_LIMIT_ENABLED:
+        wait = await admission.retry_after(rate_limit_key(request), cost)
+        if wait > 0:
+            return reject_request(429, "rate_limited", "Too many requests, please slow down", wait)
+    
+    admission.stats["admitted"] += 1
+    admission.in_flight += 1
+    try:
+        return await call_next(request)
+    finally:
+        admission.in_flight -= 1
 
 # Configure logging
 logging.basicConfig(
@@ -83,6 +783,7 @@ class MoodEntry(BaseModel):
     underlying_cause: Optional[str] = None
     additional_notes: Optional[str] = None
     ai_guidance: str
+    guidance_status: str = "complete"
     timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class MoodTrend(BaseModel):
@@ -115,19 +816,133 @@ class LifestyleAssessment(BaseModel):
     date: str
     average_score: float
 
-# Helper function to generate AI guidance
-async def generate_mood_guidance(mood_data: MoodEntryCreate, user_name: Optional[str] = None) -> str:
-    try:
-        api_key = os.environ.get('EMERGENT_LLM_KEY')
-        if not api_key:
-            return "Unable to generate guidance at this time. Please try again later."
+LIFESTYLE_PILLARS = ("sleep_quality", "nutrition", "social_connection", "purpose_growth", "stress_management")
+MOOD_LEVEL_FIELDS = ("emotion_level", "energy_level", "focus_level")
+
+# LLM client loading
+# emergentintegrations pulls in the whole provider SDK tree, so it is imported
+# lazily: pre-warmed on a thread once the server is listening, or on first use.
+LLM_MODULE = "emergentintegrations.llm.chat"
+LlmChat = None
+UserMessage = None
+llm_import_lock = threading.Lock()
+import_durations: Dict[str, float] = {}
+
+def load_llm_client():
+    """Import the LLM SDK once; safe to call from any thread"""
+    global LlmChat, UserMessage
+    with llm_import_lock:
+        if LlmChat is not None and UserMessage is not None:
+            return
+        started = time.perf_counter()
+        modules_before = len(sys.modules)
+        module = importlib.import_module(LLM_MODULE)
+        LlmChat = LlmChat or module.LlmChat
+        UserMessage = UserMessage or module.UserMessage
+        import_durations["llm_client"] = time.perf_counter() - started
+        logger.info(f"Imported {LLM_MODULE} in {import_durations['llm_client']:.3f}s "
+                    f"({len(sys.modules) - modules_before} modules)")
+
+async def ensure_llm_client():
+    if LlmChat is None or UserMessage is None:
+        await asyncio.to_thread(load_llm_client)
+
+# AI guidance cache
+# Guidance is cached per normalized mood fingerprint. Templates are generated with a
+# name placeholder so one cached response can be personalized for any user.
+GUIDANCE_CACHE_ENABLED = os.environ.get('GUIDANCE_CACHE_ENABLED', 'true').lower() == 'true'
+GUIDANCE_CACHE_MAX_ENTRIES = int(os.environ.get('GUIDANCE_CACHE_MAX_ENTRIES', '1024'))
+GUIDANCE_CACHE_TTL_SECONDS = int(os.environ.get('GUIDANCE_CACHE_TTL_SECONDS', '3600'))
+GUIDANCE_CACHE_MONGO = os.environ.get('GUIDANCE_CACHE_MONGO', 'false').lower() == 'true'
+# "normalize" keys on normalized free text, "exclude" drops free text from key and prompt
+GUIDANCE_CACHE_FREE_TEXT = os.environ.get('GUIDANCE_CACHE_FREE_TEXT', 'normalize').lower()
+
+GUIDANCE_NAME_PLACEHOLDER = "{name}"
+MOOD_FREE_TEXT_FIELDS = ("trigger", "pattern", "underlying_cause", "additional_notes")
+
+def normalize_free_text(text: Optional[str]) -> str:
+    """Lowercase and collapse whitespace so trivially different inputs share a key"""
+    return " ".join((text or "").lower().split())
+
+class GuidanceCache:
+    """In-memory LRU cache with TTL and an optional shared MongoDB tier"""
+
+    def __init__(self, max_entries: int, ttl_seconds: int, use_mongo: bool):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.use_mongo = use_mongo
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.stats = {"hits": 0, "mongo_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    @staticmethod
+    def fingerprint(mood_data: MoodEntryCreate) -> str:
+        key = {
+            "emotion": normalize_free_text(mood_data.emotion),
+            "emotion_level": mood_data.emotion_level,
+            "energy_level": mood_data.energy_level,
+            "focus_level": mood_data.focus_level,
+            "overthinking": normalize_free_text(mood_data.overthinking),
+        }
+        if GUIDANCE_CACHE_FREE_TEXT != "exclude":
+            for field in MOOD_FREE_TEXT_FIELDS:
+                key[field] = normalize_free_text(getattr(mood_data, field))
+        return hashlib.sha256(json.dumps(key, sort_keys=True).encode('utf-8')).hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        item = self.entries.get(key)
+        if item is not None:
+            guidance, expires_at = item
+            if expires_at > time.monotonic():
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return guidance
+            del self.entries[key]
+            self.stats["expirations"] += 1
         
-        # Create a unique session ID for each request
-        session_id = f"mood-guidance-{uuid.uuid4()}"
+        if self.use_mongo:
+            doc = await db.guidance_cache.find_one(
+                {"_id": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+                {"guidance": 1}
+            )
+            if doc:
+                self.stats["mongo_hits"] += 1
+                self._store(key, doc["guidance"])
+                return doc["guidance"]
         
-        # System message for the AI
-        greeting_name = user_name if user_name else "friend"
-        system_message = f"""You are a compassionate mental wellness assistant. Your role is to:
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, key: str, guidance: str):
+        self._store(key, guidance)
+        if self.use_mongo:
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+            await db.guidance_cache.update_one(
+                {"_id": key},
+                {"$set": {"guidance": guidance, "expires_at": expires_at}},
+                upsert=True
+            )
+
+    def _store(self, key: str, guidance: str):
+        self.entries[key] = (guidance, time.monotonic() + self.ttl_seconds)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def snapshot(self) -> dict:
+        return {"enabled": GUIDANCE_CACHE_ENABLED, "size": len(self.entries), "mongo": self.use_mongo, **self.stats}
+
+guidance_cache = GuidanceCache(GUIDANCE_CACHE_MAX_ENTRIES, GUIDANCE_CACHE_TTL_SECONDS, GUIDANCE_CACHE_MONGO)
+
+def fill_guidance_name(guidance: str, user_name: Optional[str]) -> str:
+    return guidance.replace(GUIDANCE_NAME_PLACEHOLDER, user_name if user_name else "friend")
+
+def build_guidance_chat(api_key: str, greeting_name: str) -> "LlmChat":
+    # Create a unique session ID for each request
+    session_id = f"mood-guidance-{uuid.uuid4()}"
+    
+    # System message for the AI
+    system_message = f"""You are a compassionate mental wellness assistant. Your role is to:
 1. Address the user personally by their name ({greeting_name})
 2. Acknowledge the user's emotional state with empathy
 3. Validate their feelings
@@ -136,19 +951,21 @@ async def generate_mood_guidance(mood_data: MoodEntryCreate, user_name: Optional
 6. Offer encouragement and remind them this feeling is temporary
 
 Keep responses warm, supportive, and under 200 words. Focus on immediate, practical help. Always start by addressing them personally."""
-        
-        # Initialize the chat
-        chat = LlmChat(
-            api_key=api_key,
-            session_id=session_id,
-            system_message=system_message
-        )
-        
-        # Use Claude Sonnet 4
-        chat.with_model("anthropic", "claude-4-sonnet-20250514")
-        
-        # Create the user message
-        user_prompt = f"""Current emotional state:
+    
+    # Initialize the chat
+    chat = LlmChat(
+        api_key=api_key,
+        session_id=session_id,
+        system_message=system_message
+    )
+    
+    # Use Claude Sonnet 4
+    chat.with_model("anthropic", "claude-4-sonnet-20250514")
+    return chat
+
+def build_guidance_message(mood_data: MoodEntryCreate) -> "UserMessage":
+    # Create the user message
+    user_prompt = f"""Current emotional state:
 - Dominant emotion: {mood_data.emotion}
 - Emotion intensity: {mood_data.emotion_level}/10
 - Energy level: {mood_data.energy_level}/10
@@ -160,19 +977,1387 @@ Keep responses warm, supportive, and under 200 words. Focus on immediate, practi
 {f'- Additional notes: {mood_data.additional_notes}' if mood_data.additional_notes else ''}
 
 Please provide personalized wellness guidance and coping strategies. Address the trigger, pattern, and underlying cause if provided. Do not use ** for bold formatting - use plain text only."""
+    
+    return UserMessage(text=user_prompt)
+
+async def request_mood_guidance(api_key: str, mood_data: MoodEntryCreate, greeting_name: str) -> str:
+    """Ask the LLM for guidance, raising on any provider error"""
+    await ensure_llm_client()
+    chat = build_guidance_chat(api_key, greeting_name)
+    user_message = build_guidance_message(mood_data)
+    
+    # Send the message and get the response
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        with admission.llm_call():
+            response = await chat.send_message(user_message)
+        outcome = "success"
+        llm_latency.record(time.perf_counter() - started)
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        metrics.inc("llm_timeouts_total")
+        raise
+    except asyncio.CancelledError:
+        # Losing side of a hedged pair, or the deadline expired
+        outcome = "cancelled"
+        raise
+    finally:
+        metrics.observe("llm_request_duration_seconds", time.perf_counter() - started, outcome=outcome)
+    
+    # Remove ** markdown formatting
+    return response.replace('**', '')
+
+# LLM deadlines, hedging and circuit breaker
+# Every guidance call is bounded by LLM_TIMEOUT_SECONDS. If the first attempt is
+# slower than the recent latency percentile a second, hedged attempt is started
+# and whichever finishes first wins. Repeated failures open the breaker, which
+# serves the fallback immediately until a half-open probe succeeds.
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', '20'))
+LLM_HEDGE_ENABLED = os.environ.get('LLM_HEDGE_ENABLED', 'true').lower() == 'true'
+LLM_HEDGE_PERCENTILE = float(os.environ.get('LLM_HEDGE_PERCENTILE', '95'))
+LLM_HEDGE_MIN_DELAY_SECONDS = float(os.environ.get('LLM_HEDGE_MIN_DELAY_SECONDS', '2'))
+LLM_BREAKER_FAILURES = int(os.environ.get('LLM_BREAKER_FAILURES', '5'))
+LLM_BREAKER_RESET_SECONDS = float(os.environ.get('LLM_BREAKER_RESET_SECONDS', '30'))
+
+metrics.counter("llm_hedged_requests_total", "Second LLM attempts started after the hedge delay")
+metrics.counter("llm_circuit_transitions_total", "LLM circuit breaker state changes by new state")
+
+class LatencyTracker:
+    """Rolling window of successful LLM latencies used to pick the hedge delay"""
+
+    MIN_SAMPLES = 20
+
+    def __init__(self, window: int = 200):
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def hedge_delay(self) -> float:
+        if len(self.samples) < self.MIN_SAMPLES:
+            return LLM_HEDGE_MIN_DELAY_SECONDS
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(len(ordered) * LLM_HEDGE_PERCENTILE / 100))
+        return max(LLM_HEDGE_MIN_DELAY_SECONDS, ordered[index])
+
+llm_latency = LatencyTracker()
+
+class CircuitBreaker:
+    """closed -> open after N consecutive failures -> half_open probe after the reset period"""
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.probe_started_at: Optional[float] = None
+
+    def _transition(self, state: str):
+        if state != self.state:
+            logger.warning(f"LLM circuit breaker {self.state} -> {state}")
+            metrics.inc("llm_circuit_transitions_total", state=state)
+            self.state = state
+
+    def allow(self) -> bool:
+        now = time.monotonic()
+        if self.state == "open" and now - self.opened_at >= self.reset_seconds:
+            self._transition("half_open")
+        if self.state == "half_open":
+            # One probe at a time; a probe that never reported back is abandoned after the deadline
+            if self.probe_started_at is None or now - self.probe_started_at > LLM_TIMEOUT_SECONDS:
+                self.probe_started_at = now
+                return True
+            return False
+        return self.state == "closed"
+
+    def record_success(self):
+        self.failures = 0
+        self.probe_started_at = None
+        self._transition("closed")
+
+    def record_failure(self):
+        self.failures += 1
+        self.probe_started_at = None
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._transition("open")
+
+    def snapshot(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures}
+
+llm_breaker = CircuitBreaker(LLM_BREAKER_FAILURES, LLM_BREAKER_RESET_SECONDS)
+
+async def request_guidance_with_deadline(api_key: str, mood_data: MoodEntryCreate, greeting_name: str) -> str:
+    """Race a primary and (after the hedge delay) a hedged LLM call within the deadline"""
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    hedge_at = min(llm_latency.hedge_delay(), LLM_TIMEOUT_SECONDS)
+    pending = {asyncio.create_task(request_mood_guidance(api_key, mood_data, greeting_name))}
+    hedged = not LLM_HEDGE_ENABLED
+    last_error: Optional[BaseException] = None
+    try:
+        while pending:
+            elapsed = loop.time() - started
+            remaining = LLM_TIMEOUT_SECONDS - elapsed
+            if remaining <= 0:
+                break
+            timeout = remaining if hedged else max(0.0, min(remaining, hedge_at - elapsed))
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                last_error = task.exception()
+            if not done and not hedged:
+                hedged = True
+                metrics.inc("llm_hedged_requests_total")
+                pending.add(asyncio.create_task(request_mood_guidance(api_key, mood_data, greeting_name)))
+        
+        if pending:
+            metrics.inc("llm_timeouts_total")
+            raise asyncio.TimeoutError(f"LLM guidance exceeded {LLM_TIMEOUT_SECONDS}s deadline")
+        raise last_error
+    finally:
+        for task in pending:
+            task.cancel()
+
+def fallback_guidance(mood_data: MoodEntryCreate) -> str:
+    return f"I hear you're feeling {mood_data.emotion.lower()}. Remember to take deep breaths, reach out to someone you trust, and be gentle with yourself. This feeling will pass."
+
+async def request_guidance_guarded(api_key: str, mood_data: MoodEntryCreate, greeting_name: str) -> str:
+    """Deadline-bounded LLM call that feeds the circuit breaker"""
+    try:
+        response = await request_guidance_with_deadline(api_key, mood_data, greeting_name)
+    except Exception:
+        llm_breaker.record_failure()
+        raise
+    llm_breaker.record_success()
+    return response
+
+# Helper function to generate AI guidance
+async def generate_mood_guidance(mood_data: MoodEntryCreate, user_name: Optional[str] = None) -> str:
+    try:
+        api_key = os.environ.get('EMERGENT_LLM_KEY')
+        if not api_key:
+            metrics.inc("llm_fallbacks_total", reason="no_api_key")
+            return "Unable to generate guidance at this time. Please try again later."
         
-        user_message = UserMessage(text=user_prompt)
+        cache_key = None
+        if GUIDANCE_CACHE_ENABLED:
+            cache_key = guidance_cache.fingerprint(mood_data)
+            cached = await guidance_cache.get(cache_key)
+            if cached is not None:
+                return fill_guidance_name(cached, user_name)
         
-        # Send the message and get the response
-        response = await chat.send_message(user_message)
+        if not llm_breaker.allow():
+            metrics.inc("llm_fallbacks_total", reason="circuit_open")
+            return fallback_guidance(mood_data)
         
-        # Remove ** markdown formatting
-        response = response.replace('**', '')
+        if not GUIDANCE_CACHE_ENABLED:
+            return await request_guidance_guarded(api_key, mood_data, user_name if user_name else "friend")
         
-        return response
+        # Free text that isn't part of the key must not leak into a shared response
+        prompt_data = mood_data
+        if GUIDANCE_CACHE_FREE_TEXT == "exclude":
+            prompt_data = mood_data.model_copy(update={field: None for field in MOOD_FREE_TEXT_FIELDS})
+        
+        template = await request_guidance_guarded(api_key, prompt_data, GUIDANCE_NAME_PLACEHOLDER)
+        await guidance_cache.set(cache_key, template)
+        return fill_guidance_name(template, user_name)
     except Exception as e:
         logger.error(f"Error generating AI guidance: {str(e)}")
-        return f"I hear you're feeling {mood_data.emotion.lower()}. Remember to take deep breaths, reach out to someone you trust, and be gentle with yourself. This feeling will pass."
+        metrics.inc("llm_fallbacks_total", reason="error")
+        return fallback_guidance(mood_data)
+
+# Streaming guidance
+# Guidance text is forwarded chunk by chunk as the provider produces it, for
+# chat clients that expose an async `stream_message`. The pinned
+# emergentintegrations SDK only has send_message, so until it can stream,
+# /mood/submit/stream answers exactly like /mood/submit instead of wrapping
+# one complete response in SSE framing.
+class StreamTextCleaner:
+    """Apply literal replacements to streamed text, holding back partial matches at chunk ends"""
+
+    def __init__(self, replacements: Dict[str, str]):
+        self.replacements = replacements
+        self.pending = ""
+
+    def feed(self, chunk: str) -> str:
+        text = self.pending + chunk
+        for old, new in self.replacements.items():
+            text = text.replace(old, new)
+        
+        hold = 0
+        for old in self.replacements:
+            for size in range(len(old) - 1, 0, -1):
+                if text.endswith(old[:size]):
+                    hold = max(hold, size)
+                    break
+        self.pending = text[len(text) - hold:] if hold else ""
+        return text[:len(text) - hold]
+
+    def flush(self) -> str:
+        text, self.pending = self.pending, ""
+        return text
+
+async def llm_can_stream() -> bool:
+    """Whether the installed chat client can stream tokens"""
+    try:
+        await ensure_llm_client()
+    except Exception:
+        return False
+    return getattr(LlmChat, "stream_message", None) is not None
+
+async def stream_guidance_chunks(api_key: str, mood_data: MoodEntryCreate, greeting_name: str) -> AsyncIterator[str]:
+    """Yield raw provider chunks within the LLM deadline, feeding the circuit breaker"""
+    chat = build_guidance_chat(api_key, greeting_name)
+    user_message = build_guidance_message(mood_data)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + LLM_TIMEOUT_SECONDS
+    started = time.perf_counter()
+    iterator = chat.stream_message(user_message).__aiter__()
+    try:
+        with admission.llm_call():
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    metrics.inc("llm_timeouts_total")
+                    raise asyncio.TimeoutError(f"LLM guidance exceeded {LLM_TIMEOUT_SECONDS}s deadline")
+                try:
+                    chunk = await asyncio.wait_for(iterator.__anext__(), remaining)
+                except StopAsyncIteration:
+                    break
+                yield chunk
+    except Exception:
+        llm_breaker.record_failure()
+        metrics.observe("llm_request_duration_seconds", time.perf_counter() - started, outcome="error")
+        raise
+    llm_breaker.record_success()
+    llm_latency.record(time.perf_counter() - started)
+    metrics.observe("llm_request_duration_seconds", time.perf_counter() - started, outcome="success")
+
+async def stream_mood_guidance(mood_data: MoodEntryCreate, user_name: Optional[str] = None) -> AsyncIterator[str]:
+    """Yield cleaned guidance text chunks, mirroring generate_mood_guidance's cache and fallbacks"""
+    api_key = os.environ.get('EMERGENT_LLM_KEY')
+    if not api_key:
+        metrics.inc("llm_fallbacks_total", reason="no_api_key")
+        yield "Unable to generate guidance at this time. Please try again later."
+        return
+    
+    cache_key = None
+    if GUIDANCE_CACHE_ENABLED:
+        cache_key = guidance_cache.fingerprint(mood_data)
+        cached = await guidance_cache.get(cache_key)
+        if cached is not None:
+            yield fill_guidance_name(cached, user_name)
+            return
+    
+    if not llm_breaker.allow():
+        metrics.inc("llm_fallbacks_total", reason="circuit_open")
+        yield fallback_guidance(mood_data)
+        return
+    
+    prompt_data = mood_data
+    greeting_name = user_name if user_name else "friend"
+    if GUIDANCE_CACHE_ENABLED:
+        greeting_name = GUIDANCE_NAME_PLACEHOLDER
+        if GUIDANCE_CACHE_FREE_TEXT == "exclude":
+            prompt_data = mood_data.model_copy(update={field: None for field in MOOD_FREE_TEXT_FIELDS})
+    
+    # Remove ** markdown and fill in the name placeholder as text arrives
+    cleaner = StreamTextCleaner({"**": "", GUIDANCE_NAME_PLACEHOLDER: user_name if user_name else "friend"})
+    template_parts = []
+    emitted = False
+    try:
+        async for chunk in stream_guidance_chunks(api_key, prompt_data, greeting_name):
+            template_parts.append(chunk)
+            text = cleaner.feed(chunk)
+            if text:
+                emitted = True
+                yield text
+        tail = cleaner.flush()
+        if tail:
+            yield tail
+    except Exception as e:
+        logger.error(f"Error streaming AI guidance: {str(e)}")
+        metrics.inc("llm_fallbacks_total", reason="error")
+        if not emitted:
+            yield fallback_guidance(mood_data)
+        return
+    
+    if cache_key:
+        await guidance_cache.set(cache_key, "".join(template_parts).replace('**', ''))
+
+def sse_event(event: str, data) -> str:
+    payload = data.model_dump_json() if isinstance(data, BaseModel) else json.dumps(data)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+# Background guidance pipeline
+# In "async" mode submit_mood stores the entry with a pending guidance status and
+# a pool of workers fills in ai_guidance, so the request never waits on the LLM.
+# A pending entry carries a lease (owning process and expiry) so that with
+# several replicas only one of them generates its guidance: a worker renews its
+# own lease before calling the LLM and skips entries another process has
+# claimed, and every GUIDANCE_REQUEUE_INTERVAL_SECONDS each process atomically
+# claims pending entries whose lease has expired, e.g. after a crash. That sweep
+# first renews the leases of entries still queued locally, so a slow backlog is
+# never claimed a second time.
+GUIDANCE_MODE = os.environ.get('GUIDANCE_MODE', 'sync').lower()
+GUIDANCE_WORKERS = int(os.environ.get('GUIDANCE_WORKERS', '4'))
+GUIDANCE_QUEUE_SIZE = int(os.environ.get('GUIDANCE_QUEUE_SIZE', '1000'))
+GUIDANCE_MAX_WAIT_SECONDS = 30.0
+GUIDANCE_LEASE_SECONDS = float(os.environ.get('GUIDANCE_LEASE_SECONDS', '300'))
+GUIDANCE_REQUEUE_INTERVAL_SECONDS = float(os.environ.get('GUIDANCE_REQUEUE_INTERVAL_SECONDS', '60'))
+
+GUIDANCE_PENDING = "pending"
+GUIDANCE_COMPLETE = "complete"
+# Cleared from an entry once its guidance is written
+GUIDANCE_LEASE_FIELDS = {"guidance_owner": "", "guidance_lease_until": ""}
+
+class GuidancePipeline:
+    """Bounded queue of guidance jobs drained by a fixed pool of worker tasks"""
+
+    def __init__(self, workers: int, queue_size: int, lease_seconds: float, requeue_interval: float):
+        self.worker_count = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.workers: List[asyncio.Task] = []
+        self.waiters: Dict[str, asyncio.Event] = {}
+        self.lease_seconds = lease_seconds
+        self.requeue_interval = requeue_interval
+        self.owner = uuid.uuid4().hex
+        self.requeuer: Optional[asyncio.Task] = None
+        # Entries queued or being generated here; the sweep renews rather than re-claims them
+        self.held: set = set()
+
+    @property
+    def running(self) -> bool:
+        return bool(self.workers)
+
+    async def start(self):
+        if self.running:
+            return
+        self.workers = [asyncio.create_task(self._worker(i)) for i in range(self.worker_count)]
+        logger.info(f"Guidance pipeline started with {self.worker_count} workers")
+        await self.requeue_pending()
+        self.requeuer = asyncio.create_task(self._requeue_periodically())
+
+    async def stop(self):
+        tasks = self.workers + ([self.requeuer] if self.requeuer else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.workers = []
+        self.requeuer = None
+
+    def lease(self) -> dict:
+        """Fields marking a pending entry as this process's for the next lease period"""
+        return {
+            "guidance_owner": self.owner,
+            "guidance_lease_until": datetime.now(timezone.utc) + timedelta(seconds=self.lease_seconds)
+        }
+
+    def enqueue(self, entry_id: str, mood_data: MoodEntryCreate, user_name: Optional[str], user_id: Optional[str] = None) -> bool:
+        """Queue a guidance job, returning False when the queue is full"""
+        try:
+            self.queue.put_nowait((entry_id, mood_data, user_name, user_id))
+        except asyncio.QueueFull:
+            return False
+        self.held.add(entry_id)
+        return True
+
+    async def wait_for(self, entry_id: str, timeout: float):
+        """Wait until a worker finishes the given entry or the timeout expires"""
+        event = self.waiters.setdefault(entry_id, asyncio.Event())
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            # Drop the event so entries finished before we registered don't leak
+            if self.waiters.get(entry_id) is event:
+                del self.waiters[entry_id]
+
+    async def requeue_pending(self) -> int:
+        """Claim pending entries whose lease has lapsed (or that never had one) and queue them"""
+        if self.held:
+            # Entries waiting behind a slow backlog keep their lease instead of being claimed twice
+            await db.mood_entries.update_many(
+                {"id": {"$in": list(self.held)}, "guidance_status": GUIDANCE_PENDING, "guidance_owner": self.owner},
+                {"$set": self.lease()}
+            )
+        
+        claimed = 0
+        while not self.queue.full():
+            # One atomic claim per entry, so concurrent replicas never take the same one
+            doc = await db.mood_entries.find_one_and_update(
+                {
+                    "guidance_status": GUIDANCE_PENDING,
+                    "id": {"$nin": list(self.held)},
+                    "$or": [
+                        {"guidance_lease_until": {"$exists": False}},
+                        {"guidance_lease_until": {"$lt": datetime.now(timezone.utc)}}
+                    ]
+                },
+                {"$set": self.lease()},
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+            if doc is None:
+                break
+            
+            user_name = None
+            if doc.get('user_id'):
+                user = await db.users.find_one({"id": doc['user_id']}, {"_id": 0, "name": 1})
+                user_name = user.get("name") if user else None
+            self.enqueue(doc['id'], MoodEntryCreate(**doc), user_name, doc.get('user_id'))
+            claimed += 1
+        
+        if claimed:
+            logger.info(f"Re-queued {claimed} pending guidance jobs")
+        return claimed
+
+    async def _requeue_periodically(self):
+        while True:
+            await asyncio.sleep(self.requeue_interval)
+            try:
+                await self.requeue_pending()
+            except Exception as e:
+                logger.error(f"Guidance requeue failed: {str(e)}")
+
+    async def _renew_lease(self, entry_id: str) -> bool:
+        """Extend this process's lease on a still-pending entry; False if it is done or taken"""
+        doc = await db.mood_entries.find_one_and_update(
+            {"id": entry_id, "guidance_status": GUIDANCE_PENDING, "guidance_owner": self.owner},
+            {"$set": self.lease()},
+            projection={"_id": 0, "id": 1}
+        )
+        return doc is not None
+
+    async def _worker(self, worker_id: int):
+        while True:
+            entry_id, mood_data, user_name, user_id = await self.queue.get()
+            try:
+                # The lease may have lapsed while queued and been claimed elsewhere
+                if not await self._renew_lease(entry_id):
+                    continue
+                ai_guidance = await generate_mood_guidance(mood_data, user_name)
+                await db.mood_entries.update_one(
+                    {"id": entry_id},
+                    {
+                        "$set": {"ai_guidance": ai_guidance, "guidance_status": GUIDANCE_COMPLETE},
+                        "$unset": GUIDANCE_LEASE_FIELDS
+                    }
+                )
+                await record_user_write(user_id)
+            except Exception as e:
+                logger.error(f"Guidance worker {worker_id} failed for entry {entry_id}: {str(e)}")
+            finally:
+                self.queue.task_done()
+                self.held.discard(entry_id)
+                event = self.waiters.pop(entry_id, None)
+                if event:
+                    event.set()
+
+guidance_pipeline = GuidancePipeline(
+    GUIDANCE_WORKERS, GUIDANCE_QUEUE_SIZE, GUIDANCE_LEASE_SECONDS, GUIDANCE_REQUEUE_INTERVAL_SECONDS
+)
+
+# Native dates
+# Timestamps used to be stored as ISO strings. Writers now store BSON dates and
+# readers accept both until `python manage.py migrate-dates` (or
+# DATE_MIGRATION_ON_STARTUP) has converted the remaining string values.
+DATE_FIELDS = (("mood_entries", "timestamp"), ("users", "created_at"))
+DATE_MIGRATION_ON_STARTUP = os.environ.get('DATE_MIGRATION_ON_STARTUP', 'false').lower() == 'true'
+DATE_MIGRATION_BATCH_SIZE = int(os.environ.get('DATE_MIGRATION_BATCH_SIZE', '500'))
+DATE_MIGRATION_PAUSE_SECONDS = float(os.environ.get('DATE_MIGRATION_PAUSE_SECONDS', '0.1'))
+
+def as_datetime(value) -> Optional[datetime]:
+    """Return a UTC datetime for a BSON date or a legacy ISO string"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if isinstance(value, datetime) and value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+def since_query(field: str, moment: datetime) -> List[dict]:
+    """$or clauses matching field >= moment whether it is stored as a date or an ISO string"""
+    return [{field: {"$gte": moment}}, {field: {"$gte": moment.isoformat()}}]
+
+async def migrate_dates(batch_size: int = DATE_MIGRATION_BATCH_SIZE, pause: float = DATE_MIGRATION_PAUSE_SECONDS) -> dict:
+    """Convert string date fields to BSON dates in batches; safe to interrupt and rerun"""
+    totals = {}
+    for collection_name, field in DATE_FIELDS:
+        collection = db[collection_name]
+        converted = skipped = 0
+        last_id = None
+        while True:
+            query = {field: {"$type": "string"}}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            docs = await collection.find(query, {field: 1}).sort("_id", ASCENDING).limit(batch_size).to_list(batch_size)
+            if not docs:
+                break
+            last_id = docs[-1]["_id"]
+            
+            updates = []
+            for doc in docs:
+                try:
+                    moment = as_datetime(doc[field])
+                except ValueError:
+                    skipped += 1
+                    continue
+                # Match the old value so a concurrent rewrite is never overwritten
+                updates.append(UpdateOne({"_id": doc["_id"], field: doc[field]}, {"$set": {field: moment}}))
+            if updates:
+                result = await collection.bulk_write(updates, ordered=False)
+                converted += result.modified_count
+            await asyncio.sleep(pause)
+        
+        totals[f"{collection_name}.{field}"] = {"converted": converted, "skipped": skipped}
+        logger.info(f"Migrated {collection_name}.{field}: {converted} converted, {skipped} unparseable")
+    return totals
+
+async def migrate_dates_in_background():
+    try:
+        await migrate_dates()
+    except Exception as e:
+        logger.error(f"Date migration stopped, rerun to resume: {str(e)}")
+
+# Index management
+# Every read path filters by user_id and sorts by timestamp or date, so each
+# collection gets a matching compound index. Builds are idempotent.
+INDEX_BOOTSTRAP = os.environ.get('INDEX_BOOTSTRAP', 'true').lower() == 'true'
+# Finished user deletion jobs are kept this long for the status endpoint
+DELETION_JOB_RETENTION_SECONDS = int(os.environ.get('DELETION_JOB_RETENTION_SECONDS', str(7 * 24 * 3600)))
+
+INDEX_SPECS = {
+    "mood_entries": [
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("id", ASCENDING)]),
+        IndexModel(
+            [("guidance_status", ASCENDING)],
+            partialFilterExpression={"guidance_status": GUIDANCE_PENDING}
+        ),
+    ],
+    "lifestyle_assessments": [
+        IndexModel([("user_id", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)]),
+    ],
+    "gratitude_entries": [
+        IndexModel([("user_id", ASCENDING), ("date", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("id", ASCENDING)]),
+    ],
+    "users": [
+        IndexModel([("username", ASCENDING)], unique=True),
+        IndexModel([("id", ASCENDING)], unique=True),
+    ],
+    "mood_rollups": [
+        IndexModel([("user_id", ASCENDING), ("period", ASCENDING), ("key", DESCENDING)], unique=True),
+    ],
+    "lifestyle_rollups": [
+        IndexModel([("user_id", ASCENDING), ("period", ASCENDING), ("key", DESCENDING)], unique=True),
+    ],
+    "trigger_index": [
+        IndexModel([("user_id", ASCENDING), ("kind", ASCENDING), ("term", ASCENDING)], unique=True),
+        IndexModel([("user_id", ASCENDING), ("kind", ASCENDING), ("count", DESCENDING)]),
+    ],
+    "deletion_jobs": [
+        IndexModel([("status", ASCENDING)]),
+        IndexModel([("finished_at", ASCENDING)], expireAfterSeconds=DELETION_JOB_RETENTION_SECONDS),
+    ],
+    "sessions": [
+        IndexModel([("user_id", ASCENDING)]),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
+
+if GUIDANCE_CACHE_MONGO:
+    INDEX_SPECS["guidance_cache"] = [IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0)]
+
+if RATE_LIMIT_BACKEND == "mongo":
+    INDEX_SPECS["rate_limits"] = [IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0)]
+
+# Hot queries whose plans must use an index: (name, collection, filter, sort)
+HOT_QUERIES = [
+    ("mood_history", "mood_entries", {"user_id": "__index_probe__"}, [("timestamp", -1)]),
+    ("trigger_insights", "mood_entries", {"user_id": "__index_probe__", "trigger": {"$exists": True, "$nin": ["", None]}}, None),
+    ("trigger_heatmap", "mood_entries", {"user_id": "__index_probe__", "timestamp": {"$gte": datetime(1970, 1, 1, tzinfo=timezone.utc)}}, None),
+    ("weekly_report", "lifestyle_assessments", {"user_id": "__index_probe__"}, [("date", -1)]),
+    ("gratitude_entries", "gratitude_entries", {"user_id": "__index_probe__"}, [("date", -1)]),
+    ("user_login", "users", {"username": "__index_probe__"}, None),
+]
+
+async def ensure_indexes():
+    """Create every declared index, logging (not raising) on per-index failures"""
+    for collection_name, models in INDEX_SPECS.items():
+        for model in models:
+            try:
+                await db[collection_name].create_indexes([model])
+            except Exception as e:
+                logger.error(f"Failed to create index {model.document['name']} on {collection_name}: {str(e)}")
+    logger.info("✅ MongoDB indexes ensured")
+
+def _plan_stages(plan):
+    """Yield every stage name in an explain() plan tree"""
+    if isinstance(plan, dict):
+        if 'stage' in plan:
+            yield plan['stage']
+        for value in plan.values():
+            yield from _plan_stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _plan_stages(item)
+
+async def verify_query_plans() -> Dict[str, bool]:
+    """Explain each hot query and warn when its winning plan is a COLLSCAN"""
+    results = {}
+    for name, collection_name, query, sort in HOT_QUERIES:
+        try:
+            cursor = db[collection_name].find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            explanation = await cursor.explain()
+            winning_plan = explanation.get('queryPlanner', {}).get('winningPlan', {})
+            covered = 'COLLSCAN' not in set(_plan_stages(winning_plan))
+            if not covered:
+                logger.warning(f"Query '{name}' on {collection_name} uses a COLLSCAN")
+            results[name] = covered
+        except Exception as e:
+            logger.warning(f"Could not explain query '{name}': {str(e)}")
+    return results
+
+# Per-user rollups
+# submit_mood and submit_lifestyle_assessment $inc daily, weekly and all-time
+# aggregates so trends, reports and trigger insights read O(weeks) documents.
+# Run `python manage.py rebuild-rollups` to backfill before enabling ROLLUPS_READ.
+ROLLUPS_WRITE = os.environ.get('ROLLUPS_WRITE', 'true').lower() == 'true'
+ROLLUPS_READ = os.environ.get('ROLLUPS_READ', 'false').lower() == 'true'
+
+ROLLUP_PERIODS = ("day", "week", "all")
+
+def rollup_field_key(text: str) -> str:
+    """Make free text safe to use as a MongoDB field name"""
+    return text.replace(".", "\uff0e").replace("$", "\uff04")
+
+def rollup_display_key(key: str) -> str:
+    return key.replace("\uff0e", ".").replace("\uff04", "$")
+
+def parse_assessment_date(date_str: str) -> Optional[datetime]:
+    """Parse a lifestyle assessment date, returning None when it is not ISO formatted"""
+    try:
+        date_obj = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+    return date_obj.astimezone(timezone.utc) if date_obj.tzinfo else date_obj
+
+def rollup_keys(moment: datetime) -> Dict[str, str]:
+    return {"day": moment.strftime("%Y-%m-%d"), "week": moment.strftime("%Y-W%U"), "all": "all"}
+
+def mood_rollup_increments(doc: dict) -> Dict[str, int]:
+    """Dotted-path $inc amounts contributed by one mood entry"""
+    emotion = rollup_field_key(doc.get('emotion') or 'unknown')
+    increments = {"count": 1, f"emotions.{emotion}": 1}
+    for field in MOOD_LEVEL_FIELDS:
+        increments[f"sums.{field}"] = doc.get(field, 0)
+    
+    trigger = normalize_trigger(doc.get('trigger'))
+    if trigger:
+        trigger = rollup_field_key(trigger)
+        increments["trigger_count"] = 1
+        increments[f"triggers.{trigger}.count"] = 1
+        increments[f"triggers.{trigger}.intensity"] = doc.get('emotion_level', 0)
+        increments[f"triggers.{trigger}.emotions.{emotion}"] = 1
+    return increments
+
+def lifestyle_rollup_increments(doc: dict) -> Dict[str, int]:
+    """Dotted-path $inc amounts contributed by one lifestyle assessment"""
+    increments = {"count": 1}
+    for pillar in LIFESTYLE_PILLARS:
+        increments[f"sums.{pillar}"] = doc.get(pillar, 0)
+    return increments
+
+def _apply_increments(target: dict, increments: Dict[str, int]):
+    for path, amount in increments.items():
+        *parents, leaf = path.split(".")
+        node = target
+        for part in parents:
+            node = node.setdefault(part, {})
+        node[leaf] = node.get(leaf, 0) + amount
+
+async def _inc_rollups(collection, user_id: str, items: List[tuple]):
+    """Apply (moment, increments) pairs, merged so each rollup document gets one $inc"""
+    merged: Dict[tuple, Dict[str, int]] = {}
+    for moment, increments in items:
+        keys = rollup_keys(moment)
+        for period in ROLLUP_PERIODS:
+            target = merged.setdefault((period, keys[period]), {})
+            for path, amount in increments.items():
+                target[path] = target.get(path, 0) + amount
+    if not merged:
+        return
+    await collection.bulk_write([
+        UpdateOne({"user_id": user_id, "period": period, "key": key}, {"$inc": increments}, upsert=True)
+        for (period, key), increments in merged.items()
+    ], ordered=False)
+
+async def record_mood_rollups(user_id: Optional[str], docs: List[dict]):
+    if not ROLLUPS_WRITE or not user_id:
+        return
+    try:
+        items = []
+        for doc in docs:
+            moment = _mood_entry_moment(doc)
+            if moment is not None:
+                items.append((moment, mood_rollup_increments(doc)))
+        await _inc_rollups(db.mood_rollups, user_id, items)
+    except Exception as e:
+        logger.error(f"Error updating mood rollups: {str(e)}")
+
+async def record_lifestyle_rollups(user_id: Optional[str], docs: List[dict]):
+    if not ROLLUPS_WRITE or not user_id:
+        return
+    try:
+        items = []
+        for doc in docs:
+            moment = parse_assessment_date(doc.get('date', ''))
+            if moment is not None:
+                items.append((moment, lifestyle_rollup_increments(doc)))
+        await _inc_rollups(db.lifestyle_rollups, user_id, items)
+    except Exception as e:
+        logger.error(f"Error updating lifestyle rollups: {str(e)}")
+
+async def _rebuild_user_rollups(collection, rollup_collection, user_id: str, moment_of, increments_of) -> int:
+    rollups: Dict[tuple, dict] = {}
+    count = 0
+    async for doc in collection.find({"user_id": user_id}, {"_id": 0}).batch_size(500):
+        moment = moment_of(doc)
+        if moment is None:
+            continue
+        keys = rollup_keys(moment)
+        increments = increments_of(doc)
+        for period in ROLLUP_PERIODS:
+            _apply_increments(rollups.setdefault((period, keys[period]), {}), increments)
+        count += 1
+    
+    await rollup_collection.delete_many({"user_id": user_id})
+    if rollups:
+        await rollup_collection.insert_many([
+            {"user_id": user_id, "period": period, "key": key, **values}
+            for (period, key), values in rollups.items()
+        ])
+    return count
+
+def _mood_entry_moment(doc: dict) -> Optional[datetime]:
+    """Entry time, or None for legacy rows with a missing or unparseable timestamp"""
+    try:
+        return as_datetime(doc.get('timestamp'))
+    except ValueError:
+        return None
+
+async def rebuild_rollups(user_id: Optional[str] = None) -> dict:
+    """Recompute rollups from raw entries for one user, or every user when user_id is None.
+
+    Entries written for a user while their rollups are rebuilt may be lost, so run
+    this during low traffic.
+    """
+    if user_id:
+        user_ids = [user_id]
+    else:
+        user_ids = set(await db.mood_entries.distinct("user_id"))
+        user_ids |= set(await db.lifestyle_assessments.distinct("user_id"))
+        user_ids = sorted(uid for uid in user_ids if uid)
+    
+    totals = {"users": 0, "mood_entries": 0, "lifestyle_assessments": 0}
+    for uid in user_ids:
+        totals["mood_entries"] += await _rebuild_user_rollups(
+            db.mood_entries, db.mood_rollups, uid, _mood_entry_moment, mood_rollup_increments
+        )
+        totals["lifestyle_assessments"] += await _rebuild_user_rollups(
+            db.lifestyle_assessments, db.lifestyle_rollups, uid,
+            lambda doc: parse_assessment_date(doc.get('date', '')), lifestyle_rollup_increments
+        )
+        totals["users"] += 1
+    logger.info(f"Rebuilt rollups: {totals}")
+    return totals
+
+# Trigger index
+# Free-text triggers are normalized at write time and counted per user in
+# trigger_index: one document per full phrase and per word, each holding a count,
+# an emotion histogram and last_seen. Top triggers and prefix search read it
+# instead of sampling raw entries. Run `python manage.py rebuild-trigger-index`
+# to backfill before enabling TRIGGER_INDEX_READ.
+TRIGGER_INDEX_WRITE = os.environ.get('TRIGGER_INDEX_WRITE', 'true').lower() == 'true'
+TRIGGER_INDEX_READ = os.environ.get('TRIGGER_INDEX_READ', 'false').lower() == 'true'
+TRIGGER_MAX_LENGTH = 50
+TRIGGER_PHRASE = "phrase"
+TRIGGER_WORD = "word"
+TRIGGER_STOPWORDS = frozenset({
+    "a", "about", "an", "and", "at", "by", "for", "from", "in", "is", "it",
+    "me", "my", "of", "on", "or", "the", "to", "was", "with"
+})
+
+def normalize_trigger(text: Optional[str]) -> str:
+    """Casefold, replace punctuation with spaces and collapse whitespace, capped at TRIGGER_MAX_LENGTH"""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    text = re.sub(r"[^\w\s'-]", " ", text)
+    return " ".join(text.split())[:TRIGGER_MAX_LENGTH].strip()
+
+def trigger_words(phrase: str) -> List[str]:
+    words = {word.strip("'-") for word in phrase.split()}
+    return sorted(word for word in words if len(word) > 1 and word not in TRIGGER_STOPWORDS)
+
+def trigger_index_updates(user_id: str, docs: List[dict]) -> List[UpdateOne]:
+    """One upsert per (kind, term) touched by the given mood entries"""
+    merged: Dict[tuple, dict] = {}
+    for doc in docs:
+        phrase = normalize_trigger(doc.get('trigger'))
+        if not phrase:
+            continue
+        emotion = rollup_field_key(doc.get('emotion') or 'unknown')
+        moment = _mood_entry_moment(doc)
+        terms = [(TRIGGER_PHRASE, phrase)] + [(TRIGGER_WORD, word) for word in trigger_words(phrase)]
+        for kind, term in terms:
+            item = merged.setdefault((kind, term), {"count": 0, "emotions": {}, "last_seen": None})
+            item["count"] += 1
+            item["emotions"][emotion] = item["emotions"].get(emotion, 0) + 1
+            # Legacy entries may have no parseable timestamp; they still count
+            if moment is not None and (item["last_seen"] is None or moment > item["last_seen"]):
+                item["last_seen"] = moment
+    
+    updates = []
+    for (kind, term), item in merged.items():
+        update = {"$inc": {"count": item["count"], **{f"emotions.{e}": n for e, n in item["emotions"].items()}}}
+        if item["last_seen"] is not None:
+            update["$max"] = {"last_seen": item["last_seen"]}
+        updates.append(UpdateOne({"user_id": user_id, "kind": kind, "term": term}, update, upsert=True))
+    return updates
+
+async def record_trigger_index(user_id: Optional[str], docs: List[dict]):
+    if not TRIGGER_INDEX_WRITE or not user_id:
+        return
+    try:
+        updates = trigger_index_updates(user_id, docs)
+        if updates:
+            await db.trigger_index.bulk_write(updates, ordered=False)
+    except Exception as e:
+        logger.error(f"Error updating trigger index: {str(e)}")
+
+async def rebuild_trigger_index(user_id: Optional[str] = None) -> dict:
+    """Recompute the trigger index from raw entries for one user, or every user when user_id is None"""
+    if user_id:
+        user_ids = [user_id]
+    else:
+        user_ids = sorted(uid for uid in await db.mood_entries.distinct("user_id") if uid)
+    
+    totals = {"users": 0, "terms": 0}
+    for uid in user_ids:
+        docs = await db.mood_entries.find(
+            {"user_id": uid, "trigger": {"$nin": [None, ""]}},
+            {"_id": 0, "trigger": 1, "emotion": 1, "timestamp": 1}
+        ).to_list(None)
+        updates = trigger_index_updates(uid, docs)
+        await db.trigger_index.delete_many({"user_id": uid})
+        if updates:
+            await db.trigger_index.bulk_write(updates, ordered=False)
+        totals["users"] += 1
+        totals["terms"] += len(updates)
+    logger.info(f"Rebuilt trigger index: {totals}")
+    return totals
+
+def trigger_index_item(doc: dict) -> dict:
+    return {
+        "trigger": doc["term"],
+        "count": doc["count"],
+        "emotions": {rollup_display_key(e): n for e, n in doc.get("emotions", {}).items()},
+        "last_seen": doc.get("last_seen")
+    }
+
+async def trigger_insights_from_index(user_id: str) -> dict:
+    query = {"user_id": user_id, "kind": TRIGGER_PHRASE}
+    top = await analytics_db.trigger_index.find(query, {"_id": 0}).sort(
+        [("count", DESCENDING), ("term", ASCENDING)]
+    ).limit(10).to_list(10)
+    total = await analytics_db.trigger_index.aggregate([
+        {"$match": query},
+        {"$group": {"_id": None, "entries": {"$sum": "$count"}}}
+    ]).to_list(1)
+    return {
+        "common_triggers": [trigger_index_item(doc) for doc in top],
+        "total_entries": total[0]["entries"] if total else 0
+    }
+
+# Keyset pagination
+# List endpoints sort by (timestamp/date desc, id desc) and hand out an opaque
+# X-Next-Cursor header so every page is an index range scan instead of skip().
+PAGE_LIMIT_MAX = int(os.environ.get('PAGE_LIMIT_MAX', '100'))
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_page_cursor(sort_value, entry_id: str) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = {"$date": sort_value.isoformat()}
+    payload = json.dumps([sort_value, entry_id], separators=(",", ":")).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip("=")
+
+def decode_page_cursor(cursor: str) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, entry_id = json.loads(base64.urlsafe_b64decode(padded))
+        if isinstance(sort_value, dict):
+            sort_value = datetime.fromisoformat(sort_value["$date"])
+        return sort_value, entry_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def fetch_page(collection, query: dict, sort_field: str, limit: int, cursor: Optional[str],
+                     projection: Optional[dict] = None) -> tuple:
+    """Fetch one page newest-first, returning (docs, next_cursor or None)"""
+    limit = max(1, min(limit, PAGE_LIMIT_MAX))
+    if cursor:
+        sort_value, entry_id = decode_page_cursor(cursor)
+        after_cursor = [
+            {sort_field: {"$lt": sort_value}},
+            {sort_field: sort_value, "id": {"$lt": entry_id}}
+        ]
+        if isinstance(sort_value, datetime):
+            # Descending sorts put BSON dates before strings, so unmigrated rows come last
+            after_cursor.append({sort_field: {"$type": "string"}})
+        query = {"$and": [query, {"$or": after_cursor}]}
+    
+    docs = await collection.find(query, projection or {"_id": 0}).sort(
+        [(sort_field, DESCENDING), ("id", DESCENDING)]
+    ).limit(limit + 1).to_list(limit + 1)
+    
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_page_cursor(docs[-1][sort_field], docs[-1]["id"])
+    return docs, next_cursor
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]):
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+# Conditional GETs
+# Cacheable reads send an ETag; a client that presents it in If-None-Match gets
+# an empty 304 while the underlying data is unchanged.
+CONDITIONAL_CACHE_CONTROL = "private, no-cache"
+
+def compute_etag(payload) -> str:
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.sha256(body.encode('utf-8')).hexdigest()[:32] + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak If-None-Match comparison, as RFC 9110 requires for GET"""
+    header = request.headers.get("If-None-Match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    tags = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in tags
+
+def set_conditional_headers(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CONDITIONAL_CACHE_CONTROL
+    response.headers["Vary"] = "Authorization, X-User-Id"
+
+def not_modified(etag: str) -> Response:
+    response = Response(status_code=304)
+    set_conditional_headers(response, etag)
+    return response
+
+def conditional_response(request: Request, payload, etag: str) -> Response:
+    """304 when the caller already holds `etag`, else the payload with its ETag"""
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response = FastJSONResponse(payload)
+    set_conditional_headers(response, etag)
+    return response
+
+# List endpoints don't hash their payload: their weak ETag names the user's data
+# version, a random token in `user_versions` replaced after every write, so an
+# unchanged history is answered with 304 after one primary key lookup.
+async def user_data_version(user_id: str) -> str:
+    doc = await db.user_versions.find_one({"_id": user_id}, {"version": 1})
+    if doc:
+        return doc["version"]
+    doc = await db.user_versions.find_one_and_update(
+        {"_id": user_id},
+        {"$setOnInsert": {"version": uuid.uuid4().hex, "updated_at": datetime.now(timezone.utc)}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc["version"]
+
+async def user_data_etag(user_id: Optional[str], route: str, params: tuple) -> Optional[str]:
+    """Weak ETag for a per-user read, or None for guests"""
+    if not user_id:
+        return None
+    return "W/" + compute_etag([route, params, await user_data_version(user_id)])
+
+async def record_user_write(user_id: Optional[str]):
+    """Drop cached reads and move the user's data version after any write"""
+    read_coalescer.invalidate(user_id)
+    if not user_id:
+        return
+    try:
+        await db.user_versions.update_one(
+            {"_id": user_id},
+            {"$set": {"version": uuid.uuid4().hex, "updated_at": datetime.now(timezone.utc)}},
+            upsert=True
+        )
+    except Exception as e:
+        logger.error(f"Error updating data version for user {user_id}: {str(e)}")
+
+async def conditional_list_response(request: Request, route: str, user_id: Optional[str], params: tuple, load) -> Response:
+    """304 when the caller's ETag is current, else the (docs, next_cursor) page from `load`"""
+    etag = await user_data_etag(user_id, route, params)
+    if etag and etag_matches(request, etag):
+        return not_modified(etag)
+    
+    docs, next_cursor = await read_coalescer.run(route, user_id, params, load)
+    response = FastJSONResponse(docs)
+    set_next_cursor(response, next_cursor)
+    if etag:
+        set_conditional_headers(response, etag)
+    return response
+
+# Read coalescing
+# Dashboard loads fire the same reads for one user from several tabs at once.
+# Identical (route, user, params) requests share a single in-flight computation,
+# and with READ_CACHE_TTL_SECONDS > 0 the result is kept briefly. Every write
+# bumps the user's generation, so later reads never join or reuse stale results.
+READ_CACHE_TTL_SECONDS = float(os.environ.get('READ_CACHE_TTL_SECONDS', '0'))
+READ_CACHE_MAX_ENTRIES = int(os.environ.get('READ_CACHE_MAX_ENTRIES', '2048'))
+
+class ReadCoalescer:
+    """Single-flight for identical concurrent reads plus an optional short-TTL cache"""
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.in_flight: Dict[tuple, asyncio.Future] = {}
+        self.entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.generations: Dict[Optional[str], int] = {}
+        # In-flight plus cached keys per user; a generation is only kept while
+        # the user has some, since only those can be stale
+        self.references: Dict[Optional[str], int] = {}
+        self.stats = {"hits": 0, "joins": 0, "misses": 0, "invalidations": 0}
+
+    async def run(self, route: str, user_id: Optional[str], params: tuple, compute):
+        """Return compute()'s result, sharing it with identical concurrent callers"""
+        key = (route, user_id, params, self.generations.get(user_id, 0))
+        
+        item = self.entries.get(key)
+        if item is not None:
+            result, expires_at = item
+            if expires_at > time.monotonic():
+                self.stats["hits"] += 1
+                return result
+            del self.entries[key]
+            self._release(user_id)
+        
+        future = self.in_flight.get(key)
+        if future is not None:
+            self.stats["joins"] += 1
+            # Shield so a disconnecting follower doesn't cancel the shared work
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if not future.cancelled():
+                    raise
+            # The leader was cancelled (its client went away), so compute afresh
+            return await self.run(route, user_id, params, compute)
+        
+        self.stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self.in_flight[key] = future
+        self._retain(user_id)
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so a leader-only failure doesn't log "never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            if self.ttl_seconds > 0 and key[3] == self.generations.get(user_id, 0):
+                self._store(key, result)
+            return result
+        finally:
+            del self.in_flight[key]
+            self._release(user_id)
+
+    def invalidate(self, user_id: Optional[str]):
+        """Drop cached reads for a user after a write"""
+        self.stats["invalidations"] += 1
+        if user_id in self.references:
+            self.generations[user_id] = self.generations.get(user_id, 0) + 1
+        for key in [key for key in self.entries if key[1] == user_id]:
+            del self.entries[key]
+            self._release(key[1])
+
+    def _retain(self, user_id: Optional[str]):
+        self.references[user_id] = self.references.get(user_id, 0) + 1
+
+    def _release(self, user_id: Optional[str]):
+        remaining = self.references[user_id] - 1
+        if remaining:
+            self.references[user_id] = remaining
+        else:
+            del self.references[user_id]
+            self.generations.pop(user_id, None)
+
+    def _store(self, key: tuple, result):
+        if key not in self.entries:
+            self._retain(key[1])
+        self.entries[key] = (result, time.monotonic() + self.ttl_seconds)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            evicted, _ = self.entries.popitem(last=False)
+            self._release(evicted[1])
+
+    def snapshot(self) -> dict:
+        return {
+            "ttl_seconds": self.ttl_seconds,
+            "size": len(self.entries),
+            "in_flight": len(self.in_flight),
+            "generations": len(self.generations),
+            **self.stats
+        }
+
+read_coalescer = ReadCoalescer(READ_CACHE_TTL_SECONDS, READ_CACHE_MAX_ENTRIES)
+
+# Batched ingestion
+# Offline clients replay queued entries through the batch endpoints: one user
+# lookup, one insert_many and concurrency-limited guidance for the whole batch.
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', '100'))
+BATCH_GUIDANCE_CONCURRENCY = int(os.environ.get('BATCH_GUIDANCE_CONCURRENCY', '4'))
+
+def validate_batch(items: List[dict], model) -> tuple:
+    """Validate each item on its own, returning ([(index, obj)], {index: error result})"""
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items")
+    
+    valid, failures = [], {}
+    for index, item in enumerate(items):
+        try:
+            valid.append((index, model.model_validate(item)))
+        except ValidationError as e:
+            failures[index] = {"index": index, "status": "invalid", "detail": e.errors(include_url=False)}
+    return valid, failures
+
+async def insert_batch(collection, indexed_docs: List[tuple]) -> Dict[int, str]:
+    """insert_many(ordered=False), returning per-item error messages keyed by item index"""
+    if not indexed_docs:
+        return {}
+    try:
+        await collection.insert_many([doc for _, doc in indexed_docs], ordered=False)
+        return {}
+    except BulkWriteError as e:
+        return {
+            indexed_docs[error["index"]][0]: error.get("errmsg", "Write failed")
+            for error in e.details.get("writeErrors", [])
+        }
+
+async def gather_limited(coroutines: List, limit: int) -> List:
+    semaphore = asyncio.Semaphore(limit)
+    
+    async def run(coroutine):
+        async with semaphore:
+            return await coroutine
+    
+    return await asyncio.gather(*(run(coroutine) for coroutine in coroutines))
+
+def batch_response(item_count: int, created: Dict[int, BaseModel], failures: Dict[int, dict]) -> dict:
+    results = [
+        {"index": index, "status": "created", "entry": created[index]} if index in created else failures[index]
+        for index in range(item_count)
+    ]
+    return {"results": results, "created": len(created), "failed": len(failures)}
+
+# Write-behind buffer
+# With WRITE_BUFFER_ENABLED, single mood, gratitude and lifestyle writes go
+# through a bounded queue that flusher tasks drain into insert_many batches of
+# up to WRITE_BUFFER_MAX_BATCH documents or WRITE_BUFFER_MAX_DELAY_MS, so peak
+# check-ins share round trips. WRITE_BUFFER_ACK="flush" makes each request wait
+# for its batch to be written (errors still reach the caller); "enqueue" returns
+# as soon as the document is queued. A full queue blocks writers for up to
+# WRITE_BUFFER_ENQUEUE_TIMEOUT_SECONDS and then sheds them with 503. Shutdown
+# drains the queue before the Mongo client closes. Rollups, the trigger index
+# and the user's data version are updated by the buffer once a document is
+# written, so a failed flush never leaves counts for rows that do not exist.
+WRITE_BUFFER_ENABLED = os.environ.get('WRITE_BUFFER_ENABLED', 'false').lower() == 'true'
+WRITE_BUFFER_ACK = os.environ.get('WRITE_BUFFER_ACK', 'flush').lower()
+WRITE_BUFFER_MAX_BATCH = int(os.environ.get('WRITE_BUFFER_MAX_BATCH', '100'))
+WRITE_BUFFER_MAX_DELAY_MS = float(os.environ.get('WRITE_BUFFER_MAX_DELAY_MS', '20'))
+WRITE_BUFFER_QUEUE_SIZE = int(os.environ.get('WRITE_BUFFER_QUEUE_SIZE', '5000'))
+WRITE_BUFFER_FLUSHERS = int(os.environ.get('WRITE_BUFFER_FLUSHERS', '2'))
+WRITE_BUFFER_ENQUEUE_TIMEOUT_SECONDS = float(os.environ.get('WRITE_BUFFER_ENQUEUE_TIMEOUT_SECONDS', '1'))
+# Write concern for buffered batches; empty values inherit the client's default
+WRITE_BUFFER_W = os.environ.get('WRITE_BUFFER_W', '')
+WRITE_BUFFER_JOURNAL = os.environ.get('WRITE_BUFFER_JOURNAL', '')
+WRITE_BUFFER_WTIMEOUT_MS = os.environ.get('WRITE_BUFFER_WTIMEOUT_MS', '')
+
+def write_buffer_concern() -> WriteConcern:
+    """WriteConcern built from the WRITE_BUFFER_W / _JOURNAL / _WTIMEOUT_MS settings"""
+    options = {}
+    if WRITE_BUFFER_W:
+        options["w"] = int(WRITE_BUFFER_W) if WRITE_BUFFER_W.isdigit() else WRITE_BUFFER_W
+    if WRITE_BUFFER_JOURNAL:
+        options["j"] = WRITE_BUFFER_JOURNAL.lower() == "true"
+    if WRITE_BUFFER_WTIMEOUT_MS:
+        options["wtimeout"] = int(WRITE_BUFFER_WTIMEOUT_MS)
+    return WriteConcern(**options)
+
+# Derived data updated for every document written through the buffer
+WRITE_BUFFER_SIDE_EFFECTS = {
+    "mood_entries": (record_mood_rollups, record_trigger_index),
+    "lifestyle_assessments": (record_lifestyle_rollups,),
+}
+
+class WriteBuffer:
+    """Queue of (collection, document) inserts flushed in insert_many batches"""
+
+    def __init__(self, flushers: int, queue_size: int, max_batch: int, max_delay: float, write_concern: WriteConcern):
+        self.flusher_count = flushers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.write_concern = write_concern
+        self.flushers: List[asyncio.Task] = []
+        self.draining = False
+        self.stats = {"queued": 0, "inserted": 0, "failed": 0, "batches": 0, "rejected": 0}
+
+    @property
+    def running(self) -> bool:
+        return bool(self.flushers)
+
+    async def start(self):
+        if self.running:
+            return
+        self.draining = False
+        self.flushers = [asyncio.create_task(self._flusher(i)) for i in range(self.flusher_count)]
+        logger.info(f"Write buffer started with {self.flusher_count} flushers")
+
+    async def stop(self):
+        """Flush everything still queued, then stop the flushers"""
+        if not self.running:
+            return
+        self.draining = True
+        await self.queue.join()
+        for task in self.flushers:
+            task.cancel()
+        await asyncio.gather(*self.flushers, return_exceptions=True)
+        self.flushers = []
+        logger.info("Write buffer drained")
+
+    async def insert(self, collection_name: str, doc: dict, user_id: Optional[str] = None, wait: bool = False):
+        """Insert doc and update its derived data, buffered when running; waits for the write when `wait` or ACK is "flush" """
+        if not self.running or self.draining:
+            await db[collection_name].insert_one(doc)
+            await self._after_write(collection_name, {user_id: [doc]})
+            return
+        
+        future = asyncio.get_running_loop().create_future() if wait or WRITE_BUFFER_ACK == "flush" else None
+        item = (collection_name, doc, user_id, future)
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Backpressure: wait briefly for the flushers to make room, then shed
+            try:
+                await asyncio.wait_for(self.queue.put(item), WRITE_BUFFER_ENQUEUE_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                self.stats["rejected"] += 1
+                logger.warning("Write buffer full, shedding request")
+                raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+        self.stats["queued"] += 1
+        if future is not None:
+            await future
+
+    async def _next_batch(self) -> list:
+        batch = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_batch:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            remaining = deadline - loop.time()
+            if remaining <= 0 or self.draining:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _flusher(self, flusher_id: int):
+        while True:
+            batch = await self._next_batch()
+            try:
+                by_collection: Dict[str, list] = {}
+                for item in batch:
+                    by_collection.setdefault(item[0], []).append(item)
+                await asyncio.gather(*(self._write(name, items) for name, items in by_collection.items()))
+            except Exception as e:
+                logger.error(f"Write buffer flusher {flusher_id} failed: {str(e)}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    async def _write(self, collection_name: str, items: list):
+        collection = db[collection_name].with_options(write_concern=self.write_concern)
+        started = time.perf_counter()
+        errors: Dict[int, Exception] = {}
+        try:
+            await collection.insert_many([doc for _, doc, _, _ in items], ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get("writeErrors", []):
+                errors[error["index"]] = Exception(error.get("errmsg", "Write failed"))
+            if e.details.get("writeConcernErrors"):
+                logger.warning(f"Write concern not satisfied for {collection_name} batch: {e.details['writeConcernErrors']}")
+        except Exception as e:
+            errors = {index: e for index in range(len(items))}
+        
+        self.stats["batches"] += 1
+        self.stats["inserted"] += len(items) - len(errors)
+        self.stats["failed"] += len(errors)
+        metrics.observe("write_buffer_flush_seconds", time.perf_counter() - started, collection=collection_name)
+        metrics.observe("write_buffer_batch_size", len(items), collection=collection_name)
+        
+        written: Dict[Optional[str], list] = {}
+        for index, (_, doc, user_id, _) in enumerate(items):
+            if index not in errors:
+                written.setdefault(user_id, []).append(doc)
+        await self._after_write(collection_name, written)
+        for index, (_, doc, _, future) in enumerate(items):
+            error = errors.get(index)
+            if future is None:
+                if error:
+                    logger.error(f"Buffered insert into {collection_name} failed for {doc.get('id')}: {str(error)}")
+            elif not future.done():
+                if error:
+                    future.set_exception(error)
+                else:
+                    future.set_result(None)
+
+    async def _after_write(self, collection_name: str, docs_by_user: Dict[Optional[str], list]):
+        """Update derived data for written documents before their writers are released"""
+        for user_id, docs in docs_by_user.items():
+            for record in WRITE_BUFFER_SIDE_EFFECTS.get(collection_name, ()):
+                await record(user_id, docs)
+            await record_user_write(user_id)
+
+    def snapshot(self) -> dict:
+        return {"running": self.running, "queue_depth": self.queue.qsize(), **self.stats}
+
+write_buffer = WriteBuffer(
+    WRITE_BUFFER_FLUSHERS, WRITE_BUFFER_QUEUE_SIZE, WRITE_BUFFER_MAX_BATCH,
+    WRITE_BUFFER_MAX_DELAY_MS / 1000, write_buffer_concern()
+)
 
 # Routes
 @api_router.get("/")
@@ -180,35 +2365,178 @@ async def root():
     return {"message": "Mood Sync API"}
 
 # Health check endpoints for Kubernetes
+class StartupReadiness:
+    """Warm-up steps that must finish before /health reports ready.
+
+    A step marked degraded counts as finished: the server can serve traffic
+    without it (e.g. guidance falls back while the LLM SDK is unavailable) and
+    keeps retrying it in the background.
+    """
+
+    def __init__(self, steps: tuple):
+        self.steps = {step: "pending" for step in steps}
+        self.errors: Dict[str, str] = {}
+
+    @property
+    def ready(self) -> bool:
+        return all(state in ("ready", "degraded") for state in self.steps.values())
+
+    @property
+    def degraded(self) -> bool:
+        return "degraded" in self.steps.values()
+
+    @property
+    def failed(self) -> bool:
+        return "failed" in self.steps.values()
+
+    def mark(self, step: str, error: Optional[Exception] = None, degraded: bool = False):
+        self.steps[step] = ("degraded" if degraded else "failed") if error else "ready"
+        if error:
+            self.errors[step] = str(error)
+        else:
+            self.errors.pop(step, None)
+
+    def snapshot(self) -> dict:
+        return {"steps": dict(self.steps), "errors": dict(self.errors), "import_seconds": dict(import_durations)}
+
+readiness = StartupReadiness(("database", "llm_client"))
+
 @app.get("/health")
 async def health_check():
-    """Health check endpoint for Kubernetes liveness/readiness probes"""
+    """Readiness probe: healthy once the database and warm-up steps are done"""
+    if not readiness.ready:
+        raise HTTPException(status_code=503, detail={"status": "starting", **readiness.snapshot()})
     try:
         # Test MongoDB connection
         await db.command('ping')
-        return {"status": "healthy", "service": "mood-sync-backend", "database": "connected"}
+        return {
+            "status": "degraded" if readiness.degraded else "healthy",
+            "service": "mood-sync-backend",
+            "database": "connected",
+            "startup": readiness.snapshot(),
+            "guidance_cache": guidance_cache.snapshot(),
+            "read_cache": read_coalescer.snapshot(),
+            "identity_cache": identity_cache.snapshot(),
+            "write_buffer": write_buffer.snapshot(),
+            "admission": admission.snapshot(),
+            "llm_circuit_breaker": llm_breaker.snapshot()
+        }
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
         raise HTTPException(status_code=503, detail=f"Service unavailable: {str(e)}")
 
 @app.get("/healthz")
 async def healthz():
-    """Alternative health check endpoint (basic liveness check)"""
+    """Liveness probe: the process is up, regardless of warm-up state"""
     return {"status": "ok"}
 
-# Startup event to verify connections
-@app.on_event("startup")
-async def startup_event():
-    """Verify all connections on startup"""
+metrics.gauge("guidance_queue_depth", "Guidance jobs waiting for a worker")
+metrics.gauge("bcrypt_in_flight", "Password hashing calls running or queued")
+metrics.gauge("guidance_cache_entries", "Entries in the in-memory guidance cache")
+metrics.gauge("guidance_cache_events", "Cumulative guidance cache events by type")
+metrics.gauge("llm_circuit_open", "1 when the LLM circuit breaker is open or half open")
+metrics.gauge("read_cache_events", "Cumulative read coalescing events by type")
+metrics.gauge("identity_cache_events", "Cumulative session token verification events by type")
+metrics.gauge("write_buffer_queue_depth", "Buffered inserts waiting to be flushed")
+metrics.gauge("llm_calls_in_flight", "LLM guidance requests currently waiting on the provider")
+metrics.gauge("requests_in_flight", "Admitted requests currently being handled")
+metrics.histogram("write_buffer_flush_seconds", "insert_many latency for buffered write batches")
+metrics.histogram("write_buffer_batch_size", "Documents per buffered write batch", (1, 2, 5, 10, 25, 50, 100, 250, 500))
+metrics.gauge("import_duration_seconds", "Time spent importing the server module and deferred dependencies")
+
+def collect_runtime_metrics():
+    metrics.set("guidance_queue_depth", guidance_pipeline.queue.qsize())
+    metrics.set("bcrypt_in_flight", password_hasher.in_flight)
+    metrics.set("guidance_cache_entries", len(guidance_cache.entries))
+    for event, count in guidance_cache.stats.items():
+        metrics.set("guidance_cache_events", count, event=event)
+    metrics.set("llm_circuit_open", 0 if llm_breaker.state == "closed" else 1)
+    for event, count in read_coalescer.stats.items():
+        metrics.set("read_cache_events", count, event=event)
+    metrics.set("write_buffer_queue_depth", write_buffer.queue.qsize())
+    metrics.set("llm_calls_in_flight", admission.llm_in_flight)
+    metrics.set("requests_in_flight", admission.in_flight)
+    for event, count in identity_cache.stats.items():
+        metrics.set("identity_cache_events", count, event=event)
+    for component, seconds in import_durations.items():
+        metrics.set("import_duration_seconds", seconds, component=component)
+
+metrics.add_collector(collect_runtime_metrics)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus text exposition of request, Mongo, LLM and event loop metrics"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+background_tasks: List[asyncio.Task] = []
+
+STARTUP_DB_RETRY_SECONDS = float(os.environ.get('STARTUP_DB_RETRY_SECONDS', '2'))
+LLM_IMPORT_RETRY_SECONDS = float(os.environ.get('LLM_IMPORT_RETRY_SECONDS', '5'))
+LLM_IMPORT_RETRY_MAX_SECONDS = float(os.environ.get('LLM_IMPORT_RETRY_MAX_SECONDS', '300'))
+
+async def connect_database():
+    """Ping MongoDB until it answers, then run the database startup steps"""
+    while True:
+        try:
+            await db.command('ping')
+            logger.info("✅ MongoDB connection successful")
+            break
+        except Exception as e:
+            logger.error(f"❌ MongoDB connection failed: {str(e)}")
+            logger.error(f"MONGO_URL: {os.environ.get('MONGO_URL', 'NOT SET')}")
+            logger.error(f"DB_NAME: {os.environ.get('DB_NAME', 'NOT SET')}")
+            await asyncio.sleep(STARTUP_DB_RETRY_SECONDS)
+    
     try:
-        # Test MongoDB connection
-        await db.command('ping')
-        logger.info("✅ MongoDB connection successful")
+        if INDEX_BOOTSTRAP:
+            await ensure_indexes()
+            await verify_query_plans()
+        
+        if GUIDANCE_MODE == "async":
+            await guidance_pipeline.start()
+        
+        if DATE_MIGRATION_ON_STARTUP:
+            background_tasks.append(asyncio.create_task(migrate_dates_in_background()))
+        
+        if WRITE_BUFFER_ENABLED:
+            await write_buffer.start()
+        
+        await user_deletion_jobs.start()
+        readiness.mark("database")
     except Exception as e:
-        logger.error(f"❌ MongoDB connection failed: {str(e)}")
-        logger.error(f"MONGO_URL: {os.environ.get('MONGO_URL', 'NOT SET')}")
-        logger.error(f"DB_NAME: {os.environ.get('DB_NAME', 'NOT SET')}")
-        raise
+        logger.error(f"Database startup failed: {str(e)}")
+        readiness.mark("database", e)
+
+async def prewarm_llm_client():
+    """Import the LLM SDK, retrying with backoff; guidance falls back while it is missing"""
+    delay = LLM_IMPORT_RETRY_SECONDS
+    while True:
+        try:
+            await ensure_llm_client()
+            readiness.mark("llm_client")
+            return
+        except Exception as e:
+            logger.error(f"LLM client import failed, retrying in {delay:.0f}s: {str(e)}")
+            readiness.mark("llm_client", e, degraded=True)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, LLM_IMPORT_RETRY_MAX_SECONDS)
+
+async def wait_until_ready(timeout: float = 30):
+    """Block until every startup step has finished (used by scripts and benchmarks)"""
+    deadline = time.monotonic() + timeout
+    while not readiness.ready:
+        if readiness.failed or time.monotonic() > deadline:
+            raise RuntimeError(f"Startup did not complete: {readiness.snapshot()}")
+        await asyncio.sleep(0.05)
+
+# Startup returns immediately so the server starts listening; database checks and
+# the LLM import finish in the background and gate /health instead.
+@app.on_event("startup")
+async def startup_event():
+    """Start background warm-up without blocking the server from listening"""
+    background_tasks.append(asyncio.create_task(monitor_event_loop_lag()))
+    background_tasks.append(asyncio.create_task(connect_database()))
+    background_tasks.append(asyncio.create_task(prewarm_llm_client()))
 
 @api_router.post("/mood/submit", response_model=MoodEntry)
 async def submit_mood(mood_input: MoodEntryCreate, request: Request):
@@ -216,17 +2544,44 @@ async def submit_mood(mood_input: MoodEntryCreate, request: Request):
         user_id = get_user_id_from_header(request)
         
         # Get user name for personalization
-        user_name = None
+        user_name = await get_user_name(request, user_id)
         if user_id:
-            user = await db.users.find_one({"id": user_id}, {"_id": 0, "name": 1})
-            if user:
-                user_name = user.get("name")
+            if user_name:
                 logger.info(f"Generating guidance for user: {user_name} (id: {user_id})")
             else:
                 logger.warning(f"User not found for id: {user_id}")
         else:
             logger.info("Generating guidance for guest user")
         
+        if GUIDANCE_MODE == "async" and guidance_pipeline.running:
+            # Store the entry right away and let a worker fill in the guidance
+            mood_dict = mood_input.model_dump()
+            mood_dict['ai_guidance'] = ""
+            mood_dict['guidance_status'] = GUIDANCE_PENDING
+            mood_dict['user_id'] = user_id
+            mood_obj = MoodEntry(**mood_dict)
+            
+            doc = {**mood_obj.model_dump(), **guidance_pipeline.lease()}
+            # The guidance worker updates this document, so it must exist first
+            await write_buffer.insert("mood_entries", doc, user_id, wait=True)
+            
+            if guidance_pipeline.enqueue(mood_obj.id, mood_input, user_name, user_id):
+                return mood_obj
+            
+            # Queue is full, generate inline rather than leave the entry pending
+            logger.warning("Guidance queue full, generating guidance inline")
+            mood_obj.ai_guidance = await generate_mood_guidance(mood_input, user_name)
+            mood_obj.guidance_status = GUIDANCE_COMPLETE
+            await db.mood_entries.update_one(
+                {"id": mood_obj.id},
+                {
+                    "$set": {"ai_guidance": mood_obj.ai_guidance, "guidance_status": GUIDANCE_COMPLETE},
+                    "$unset": GUIDANCE_LEASE_FIELDS
+                }
+            )
+            await record_user_write(user_id)
+            return mood_obj
+        
         # Generate AI guidance with user name
         ai_guidance = await generate_mood_guidance(mood_input, user_name)
         
@@ -238,73 +2593,330 @@ async def submit_mood(mood_input: MoodEntryCreate, request: Request):
         
         # Store in MongoDB
         doc = mood_obj.model_dump()
-        doc['timestamp'] = doc['timestamp'].isoformat()
         
-        await db.mood_entries.insert_one(doc)
+        await write_buffer.insert("mood_entries", doc, user_id)
         
         return mood_obj
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error submitting mood: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.get("/mood/history", response_model=List[MoodEntry])
-async def get_mood_history(request: Request, limit: int = 30):
+# Producers keep running (and persist the entry) even if the SSE client disconnects
+guidance_stream_tasks = set()
+
+@api_router.post("/mood/submit/stream")
+async def submit_mood_stream(mood_input: MoodEntryCreate, request: Request):
+    """Submit a mood entry and stream its guidance over Server-Sent Events.
+
+    Events: `entry` (the entry with pending guidance), `delta` ({"text": ...}
+    chunks), then `done` with the stored MoodEntry, or `error`. When the LLM
+    client cannot stream, the response is the plain JSON MoodEntry that
+    /mood/submit returns; clients tell the two apart by Content-Type.
+    """
+    if not await llm_can_stream():
+        return await submit_mood(mood_input, request)
+    
+    user_id = get_user_id_from_header(request)
+    
+    user_name = await get_user_name(request, user_id)
+    
+    mood_dict = mood_input.model_dump()
+    mood_dict['ai_guidance'] = ""
+    mood_dict['guidance_status'] = GUIDANCE_PENDING
+    mood_dict['user_id'] = user_id
+    mood_obj = MoodEntry(**mood_dict)
+    events: asyncio.Queue = asyncio.Queue()
+    
+    async def produce():
+        try:
+            parts = []
+            async for text in stream_mood_guidance(mood_input, user_name):
+                parts.append(text)
+                await events.put(("delta", {"text": text}))
+            
+            mood_obj.ai_guidance = "".join(parts)
+            mood_obj.guidance_status = GUIDANCE_COMPLETE
+            doc = mood_obj.model_dump()
+            await db.mood_entries.insert_one(doc)
+            await record_mood_rollups(user_id, [doc])
+            await record_trigger_index(user_id, [doc])
+            await record_user_write(user_id)
+            await events.put(("done", mood_obj))
+        except Exception as e:
+            logger.error(f"Error streaming mood submission: {str(e)}")
+            await events.put(("error", {"detail": str(e)}))
+    
+    task = asyncio.create_task(produce())
+    guidance_stream_tasks.add(task)
+    task.add_done_callback(guidance_stream_tasks.discard)
+    
+    async def event_stream():
+        yield sse_event("entry", mood_obj)
+        while True:
+            event, data = await events.get()
+            yield sse_event(event, data)
+            if event in ("done", "error"):
+                break
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.post("/mood/submit/batch")
+async def submit_mood_batch(items: List[dict], request: Request):
+    """Submit several queued mood entries at once with per-item results"""
     try:
         user_id = get_user_id_from_header(request)
-        query = {"user_id": user_id} if user_id else {}
+        valid, failures = validate_batch(items, MoodEntryCreate)
+        
+        # admit_request charged one entry; every further entry may call the LLM too
+        entry_cost = ROUTE_COSTS["POST /api/mood/submit/batch"][0]
+        if RATE_LIMIT_ENABLED and len(valid) * entry_cost > RATE_LIMIT_BURST:
+            raise HTTPException(
+                status_code=413,
+                detail=f"Batch exceeds the rate limit, send at most {int(RATE_LIMIT_BURST // entry_cost)} entries at a time"
+            )
+        await charge_rate_limit(request, (len(valid) - 1) * entry_cost)
         
-        # Get recent mood entries
-        mood_entries = await db.mood_entries.find(
-            query, 
-            {"_id": 0}
-        ).sort("timestamp", -1).limit(limit).to_list(limit)
+        # One user lookup for the whole batch
+        user_name = await get_user_name(request, user_id) if valid else None
+        
+        background = GUIDANCE_MODE == "async" and guidance_pipeline.running
+        if background:
+            guidance = [""] * len(valid)
+        else:
+            guidance = await gather_limited(
+                [generate_mood_guidance(mood_input, user_name) for _, mood_input in valid],
+                BATCH_GUIDANCE_CONCURRENCY
+            )
+        
+        entries, indexed_docs = {}, []
+        for (index, mood_input), ai_guidance in zip(valid, guidance):
+            mood_dict = mood_input.model_dump()
+            mood_dict['ai_guidance'] = ai_guidance
+            mood_dict['guidance_status'] = GUIDANCE_PENDING if background else GUIDANCE_COMPLETE
+            mood_dict['user_id'] = user_id
+            entries[index] = MoodEntry(**mood_dict)
+            
+            doc = entries[index].model_dump()
+            if background:
+                doc.update(guidance_pipeline.lease())
+            indexed_docs.append((index, doc))
+        
+        write_errors = await insert_batch(db.mood_entries, indexed_docs)
+        for index, message in write_errors.items():
+            failures[index] = {"index": index, "status": "error", "detail": message}
+            del entries[index]
+        
+        inserted_docs = [doc for index, doc in indexed_docs if index in entries]
+        await record_mood_rollups(user_id, inserted_docs)
+        await record_trigger_index(user_id, inserted_docs)
+        await record_user_write(user_id)
+        
+        if background:
+            overflow = [
+                (index, mood_input) for index, mood_input in valid
+                if index in entries and not guidance_pipeline.enqueue(entries[index].id, mood_input, user_name, user_id)
+            ]
+            # Queue is full, generate the remainder inline rather than leave them pending
+            overflow_guidance = await gather_limited(
+                [generate_mood_guidance(mood_input, user_name) for _, mood_input in overflow],
+                BATCH_GUIDANCE_CONCURRENCY
+            )
+            for (index, _), ai_guidance in zip(overflow, overflow_guidance):
+                entries[index].ai_guidance = ai_guidance
+                entries[index].guidance_status = GUIDANCE_COMPLETE
+                await db.mood_entries.update_one(
+                    {"id": entries[index].id},
+                    {
+                        "$set": {"ai_guidance": ai_guidance, "guidance_status": GUIDANCE_COMPLETE},
+                        "$unset": GUIDANCE_LEASE_FIELDS
+                    }
+                )
+            if overflow:
+                await record_user_write(user_id)
+        
+        return batch_response(len(items), entries, failures)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error submitting mood batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# List endpoints return projected documents straight through FastJSONResponse;
+# response_model stays on the routes for the OpenAPI schema only.
+MOOD_ENTRY_PROJECTION, MOOD_ENTRY_DEFAULTS = response_fields(MoodEntry)
+LIFESTYLE_PROJECTION, LIFESTYLE_DEFAULTS = response_fields(LifestyleAssessment)
+
+@api_router.get("/mood/history", response_model=List[MoodEntry])
+async def get_mood_history(request: Request, limit: int = 30, cursor: Optional[str] = None):
+    try:
+        user_id = get_user_id_from_header(request)
+        if not user_id:
+            raise HTTPException(status_code=401, detail="User not authenticated")
+        query = {"user_id": user_id}
         
-        # Convert ISO string timestamps back to datetime objects
-        for entry in mood_entries:
-            if isinstance(entry['timestamp'], str):
-                entry['timestamp'] = datetime.fromisoformat(entry['timestamp'])
+        async def load():
+            # Get recent mood entries
+            mood_entries, next_cursor = await fetch_page(
+                db.mood_entries, query, "timestamp", limit, cursor, MOOD_ENTRY_PROJECTION
+            )
+            
+            # Rows not yet migrated still hold ISO string timestamps
+            for entry in mood_entries:
+                if isinstance(entry['timestamp'], str):
+                    entry['timestamp'] = as_datetime(entry['timestamp'])
+            return with_defaults(mood_entries, MOOD_ENTRY_DEFAULTS), next_cursor
         
-        return mood_entries
+        return await conditional_list_response(request, "mood_history", user_id, (limit, cursor), load)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching mood history: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/mood/guidance/{entry_id}")
+async def get_mood_guidance(entry_id: str, request: Request, wait: float = 0):
+    """Poll the guidance status of a mood entry, optionally long-polling up to `wait` seconds"""
+    try:
+        user_id = get_user_id_from_header(request)
+        query = {"id": entry_id}
+        if user_id:
+            query["user_id"] = user_id
+        projection = {"_id": 0, "id": 1, "guidance_status": 1, "ai_guidance": 1}
+        
+        entry = await db.mood_entries.find_one(query, projection)
+        if not entry:
+            raise HTTPException(status_code=404, detail="Entry not found")
+        
+        if entry.get('guidance_status') == GUIDANCE_PENDING and wait > 0:
+            await guidance_pipeline.wait_for(entry_id, min(wait, GUIDANCE_MAX_WAIT_SECONDS))
+            entry = await db.mood_entries.find_one(query, projection)
+        
+        return {
+            "id": entry['id'],
+            "guidance_status": entry.get('guidance_status', GUIDANCE_COMPLETE),
+            "ai_guidance": entry.get('ai_guidance', "")
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching mood guidance: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def daily_trends_from_rollups(user_id: str, days: int) -> List[MoodTrend]:
+    start_key = (datetime.now(timezone.utc) - timedelta(days=days - 1)).strftime("%Y-%m-%d")
+    rollups = await analytics_db.mood_rollups.find(
+        {"user_id": user_id, "period": "day", "key": {"$gte": start_key}},
+        {"_id": 0, "key": 1, "count": 1, "sums": 1, "emotions": 1}
+    ).sort("key", -1).to_list(days)
+    
+    trends = []
+    for day in rollups:
+        count = day.get("count") or 1
+        dominant = max(day.get("emotions", {}).items(), key=lambda item: item[1], default=("", 0))[0]
+        trends.append(MoodTrend(
+            date=day["key"],
+            emotion=rollup_display_key(dominant),
+            **{field: round(day["sums"].get(field, 0) / count) for field in MOOD_LEVEL_FIELDS}
+        ))
+    return trends
+
+async def daily_trends_from_entries(user_id: str, days: int) -> List[MoodTrend]:
+    """Same points as daily_trends_from_rollups, grouped from raw entries for users not yet backfilled"""
+    start = datetime.now(timezone.utc).date() - timedelta(days=days - 1)
+    since = datetime(start.year, start.month, start.day, tzinfo=timezone.utc)
+    entries = await analytics_db.mood_entries.find(
+        {"user_id": user_id, "$or": since_query("timestamp", since)},
+        {"_id": 0, "timestamp": 1, "emotion": 1, **{field: 1 for field in MOOD_LEVEL_FIELDS}}
+    ).sort("timestamp", -1).limit(ANALYTICS_MAX_ENTRIES).to_list(ANALYTICS_MAX_ENTRIES)
+    
+    return [
+        MoodTrend(
+            date=day["date"],
+            emotion=day["emotion"],
+            **{field: round(day[field]) for field in MOOD_LEVEL_FIELDS}
+        )
+        for day in MoodColumns.from_docs(entries, MOOD_LEVEL_FIELDS).daily_means()
+    ]
+
 @api_router.get("/mood/trends", response_model=List[MoodTrend])
-async def get_mood_trends(request: Request, days: int = 14):
+async def get_mood_trends(request: Request, days: int = 14, granularity: str = "entry"):
+    """Per-entry trend points, or one averaged point per day with granularity=day"""
     try:
         user_id = get_user_id_from_header(request)
-        query = {"user_id": user_id} if user_id else {}
-        
-        # Calculate date range
-        end_date = datetime.now(timezone.utc)
-        start_date = end_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        
-        # Get mood entries for trend analysis
-        mood_entries = await db.mood_entries.find(
-            query,
-            {"_id": 0, "timestamp": 1, "emotion": 1, "emotion_level": 1, "energy_level": 1, "focus_level": 1}
-        ).sort("timestamp", -1).limit(days * 5).to_list(days * 5)
-        
-        # Convert to trend format
-        trends = []
-        for entry in mood_entries:
-            timestamp = entry['timestamp']
-            if isinstance(timestamp, str):
-                timestamp = datetime.fromisoformat(timestamp)
+        if not user_id:
+            raise HTTPException(status_code=401, detail="User not authenticated")
+        query = {"user_id": user_id}
+        
+        if granularity == "day":
+            async def load_daily():
+                # Rollups are only complete for every user once the backfill has run
+                daily_trends = daily_trends_from_rollups if ROLLUPS_READ else daily_trends_from_entries
+                trends = [trend.model_dump() for trend in await daily_trends(user_id, days)]
+                return trends, "W/" + compute_etag(trends)
+            
+            return conditional_response(request, *await read_coalescer.run("mood_trends_daily", user_id, (days,), load_daily))
+        
+        async def load():
+            # Get mood entries for trend analysis
+            mood_entries = await analytics_db.mood_entries.find(
+                query,
+                {"_id": 0, "timestamp": 1, "emotion": 1, "emotion_level": 1, "energy_level": 1, "focus_level": 1}
+            ).sort("timestamp", -1).limit(days * 5).to_list(days * 5)
             
-            trends.append(MoodTrend(
-                date=timestamp.strftime("%Y-%m-%d %H:%M"),
-                emotion=entry['emotion'],
-                emotion_level=entry['emotion_level'],
-                energy_level=entry['energy_level'],
-                focus_level=entry['focus_level']
-            ))
-        
-        return trends
+            # Convert to trend format
+            columns = MoodColumns.from_docs(mood_entries, MOOD_LEVEL_FIELDS)
+            levels = [columns.levels[field].astype(int).tolist() for field in MOOD_LEVEL_FIELDS]
+            trends = [
+                {"date": date, "emotion": emotion, **dict(zip(MOOD_LEVEL_FIELDS, values))}
+                for date, emotion, *values in zip(columns.trend_labels(), columns.emotions.tolist(), *levels)
+            ]
+            return trends, "W/" + compute_etag(trends)
+        
+        return conditional_response(request, *await read_coalescer.run("mood_trends", user_id, (days,), load))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching mood trends: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+ANALYTICS_MAX_ENTRIES = int(os.environ.get('ANALYTICS_MAX_ENTRIES', '20000'))
+ANALYTICS_WINDOWS = (7, 30)
+
+@api_router.get("/mood/analytics")
+async def get_mood_analytics(request: Request, days: int = 30, weeks: int = 8):
+    """Weekly means, rolling 7/30-day averages and volatility, and level correlations"""
+    try:
+        user_id = get_user_id_from_header(request)
+        if not user_id:
+            raise HTTPException(status_code=401, detail="User not authenticated")
+        
+        async def load():
+            entries = await analytics_db.mood_entries.find(
+                {"user_id": user_id},
+                {"_id": 0, "timestamp": 1, "emotion": 1, **{field: 1 for field in MOOD_LEVEL_FIELDS}}
+            ).sort("timestamp", -1).limit(ANALYTICS_MAX_ENTRIES).to_list(ANALYTICS_MAX_ENTRIES)
+            
+            columns = MoodColumns.from_docs(entries, MOOD_LEVEL_FIELDS)
+            return {
+                "total_entries": len(columns),
+                "weekly_means": columns.weekly_means(weeks),
+                "rolling": {str(window): columns.rolling(window, days) for window in ANALYTICS_WINDOWS},
+                "correlations": columns.correlations()
+            }
+        
+        return await read_coalescer.run("mood_analytics", user_id, (days, weeks), load)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error computing mood analytics: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @api_router.post("/lifestyle/assess", response_model=LifestyleAssessment)
 async def submit_lifestyle_assessment(assessment: LifestyleAssessmentCreate, request: Request):
     try:
@@ -328,111 +2940,154 @@ async def submit_lifestyle_assessment(assessment: LifestyleAssessmentCreate, req
         
         # Store in MongoDB
         doc = assessment_obj.model_dump()
-        await db.lifestyle_assessments.insert_one(doc)
+        await write_buffer.insert("lifestyle_assessments", doc, user_id)
         
         return assessment_obj
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error submitting lifestyle assessment: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/lifestyle/history", response_model=List[LifestyleAssessment])
-async def get_lifestyle_history(limit: int = 10):
+async def get_lifestyle_history(request: Request, limit: int = 10, cursor: Optional[str] = None):
     try:
-        assessments = await db.lifestyle_assessments.find(
-            {},
-            {"_id": 0}
-        ).sort("date", -1).limit(limit).to_list(limit)
+        user_id = get_user_id_from_header(request)
+        if not user_id:
+            raise HTTPException(status_code=401, detail="User not authenticated")
+        query = {"user_id": user_id}
+        
+        async def load():
+            assessments, next_cursor = await fetch_page(
+                db.lifestyle_assessments, query, "date", limit, cursor, LIFESTYLE_PROJECTION
+            )
+            return with_defaults(assessments, LIFESTYLE_DEFAULTS), next_cursor
         
-        return assessments
+        return await conditional_list_response(request, "lifestyle_history", user_id, (limit, cursor), load)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching lifestyle history: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+WEEKLY_REPORT_WEEKS = 8
+
+def summarize_week(week: str, entries_count: int, pillar_averages: dict) -> dict:
+    """Round one week's pillar averages into the weekly_trends shape"""
+    overall_avg = sum(pillar_averages[pillar] for pillar in LIFESTYLE_PILLARS) / len(LIFESTYLE_PILLARS)
+    return {
+        "week": week,
+        "overall_average": round(overall_avg, 1),
+        "entries_count": entries_count,
+        "pillars": {pillar: round(pillar_averages[pillar], 1) for pillar in LIFESTYLE_PILLARS}
+    }
+
+def build_wellness_report(weekly_trends: List[dict], total_entries: int) -> dict:
+    """Assemble the weekly report from newest-first weekly_trends rows"""
+    # Calculate current week (most recent)
+    current_week_data = weekly_trends[0] if weekly_trends else None
+    
+    # Determine overall trend (compare last 2 weeks if available)
+    trend = "stable"
+    if len(weekly_trends) >= 2:
+        current_avg = weekly_trends[0]['overall_average']
+        previous_avg = weekly_trends[1]['overall_average']
+        if current_avg > previous_avg + 0.5:
+            trend = "improving"
+        elif current_avg < previous_avg - 0.5:
+            trend = "declining"
+    
+    # Build report
+    report = {
+        "period": f"Last {len(weekly_trends)} weeks",
+        "total_entries": total_entries,
+        "overall_average": current_week_data['overall_average'] if current_week_data else 0,
+        "trend": trend,
+        "pillars": current_week_data['pillars'] if current_week_data else {},
+        "weekly_trends": weekly_trends,
+        "strengths": [],
+        "areas_for_improvement": []
+    }
+    
+    # Identify strengths and areas for improvement (from current week)
+    if current_week_data:
+        for key, value in current_week_data["pillars"].items():
+            if value >= 8:
+                report["strengths"].append(key.replace("_", " ").title())
+            elif value <= 5:
+                report["areas_for_improvement"].append(key.replace("_", " ").title())
+    
+    return report
+
+async def weekly_report_from_rollups(user_id: str) -> dict:
+    total = await analytics_db.lifestyle_rollups.find_one({"user_id": user_id, "period": "all", "key": "all"}, {"_id": 0, "count": 1})
+    if not total:
+        return {"message": "No data available for report"}
+    
+    weeks = await analytics_db.lifestyle_rollups.find(
+        {"user_id": user_id, "period": "week"},
+        {"_id": 0, "key": 1, "count": 1, "sums": 1}
+    ).sort("key", -1).limit(WEEKLY_REPORT_WEEKS).to_list(WEEKLY_REPORT_WEEKS)
+    
+    weekly_trends = [
+        summarize_week(week["key"], week["count"], {
+            pillar: week["sums"].get(pillar, 0) / week["count"] for pillar in LIFESTYLE_PILLARS
+        })
+        for week in weeks if week.get("count")
+    ]
+    return build_wellness_report(weekly_trends, total["count"])
+
 @api_router.get("/lifestyle/weekly-report")
 async def get_weekly_wellness_report(request: Request):
     try:
-        from collections import defaultdict
-        
         user_id = get_user_id_from_header(request)
-        query = {"user_id": user_id} if user_id else {}
-        
-        # Get all lifestyle assessments (limited to last 1000 for performance)
-        all_assessments = await db.lifestyle_assessments.find(query, {"_id": 0}).sort("date", -1).limit(1000).to_list(1000)
-        
-        if not all_assessments:
-            return {"message": "No data available for report"}
+        if not user_id:
+            raise HTTPException(status_code=401, detail="User not authenticated")
+        query = {"user_id": user_id}
         
-        # Group assessments by week
-        weekly_data = defaultdict(list)
-        for assessment in all_assessments:
-            date_str = assessment.get('date', '')
-            if date_str:
-                # Parse date and get week number
-                try:
-                    date_obj = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                    week_key = date_obj.strftime("%Y-W%U")  # Year-Week format
-                    weekly_data[week_key].append(assessment)
-                except Exception:
-                    continue
+        if ROLLUPS_READ:
+            return await read_coalescer.run(
+                "weekly_report_rollups", user_id, (),
+                lambda: weekly_report_from_rollups(user_id)
+            )
         
-        # Calculate averages per week
-        weekly_trends = []
-        for week, assessments in sorted(weekly_data.items(), reverse=True)[:8]:  # Last 8 weeks
-            total = len(assessments)
-            avg_sleep = sum(a['sleep_quality'] for a in assessments) / total
-            avg_nutrition = sum(a['nutrition'] for a in assessments) / total
-            avg_social = sum(a['social_connection'] for a in assessments) / total
-            avg_purpose = sum(a['purpose_growth'] for a in assessments) / total
-            avg_stress = sum(a['stress_management'] for a in assessments) / total
-            overall_avg = (avg_sleep + avg_nutrition + avg_social + avg_purpose + avg_stress) / 5
+        async def load():
+            # Group by Year-Week in MongoDB so only the last 8 weekly rows come back
+            week_key = {"$dateToString": {
+                "format": "%Y-W%U",
+                "date": {"$dateFromString": {"dateString": "$date", "onError": None, "onNull": None}}
+            }}
+            weekly_pipeline = [
+                {"$project": {"week": week_key, **{pillar: 1 for pillar in LIFESTYLE_PILLARS}}},
+                {"$match": {"week": {"$ne": None}}},
+                {"$group": {
+                    "_id": "$week",
+                    "entries_count": {"$sum": 1},
+                    **{pillar: {"$avg": f"${pillar}"} for pillar in LIFESTYLE_PILLARS}
+                }},
+                {"$sort": {"_id": -1}},
+                {"$limit": WEEKLY_REPORT_WEEKS}
+            ]
+            result = await analytics_db.lifestyle_assessments.aggregate([
+                {"$match": query},
+                {"$facet": {"total": [{"$count": "count"}], "weeks": weekly_pipeline}}
+            ]).to_list(1)
             
-            weekly_trends.append({
-                "week": week,
-                "overall_average": round(overall_avg, 1),
-                "entries_count": total,
-                "pillars": {
-                    "sleep_quality": round(avg_sleep, 1),
-                    "nutrition": round(avg_nutrition, 1),
-                    "social_connection": round(avg_social, 1),
-                    "purpose_growth": round(avg_purpose, 1),
-                    "stress_management": round(avg_stress, 1)
-                }
-            })
-        
-        # Calculate current week (most recent)
-        current_week_data = weekly_trends[0] if weekly_trends else None
-        
-        # Determine overall trend (compare last 2 weeks if available)
-        trend = "stable"
-        if len(weekly_trends) >= 2:
-            current_avg = weekly_trends[0]['overall_average']
-            previous_avg = weekly_trends[1]['overall_average']
-            if current_avg > previous_avg + 0.5:
-                trend = "improving"
-            elif current_avg < previous_avg - 0.5:
-                trend = "declining"
-        
-        # Build report
-        report = {
-            "period": f"Last {len(weekly_trends)} weeks",
-            "total_entries": len(all_assessments),
-            "overall_average": current_week_data['overall_average'] if current_week_data else 0,
-            "trend": trend,
-            "pillars": current_week_data['pillars'] if current_week_data else {},
-            "weekly_trends": weekly_trends,
-            "strengths": [],
-            "areas_for_improvement": []
-        }
-        
-        # Identify strengths and areas for improvement (from current week)
-        if current_week_data:
-            for key, value in current_week_data["pillars"].items():
-                if value >= 8:
-                    report["strengths"].append(key.replace("_", " ").title())
-                elif value <= 5:
-                    report["areas_for_improvement"].append(key.replace("_", " ").title())
+            facets = result[0] if result else {"total": [], "weeks": []}
+            total_entries = facets["total"][0]["count"] if facets["total"] else 0
+            if not total_entries:
+                return {"message": "No data available for report"}
+            
+            weekly_trends = [
+                summarize_week(row["_id"], row["entries_count"], row)
+                for row in facets["weeks"]
+            ]
+            
+            return build_wellness_report(weekly_trends, total_entries)
         
-        return report
+        return await read_coalescer.run("weekly_report", user_id, (), load)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error generating weekly report: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -451,109 +3106,265 @@ async def add_gratitude_entry(entry: GratitudeEntry, request: Request):
         user_id = get_user_id_from_header(request)
         entry.user_id = user_id
         doc = entry.model_dump()
-        await db.gratitude_entries.insert_one(doc)
+        await write_buffer.insert("gratitude_entries", doc, user_id)
         return entry
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error adding gratitude entry: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.post("/gratitude/add/batch")
+async def add_gratitude_entries_batch(items: List[dict], request: Request):
+    """Add several queued gratitude entries at once with per-item results"""
+    try:
+        user_id = get_user_id_from_header(request)
+        valid, failures = validate_batch(items, GratitudeEntry)
+        
+        entries, indexed_docs = {}, []
+        for index, entry in valid:
+            entry.user_id = user_id
+            entries[index] = entry
+            indexed_docs.append((index, entry.model_dump()))
+        
+        write_errors = await insert_batch(db.gratitude_entries, indexed_docs)
+        await record_user_write(user_id)
+        for index, message in write_errors.items():
+            failures[index] = {"index": index, "status": "error", "detail": message}
+            del entries[index]
+        
+        return batch_response(len(items), entries, failures)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error adding gratitude batch: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+GRATITUDE_PROJECTION, GRATITUDE_DEFAULTS = response_fields(GratitudeEntry)
+
 @api_router.get("/gratitude/entries", response_model=List[GratitudeEntry])
-async def get_gratitude_entries(request: Request, limit: int = 30):
+async def get_gratitude_entries(request: Request, limit: int = 30, cursor: Optional[str] = None):
     try:
         user_id = get_user_id_from_header(request)
-        query = {"user_id": user_id} if user_id else {}
+        if not user_id:
+            raise HTTPException(status_code=401, detail="User not authenticated")
+        query = {"user_id": user_id}
+        
+        async def load():
+            entries, next_cursor = await fetch_page(
+                db.gratitude_entries, query, "date", limit, cursor, GRATITUDE_PROJECTION
+            )
+            return with_defaults(entries, GRATITUDE_DEFAULTS), next_cursor
         
-        entries = await db.gratitude_entries.find(query, {"_id": 0}).sort("date", -1).limit(limit).to_list(limit)
-        return entries
+        return await conditional_list_response(request, "gratitude_entries", user_id, (limit, cursor), load)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching gratitude entries: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.delete("/gratitude/delete/{entry_id}")
-async def delete_gratitude_entry(entry_id: str):
+async def delete_gratitude_entry(entry_id: str, request: Request):
     try:
         result = await db.gratitude_entries.delete_one({"id": entry_id})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Entry not found")
+        await record_user_write(get_user_id_from_header(request))
         return {"message": "Entry deleted successfully"}
     except Exception as e:
         logger.error(f"Error deleting gratitude entry: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # Trigger Insights Endpoints
+async def trigger_insights_from_rollups(user_id: str) -> dict:
+    rollup = await analytics_db.mood_rollups.find_one(
+        {"user_id": user_id, "period": "all", "key": "all"},
+        {"_id": 0, "triggers": 1, "trigger_count": 1}
+    )
+    if not rollup:
+        return {"common_triggers": [], "total_entries": 0}
+    
+    common_triggers = sorted(
+        [
+            {
+                "trigger": rollup_display_key(trigger),
+                "count": stats.get("count", 0),
+                "emotions": {rollup_display_key(e): n for e, n in stats.get("emotions", {}).items()}
+            }
+            for trigger, stats in rollup.get("triggers", {}).items()
+        ],
+        key=lambda x: x['count'],
+        reverse=True
+    )[:10]
+    
+    return {"common_triggers": common_triggers, "total_entries": rollup.get("trigger_count", 0)}
+
 @api_router.get("/mood/trigger-insights")
 async def get_trigger_insights(request: Request):
     try:
         user_id = get_user_id_from_header(request)
-        query = {"trigger": {"$exists": True, "$ne": ""}}
-        if user_id:
-            query["user_id"] = user_id
+        if not user_id:
+            raise HTTPException(status_code=401, detail="User not authenticated")
         
-        # Get all mood entries with triggers (limited to last 500)
-        entries = await db.mood_entries.find(
-            query,
-            {"_id": 0, "trigger": 1, "emotion": 1}
-        ).limit(500).to_list(500)
+        if TRIGGER_INDEX_READ:
+            return await read_coalescer.run(
+                "trigger_insights_index", user_id, (),
+                lambda: trigger_insights_from_index(user_id)
+            )
         
-        # Aggregate common triggers
-        trigger_counts = {}
-        trigger_emotions = {}
+        if ROLLUPS_READ:
+            return await read_coalescer.run(
+                "trigger_insights_rollups", user_id, (),
+                lambda: trigger_insights_from_rollups(user_id)
+            )
         
-        for entry in entries:
-            trigger = entry.get('trigger', '').lower().strip()
-            emotion = entry.get('emotion', '')
+        query = {"user_id": user_id, "trigger": {"$exists": True, "$nin": ["", None]}}
+        
+        async def load():
+            # Get the newest 500 mood entries with triggers
+            entries = await analytics_db.mood_entries.find(
+                query,
+                {"_id": 0, "trigger": 1, "emotion": 1, "timestamp": 1}
+            ).sort("timestamp", -1).limit(500).to_list(500)
             
-            if trigger:
-                trigger_counts[trigger] = trigger_counts.get(trigger, 0) + 1
-                if trigger not in trigger_emotions:
-                    trigger_emotions[trigger] = {}
-                trigger_emotions[trigger][emotion] = trigger_emotions[trigger].get(emotion, 0) + 1
-        
-        # Sort by frequency
-        common_triggers = sorted(
-            [{"trigger": k, "count": v, "emotions": trigger_emotions[k]} for k, v in trigger_counts.items()],
-            key=lambda x: x['count'],
-            reverse=True
-        )[:10]
-        
-        return {"common_triggers": common_triggers, "total_entries": len(entries)}
+            # Aggregate common triggers, sorted by frequency
+            columns = MoodColumns.from_docs(entries, (), normalize_trigger)
+            return {"common_triggers": columns.trigger_histogram(10), "total_entries": len(entries)}
+        
+        return await read_coalescer.run("trigger_insights", user_id, (), load)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching trigger insights: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/mood/triggers/search")
+async def search_triggers(request: Request, q: str = "", limit: int = 10):
+    """Autocomplete the caller's triggers: matching phrases first, then matching words"""
+    try:
+        user_id = get_user_id_from_header(request)
+        if not user_id:
+            raise HTTPException(status_code=401, detail="User not authenticated")
+        
+        prefix = normalize_trigger(q)
+        limit = max(1, min(limit, PAGE_LIMIT_MAX))
+        results = []
+        for kind in (TRIGGER_PHRASE, TRIGGER_WORD):
+            query = {"user_id": user_id, "kind": kind}
+            if prefix:
+                query["term"] = {"$regex": f"^{re.escape(prefix)}"}
+            remaining = limit - len(results)
+            docs = await analytics_db.trigger_index.find(query, {"_id": 0}).sort(
+                [("count", DESCENDING), ("term", ASCENDING)]
+            ).limit(remaining).to_list(remaining)
+            results += [{"kind": kind, **trigger_index_item(doc)} for doc in docs]
+            if len(results) >= limit or not prefix:
+                break
+        
+        return {"query": prefix, "results": results}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching triggers: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Trigger heatmap
+# The heatmap is a date x trigger grid of (entry count, mean emotion_level,
+# dominant emotion). With ROLLUPS_READ it is assembled from the per-day rollups,
+# which every submit already updates incrementally, so a 90-day window reads at
+# most 90 small documents. Otherwise it is computed from the newest
+# HEATMAP_MAX_ENTRIES raw entries and flagged `truncated` when that cap is hit.
+# The weak ETag names the user's data version, so a revalidation is answered
+# with 304 before any grid is built; the grid is therefore read from the
+# primary, where that version is written, rather than a lagging secondary.
+HEATMAP_DEFAULT_DAYS = 90
+HEATMAP_MAX_DAYS = int(os.environ.get('HEATMAP_MAX_DAYS', '366'))
+HEATMAP_MAX_ENTRIES = int(os.environ.get('HEATMAP_MAX_ENTRIES', '500'))
+
+def heatmap_grid(rows: List[tuple], start: str, end: str, truncated: bool = False) -> dict:
+    """Compact grid from (date, trigger, count, intensity sum, {emotion: count}) rows.
+
+    `cells` holds [date index, trigger index, count, mean intensity, dominant
+    emotion]; triggers are ordered by total count, then name.
+    """
+    totals: Dict[str, int] = {}
+    for _, trigger, count, _, _ in rows:
+        totals[trigger] = totals.get(trigger, 0) + count
+    triggers = sorted(totals, key=lambda trigger: (-totals[trigger], trigger))
+    dates = sorted({date for date, _, _, _, _ in rows})
+    trigger_index = {trigger: index for index, trigger in enumerate(triggers)}
+    date_index = {date: index for index, date in enumerate(dates)}
+    
+    cells = sorted(
+        [
+            date_index[date],
+            trigger_index[trigger],
+            count,
+            round(intensity / count, 1) if count and intensity is not None else None,
+            # Ties go to the alphabetically first emotion
+            min(emotions, key=lambda emotion: (-emotions[emotion], emotion)) if emotions else None
+        ]
+        for date, trigger, count, intensity, emotions in rows
+    )
+    return {"start": start, "end": end, "dates": dates, "triggers": triggers, "cells": cells, "truncated": truncated}
+
+async def heatmap_rows_from_rollups(user_id: str, start: str) -> List[tuple]:
+    rollups = await db.mood_rollups.find(
+        {"user_id": user_id, "period": "day", "key": {"$gte": start}},
+        {"_id": 0, "key": 1, "triggers": 1}
+    ).to_list(None)
+    return [
+        (
+            doc["key"],
+            rollup_display_key(trigger),
+            stats.get("count", 0),
+            # Rollups written before intensity was tracked have none until rebuilt
+            stats.get("intensity"),
+            {rollup_display_key(emotion): n for emotion, n in stats.get("emotions", {}).items()}
+        )
+        for doc in rollups
+        for trigger, stats in doc.get("triggers", {}).items()
+        if stats.get("count")
+    ]
+
+async def heatmap_rows_from_entries(query: dict, since: datetime) -> tuple:
+    """(rows, truncated) computed from the newest raw entries since the given time"""
+    entries = await db.mood_entries.find(
+        {**query, "$or": since_query("timestamp", since)},
+        {"_id": 0, "trigger": 1, "emotion": 1, "timestamp": 1, "emotion_level": 1}
+    ).sort("timestamp", -1).limit(HEATMAP_MAX_ENTRIES).to_list(HEATMAP_MAX_ENTRIES)
+    columns = MoodColumns.from_docs(entries, ("emotion_level",), normalize_trigger)
+    return columns.trigger_day_cells("emotion_level"), len(entries) >= HEATMAP_MAX_ENTRIES
+
 @api_router.get("/mood/trigger-heatmap")
-async def get_trigger_heatmap(request: Request):
+async def get_trigger_heatmap(request: Request, days: int = HEATMAP_DEFAULT_DAYS):
+    """Date x trigger grid for the last `days` UTC days, including today"""
     try:
         user_id = get_user_id_from_header(request)
-        query = {"trigger": {"$exists": True, "$ne": ""}}
-        if user_id:
-            query["user_id"] = user_id
+        if not user_id:
+            raise HTTPException(status_code=401, detail="User not authenticated")
+        days = max(1, min(days, HEATMAP_MAX_DAYS))
+        today = datetime.now(timezone.utc).date()
+        start = today - timedelta(days=days - 1)
+        # The source is part of the key: turning ROLLUPS_READ on can change the grid without a write
+        params = (start.isoformat(), days, ROLLUPS_READ)
+        etag = await user_data_etag(user_id, "trigger_heatmap", params)
+        if etag_matches(request, etag):
+            return not_modified(etag)
         
-        # Get mood entries from last 90 days (limited to 500 entries)
-        from datetime import timedelta
-        ninety_days_ago = datetime.now(timezone.utc) - timedelta(days=90)
-        query["timestamp"] = {"$gte": ninety_days_ago.isoformat()}
-        
-        entries = await db.mood_entries.find(
-            query,
-            {"_id": 0, "trigger": 1, "emotion": 1, "timestamp": 1, "emotion_level": 1}
-        ).limit(500).to_list(500)
-        
-        # Create heatmap data
-        heatmap_data = []
-        for entry in entries:
-            timestamp = entry.get('timestamp')
-            if isinstance(timestamp, str):
-                timestamp = datetime.fromisoformat(timestamp)
-            
-            heatmap_data.append({
-                "date": timestamp.strftime("%Y-%m-%d"),
-                "trigger": entry.get('trigger', '').lower()[:50],
-                "emotion": entry.get('emotion', ''),
-                "intensity": entry.get('emotion_level', 5)
-            })
-        
-        return {"heatmap_data": heatmap_data}
+        async def load():
+            if ROLLUPS_READ:
+                rows, truncated = await heatmap_rows_from_rollups(user_id, start.isoformat()), False
+            else:
+                query = {"user_id": user_id, "trigger": {"$exists": True, "$nin": ["", None]}}
+                since = datetime(start.year, start.month, start.day, tzinfo=timezone.utc)
+                rows, truncated = await heatmap_rows_from_entries(query, since)
+            return heatmap_grid(rows, start.isoformat(), today.isoformat(), truncated)
+        
+        grid = await read_coalescer.run("trigger_heatmap", user_id, params, load)
+        return conditional_response(request, grid, etag)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching trigger heatmap: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -580,15 +3391,202 @@ class User(BaseModel):
     password_hash: str
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+# bcrypt runs on a dedicated, size-limited thread pool so hashing never blocks the
+# event loop. Requests beyond the queue cap are shed with 503 instead of piling up.
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', '12'))
+BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', '4'))
+BCRYPT_MAX_QUEUE = int(os.environ.get('BCRYPT_MAX_QUEUE', '32'))
+
 def hash_password(password: str) -> str:
     """Hash a password using bcrypt"""
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=BCRYPT_ROUNDS)
     return bcrypt.hashpw(password.encode('utf-8'), salt).decode('utf-8')
 
 def verify_password(password: str, password_hash: str) -> bool:
     """Verify a password against its hash"""
     return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('utf-8'))
 
+def password_needs_rehash(password_hash: str) -> bool:
+    """True when a hash was made with a different cost factor than BCRYPT_ROUNDS"""
+    try:
+        return int(password_hash.split('$')[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return False
+
+class PasswordHasher:
+    """Runs bcrypt on a bounded executor and sheds load once the queue is full"""
+
+    def __init__(self, workers: int, max_queue: int):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self.capacity = workers + max_queue
+        self.in_flight = 0
+
+    async def _run(self, func, *args):
+        if self.in_flight >= self.capacity:
+            logger.warning("bcrypt queue full, shedding request")
+            raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, password: str, password_hash: str) -> bool:
+        return await self._run(verify_password, password, password_hash)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+password_hasher = PasswordHasher(BCRYPT_WORKERS, BCRYPT_MAX_QUEUE)
+
+# Session tokens
+# Login issues `base64url(payload).base64url(HMAC-SHA256)` where the payload
+# carries the user id, display name, session id and expiry, so a request is
+# authenticated by checking the signature rather than reading the users
+# collection. Each session also has a row in `sessions` so it can be revoked;
+# verified tokens are kept in an LRU and that row is re-checked only once the
+# entry is older than IDENTITY_CACHE_TTL_SECONDS. Revocation is immediate on the
+# process that handles the logout and takes effect elsewhere within the TTL.
+SESSION_SECRET = os.environ.get('SESSION_SECRET', '')
+SESSION_TTL_SECONDS = int(os.environ.get('SESSION_TTL_SECONDS', str(7 * 24 * 3600)))
+IDENTITY_CACHE_MAX_ENTRIES = int(os.environ.get('IDENTITY_CACHE_MAX_ENTRIES', '10000'))
+IDENTITY_CACHE_TTL_SECONDS = float(os.environ.get('IDENTITY_CACHE_TTL_SECONDS', '60'))
+# Deleting an account revokes its sessions at once, but the job stays visible to them
+DELETION_STATUS_ROUTE = "GET /api/user/data/deletion"
+
+if not SESSION_SECRET:
+    logger.warning("SESSION_SECRET is not set; using a per-process secret, sessions will not survive restarts")
+    SESSION_SECRET = secrets.token_urlsafe(32)
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def _sign(body: str) -> str:
+    return _b64encode(hmac.new(SESSION_SECRET.encode("utf-8"), body.encode("ascii"), hashlib.sha256).digest())
+
+def issue_session_token(user_id: str, name: Optional[str]) -> tuple:
+    """(token, payload) for a new session belonging to user_id"""
+    issued_at = int(time.time())
+    payload = {
+        "sub": user_id,
+        "name": name,
+        "sid": uuid.uuid4().hex,
+        "iat": issued_at,
+        "exp": issued_at + SESSION_TTL_SECONDS
+    }
+    body = _b64encode(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+    return f"{body}.{_sign(body)}", payload
+
+def decode_session_token(token: str) -> Optional[dict]:
+    """Payload of a correctly signed, unexpired token, else None"""
+    body, _, signature = token.partition(".")
+    if not body or not signature:
+        return None
+    try:
+        # Tokens arrive straight from a header, so non-ASCII input is just a bad token
+        if not hmac.compare_digest(signature.encode("ascii"), _sign(body).encode("ascii")):
+            return None
+        payload = json.loads(_b64decode(body))
+        if not isinstance(payload, dict) or payload.get("exp", 0) <= time.time():
+            return None
+    except (UnicodeError, TypeError, ValueError):
+        return None
+    return payload
+
+class IdentityCache:
+    """LRU of verified token payloads, re-checked against `sessions` once stale"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # session id -> token expiry, so a revoked token is refused without a lookup
+        self.revoked: Dict[str, float] = {}
+        self.stats = {"hits": 0, "misses": 0, "rejected": 0, "revoked": 0}
+
+    async def verify(self, token: str) -> Optional[dict]:
+        item = self.entries.get(token)
+        if item and item[1] > time.monotonic() and item[0]["exp"] > time.time():
+            self.entries.move_to_end(token)
+            self.stats["hits"] += 1
+            return item[0]
+        
+        self.stats["misses"] += 1
+        payload = decode_session_token(token)
+        if payload is None or payload.get("sid") in self.revoked:
+            return self._reject(token)
+        if not await db.sessions.find_one({"_id": payload["sid"]}, {"_id": 1}):
+            return self._reject(token)
+        
+        self.entries[token] = (payload, time.monotonic() + self.ttl_seconds)
+        self.entries.move_to_end(token)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        return payload
+
+    def _reject(self, token: str) -> None:
+        self.entries.pop(token, None)
+        self.stats["rejected"] += 1
+        return None
+
+    def revoke(self, predicate):
+        """Drop cached tokens whose payload matches and refuse their sessions from now on"""
+        now = time.time()
+        self.revoked = {sid: exp for sid, exp in self.revoked.items() if exp > now}
+        for token, (payload, _) in list(self.entries.items()):
+            if predicate(payload):
+                self.revoked[payload["sid"]] = payload["exp"]
+                del self.entries[token]
+                self.stats["revoked"] += 1
+
+    def revoke_session(self, payload: dict):
+        self.revoke(lambda cached: cached["sid"] == payload["sid"])
+        self.revoked[payload["sid"]] = payload["exp"]
+
+    def revoke_user(self, user_id: str):
+        self.revoke(lambda cached: cached["sub"] == user_id)
+
+    def snapshot(self) -> dict:
+        return {"entries": len(self.entries), "revoked": len(self.revoked), **self.stats}
+
+identity_cache = IdentityCache(IDENTITY_CACHE_MAX_ENTRIES, IDENTITY_CACHE_TTL_SECONDS)
+
+async def create_session(user: dict) -> dict:
+    """Persist a session for the user and return the login payload for it"""
+    token, payload = issue_session_token(user["id"], user.get("name"))
+    expires_at = datetime.fromtimestamp(payload["exp"], tz=timezone.utc)
+    await db.sessions.insert_one({
+        "_id": payload["sid"],
+        "user_id": user["id"],
+        "created_at": datetime.fromtimestamp(payload["iat"], tz=timezone.utc),
+        "expires_at": expires_at
+    })
+    return {"token": token, "expires_at": expires_at.isoformat()}
+
+@app.middleware("http")
+async def authenticate_request(request: Request, call_next):
+    """Attach the verified identity for `Authorization: Bearer` requests"""
+    request.state.identity = None
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and token.strip():
+        identity = await identity_cache.verify(token.strip())
+        if identity is None and f"{request.method} {request.url.path}" == DELETION_STATUS_ROUTE:
+            identity = decode_session_token(token.strip())
+        if identity is None:
+            return JSONResponse(
+                status_code=401,
+                content={"detail": "Session expired or invalid"},
+                headers={"WWW-Authenticate": "Bearer"}
+            )
+        request.state.identity = identity
+    return await call_next(request)
+
 @api_router.post("/auth/signup")
 async def signup(user: UserSignup):
     try:
@@ -598,7 +3596,7 @@ async def signup(user: UserSignup):
             raise HTTPException(status_code=400, detail="Username already exists")
         
         # Hash the password
-        password_hash = hash_password(user.password)
+        password_hash = await password_hasher.hash(user.password)
         
         # Create user document
         user_doc = {
@@ -606,7 +3604,7 @@ async def signup(user: UserSignup):
             "username": user.username,
             "name": user.name if user.name else user.username,
             "password_hash": password_hash,
-            "created_at": datetime.now(timezone.utc).isoformat()
+            "created_at": datetime.now(timezone.utc)
         }
         
         # Insert into database
@@ -637,9 +3635,20 @@ async def login(credentials: UserLogin):
             raise HTTPException(status_code=401, detail="Invalid username or password")
         
         # Verify password
-        if not verify_password(credentials.password, user["password_hash"]):
+        if not await password_hasher.verify(credentials.password, user["password_hash"]):
             raise HTTPException(status_code=401, detail="Invalid username or password")
         
+        # Upgrade the stored hash when the configured cost factor has changed
+        if password_needs_rehash(user["password_hash"]):
+            try:
+                new_hash = await password_hasher.hash(credentials.password)
+                await db.users.update_one({"id": user["id"]}, {"$set": {"password_hash": new_hash}})
+                logger.info(f"Rehashed password for user: {user['id']}")
+            except Exception as e:
+                logger.warning(f"Could not rehash password for user {user['id']}: {str(e)}")
+        
+        session = await create_session(user)
+        
         # Return user data (without password hash)
         return {
             "message": "Login successful",
@@ -647,7 +3656,8 @@ async def login(credentials: UserLogin):
                 "id": user["id"],
                 "username": user["username"],
                 "name": user["name"]
-            }
+            },
+            **session
         }
     except HTTPException:
         raise
@@ -655,23 +3665,180 @@ async def login(credentials: UserLogin):
         logger.error(f"Error during login: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.delete("/user/data")
+@api_router.get("/auth/session")
+async def get_session(request: Request):
+    """Identity behind the caller's token, for clients validating a stored session"""
+    identity = request.state.identity
+    if not identity:
+        raise HTTPException(status_code=401, detail="User not authenticated")
+    return {
+        "user": {"id": identity["sub"], "name": identity.get("name")},
+        "expires_at": datetime.fromtimestamp(identity["exp"], tz=timezone.utc).isoformat()
+    }
+
+@api_router.post("/auth/logout")
+async def logout(request: Request):
+    """Revoke the caller's session token"""
+    try:
+        identity = request.state.identity
+        if not identity:
+            raise HTTPException(status_code=401, detail="User not authenticated")
+        
+        identity_cache.revoke_session(identity)
+        await db.sessions.delete_one({"_id": identity["sid"]})
+        return {"message": "Logged out"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error during logout: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# User data deletion
+# DELETE /user/data queues a job keyed by user id. A worker removes the user's
+# documents from every collection concurrently in small batches, paced by a
+# shared token bucket so large purges don't starve other tenants. Jobs left
+# queued or running by a crash are resumed at startup; deleting is idempotent.
+DELETION_BATCH_SIZE = int(os.environ.get('DELETION_BATCH_SIZE', '500'))
+DELETION_DOCS_PER_SECOND = float(os.environ.get('DELETION_DOCS_PER_SECOND', '2000'))
+DELETION_WORKERS = int(os.environ.get('DELETION_WORKERS', '1'))
+
+# (collection, field holding the user id); users goes last so a failed job can be retried
+USER_DATA_COLLECTIONS = [
+    ("mood_entries", "user_id"),
+    ("gratitude_entries", "user_id"),
+    ("lifestyle_assessments", "user_id"),
+    ("mood_rollups", "user_id"),
+    ("lifestyle_rollups", "user_id"),
+    ("trigger_index", "user_id"),
+    ("sessions", "user_id"),
+    # Dropping the data version also changes every ETag handed out for the user
+    ("user_versions", "_id"),
+]
+USER_RECORD_COLLECTION = ("users", "id")
+
+class UserDeletionJobs:
+    """Queue of user ids whose data is purged in throttled batches by worker tasks"""
+
+    def __init__(self, workers: int, batch_size: int, throttle: TokenBucket):
+        self.worker_count = workers
+        self.batch_size = batch_size
+        self.throttle = throttle
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.workers: List[asyncio.Task] = []
+
+    async def start(self):
+        if self.workers:
+            return
+        self.workers = [asyncio.create_task(self._worker(i)) for i in range(self.worker_count)]
+        pending = await db.deletion_jobs.find(
+            {"status": {"$in": ["queued", "running"]}}, {"_id": 1}
+        ).to_list(None)
+        for job in pending:
+            self.queue.put_nowait(job["_id"])
+        if pending:
+            logger.info(f"Resumed {len(pending)} user deletion jobs")
+
+    async def stop(self):
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+
+    async def submit(self, user_id: str) -> dict:
+        """Queue a purge for the user, returning the existing job if one is already active"""
+        job = await db.deletion_jobs.find_one({"_id": user_id})
+        if job and job["status"] in ("queued", "running"):
+            return job
+        
+        job = {
+            "_id": user_id,
+            "status": "queued",
+            "deleted": {},
+            "requested_at": datetime.now(timezone.utc),
+            "finished_at": None,
+            "error": None
+        }
+        await db.deletion_jobs.replace_one({"_id": user_id}, job, upsert=True)
+        self.queue.put_nowait(user_id)
+        return job
+
+    async def _purge(self, user_id: str, collection_name: str, field: str):
+        collection = db[collection_name]
+        while True:
+            batch = await collection.find({field: user_id}, {"_id": 1}).limit(self.batch_size).to_list(self.batch_size)
+            if not batch:
+                return
+            result = await collection.delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+            await db.deletion_jobs.update_one(
+                {"_id": user_id},
+                {"$inc": {f"deleted.{collection_name}": result.deleted_count}}
+            )
+            # Pay for what was removed, so small purges and the final empty probe are free
+            await self.throttle.acquire(result.deleted_count)
+
+    async def _run(self, user_id: str):
+        await db.deletion_jobs.update_one(
+            {"_id": user_id},
+            {"$set": {"status": "running", "started_at": datetime.now(timezone.utc)}}
+        )
+        await asyncio.gather(*(
+            self._purge(user_id, collection_name, field)
+            for collection_name, field in USER_DATA_COLLECTIONS
+        ))
+        await self._purge(user_id, *USER_RECORD_COLLECTION)
+        read_coalescer.invalidate(user_id)
+        await db.deletion_jobs.update_one(
+            {"_id": user_id},
+            {"$set": {"status": "complete", "finished_at": datetime.now(timezone.utc)}}
+        )
+        logger.info(f"Deleted all data for user: {user_id}")
+
+    async def _worker(self, worker_id: int):
+        while True:
+            user_id = await self.queue.get()
+            try:
+                await self._run(user_id)
+            except Exception as e:
+                logger.error(f"Deletion worker {worker_id} failed for user {user_id}: {str(e)}")
+                await db.deletion_jobs.update_one(
+                    {"_id": user_id},
+                    {"$set": {"status": "failed", "error": str(e), "finished_at": datetime.now(timezone.utc)}}
+                )
+            finally:
+                self.queue.task_done()
+
+user_deletion_jobs = UserDeletionJobs(
+    DELETION_WORKERS,
+    DELETION_BATCH_SIZE,
+    TokenBucket(DELETION_DOCS_PER_SECOND, max(DELETION_DOCS_PER_SECOND, DELETION_BATCH_SIZE))
+)
+
+def deletion_job_status(job: dict) -> dict:
+    return {
+        "user_id": job["_id"],
+        "status": job["status"],
+        "deleted": job.get("deleted", {}),
+        "requested_at": job.get("requested_at"),
+        "finished_at": job.get("finished_at"),
+        "error": job.get("error")
+    }
+
+@api_router.delete("/user/data", status_code=202)
 async def delete_user_data(request: Request):
+    """Queue deletion of every document belonging to the caller, including the account"""
     try:
         user_id = get_user_id_from_header(request)
         
         if not user_id:
             raise HTTPException(status_code=401, detail="User not authenticated")
         
-        # Delete all user data from collections
-        await db.mood_entries.delete_many({"user_id": user_id})
-        await db.gratitude_entries.delete_many({"user_id": user_id})
-        await db.lifestyle_assessments.delete_many({"user_id": user_id})
-        
-        logger.info(f"Deleted all data for user: {user_id}")
+        job = await user_deletion_jobs.submit(user_id)
+        identity_cache.revoke_user(user_id)
+        logger.info(f"Queued data deletion for user: {user_id}")
         
         return {
-            "message": "All user data deleted successfully"
+            "message": "User data deletion started",
+            "job": deletion_job_status(job)
         }
     except HTTPException:
         raise
@@ -679,17 +3846,126 @@ async def delete_user_data(request: Request):
         logger.error(f"Error deleting user data: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/user/data/deletion")
+async def get_user_deletion_status(request: Request):
+    """Progress of the caller's data deletion job"""
+    try:
+        user_id = get_user_id_from_header(request)
+        
+        if not user_id:
+            raise HTTPException(status_code=401, detail="User not authenticated")
+        
+        job = await db.deletion_jobs.find_one({"_id": user_id})
+        if not job:
+            raise HTTPException(status_code=404, detail="No deletion job found")
+        return deletion_job_status(job)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error fetching deletion status: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Data export
+# Streams every mood, lifestyle and gratitude document for the caller straight
+# from Motor cursors, so memory stays flat regardless of history length.
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '200'))
+
+EXPORT_COLLECTIONS = {
+    "mood_entries": ("timestamp", MoodEntry),
+    "lifestyle_assessments": ("date", LifestyleAssessment),
+    "gratitude_entries": ("date", GratitudeEntry),
+}
+
+def _export_json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+async def _export_documents(user_id: str):
+    for collection_name, (sort_field, _) in EXPORT_COLLECTIONS.items():
+        cursor = db[collection_name].find({"user_id": user_id}, {"_id": 0}).sort(
+            [(sort_field, ASCENDING), ("id", ASCENDING)]
+        ).batch_size(EXPORT_BATCH_SIZE)
+        async for doc in cursor:
+            yield collection_name, doc
+
+async def stream_export_ndjson(user_id: str):
+    lines = []
+    async for collection_name, doc in _export_documents(user_id):
+        lines.append(json.dumps({"collection": collection_name, **doc}, default=_export_json_default))
+        if len(lines) >= EXPORT_BATCH_SIZE:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+async def stream_export_csv(user_id: str):
+    # One table for all collections: a collection column plus the union of model fields
+    columns = ["collection"]
+    for _, model in EXPORT_COLLECTIONS.values():
+        columns += [field for field in model.model_fields if field not in columns]
+    
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    rows = 0
+    async for collection_name, doc in _export_documents(user_id):
+        writer.writerow({"collection": collection_name, **{
+            key: _export_json_default(value) if isinstance(value, datetime) else value
+            for key, value in doc.items()
+        }})
+        rows += 1
+        if rows % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+@api_router.get("/user/export")
+async def export_user_data(request: Request, format: str = "ndjson"):
+    user_id = get_user_id_from_header(request)
+    if not user_id:
+        raise HTTPException(status_code=401, detail="User not authenticated")
+    
+    filename = f"mood-sync-data-{datetime.now(timezone.utc).strftime('%Y-%m-%d')}"
+    if format == "ndjson":
+        stream, media_type, filename = stream_export_ndjson(user_id), "application/x-ndjson", f"{filename}.ndjson"
+    elif format == "csv":
+        stream, media_type, filename = stream_export_csv(user_id), "text/csv", f"{filename}.csv"
+    else:
+        raise HTTPException(status_code=400, detail="Unsupported export format")
+    
+    return StreamingResponse(
+        stream,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 # Include the router in the main app
 app.include_router(api_router)
 
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, minimum_size=COMPRESSION_MIN_BYTES)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    await guidance_pipeline.stop()
+    await user_deletion_jobs.stop()
+    await write_buffer.stop()
+    password_hasher.shutdown()
     client.close()
+
+import_durations["server_module"] = time.perf_counter() - MODULE_IMPORT_STARTED
+logger.info(f"Server module imported in {import_durations['server_module']:.3f}s")
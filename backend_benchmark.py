@@ -0,0 +1,413 @@
+"""Local load-testing and latency benchmark for the Mood Sync backend.
+
+Runs the FastAPI app in-process against a local MongoDB stand-in (mongomock-motor
+by default, or a real mongod via --mongo-url) with a stubbed LlmChat, drives every
+endpoint at a configurable concurrency and reports throughput and p50/p95/p99
+latency per route. Results are written as JSON so runs can be compared across
+commits:
+
+    python backend_benchmark.py --users 20 --entries 200 --output bench.json
+    python backend_benchmark.py --compare bench.json
+
+Requires the backend requirements plus httpx (and mongomock-motor for the default
+in-memory database). Routes whose source depends on ROLLUPS_READ and
+TRIGGER_INDEX_READ are measured on the path those settings select (the shipped
+defaults unless overridden in the environment) and again on the precomputed
+rollups and trigger index, reported with a " [precomputed]" suffix; --read-path
+picks one of the two. Mongomock cannot run the raw weekly report aggregation, so
+that route needs --mongo-url.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+sys.path.insert(0, str(ROOT_DIR / "backend"))
+
+EMOTIONS = ["Happy", "Sad", "Anxious", "Calm", "Stressed", "Angry", "Grateful", "Tired"]
+OVERTHINKING = ["Not at all", "A little", "A lot", "Constantly"]
+TRIGGERS = ["work deadline", "family", "traffic", "social media", "exercise", "sleep", "money", ""]
+BENCHMARK_PASSWORD = "benchmark-password"
+READ_FLAGS = ("ROLLUPS_READ", "TRIGGER_INDEX_READ")
+# Routes that read rollups or the trigger index instead of raw entries when READ_FLAGS are on
+READ_PATH_ROUTES = {
+    "GET /api/mood/trends?granularity=day",
+    "GET /api/mood/trigger-insights",
+    "GET /api/mood/trigger-heatmap",
+    "GET /api/lifestyle/weekly-report",
+}
+PRECOMPUTED_SUFFIX = " [precomputed]"
+# Raw-path routes whose aggregation mongomock does not implement
+MONGOMOCK_UNSUPPORTED = {"GET /api/lifestyle/weekly-report"}
+STUB_GUIDANCE = ("Hi {name}, take a slow breath. Step outside for five minutes, "
+                 "drink some water and be gentle with yourself.")
+
+
+class StubLlmChat:
+    """Stand-in for LlmChat that answers after a fixed simulated latency"""
+
+    latency = 0.05
+
+    def __init__(self, api_key, session_id, system_message):
+        self.system_message = system_message
+
+    def with_model(self, provider, model):
+        return self
+
+    async def send_message(self, message):
+        await asyncio.sleep(self.latency)
+        return STUB_GUIDANCE
+
+
+class StubUserMessage:
+    """Stand-in for UserMessage, so the real SDK is never imported"""
+
+    def __init__(self, text):
+        self.text = text
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+class MoodSyncBenchmark:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.user_ids = []
+        self.usernames = []
+        self.tokens = {}
+        self.entry_ids = []
+        self.results = {}
+
+    def setup_app(self):
+        """Import the backend with a local database and the stubbed LLM"""
+        os.environ.setdefault("MONGO_URL", self.args.mongo_url or "mongodb://localhost:27017")
+        os.environ.setdefault("DB_NAME", "mood_sync_benchmark")
+        os.environ.setdefault("EMERGENT_LLM_KEY", "benchmark")
+        os.environ.setdefault("BCRYPT_ROUNDS", str(self.args.bcrypt_rounds))
+        os.environ.setdefault("SESSION_SECRET", "benchmark")
+        # Measure raw route latency; rate limits and shedding would turn load into 429/503s
+        os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+        os.environ.setdefault("ADMISSION_MAX_LLM_IN_FLIGHT", "0")
+        os.environ.setdefault("ADMISSION_MAX_EVENT_LOOP_LAG_SECONDS", "0")
+
+        import server
+
+        if not self.args.mongo_url:
+            from mongomock_motor import AsyncMongoMockClient
+            server.client = AsyncMongoMockClient()
+            server.db = server.client[os.environ["DB_NAME"]]
+            server.analytics_db = server.db
+
+        StubLlmChat.latency = self.args.llm_latency_ms / 1000
+        server.LlmChat = StubLlmChat
+        server.UserMessage = StubUserMessage
+        self.server = server
+        self.shipped_flags = {flag: getattr(server, flag) for flag in READ_FLAGS}
+
+    def read_modes(self):
+        """(name suffix, read flags) for each read path that --read-path asks for"""
+        modes = []
+        if self.args.read_path in ("shipped", "both"):
+            modes.append(("", self.shipped_flags))
+        precomputed = {flag: True for flag in READ_FLAGS}
+        if self.args.read_path == "precomputed" or (self.args.read_path == "both" and self.shipped_flags != precomputed):
+            modes.append((PRECOMPUTED_SUFFIX, precomputed))
+        return modes
+
+    def set_read_flags(self, flags):
+        for flag, value in flags.items():
+            setattr(self.server, flag, value)
+
+    async def seed_dataset(self):
+        """Generate N users x M entries of mood, lifestyle and gratitude data"""
+        db = self.server.db
+        for collection in ("users", "sessions", "mood_entries", "lifestyle_assessments", "gratitude_entries",
+                           "mood_rollups", "lifestyle_rollups"):
+            await db[collection].delete_many({})
+
+        password_hash = self.server.hash_password(BENCHMARK_PASSWORD)
+        now = datetime.now(timezone.utc)
+        for user_index in range(self.args.users):
+            user_id = str(uuid.uuid4())
+            username = f"bench-user-{user_index}"
+            self.user_ids.append(user_id)
+            self.usernames.append(username)
+            user = {
+                "id": user_id,
+                "username": username,
+                "name": f"Bench User {user_index}",
+                "password_hash": password_hash,
+                "created_at": now
+            }
+            await db.users.insert_one(user)
+            self.tokens[user_id] = (await self.server.create_session(user))["token"]
+
+            moods, assessments, gratitude = [], [], []
+            for _ in range(self.args.entries):
+                moment = now - timedelta(minutes=self.rng.randint(0, self.args.days * 24 * 60))
+                entry_id = str(uuid.uuid4())
+                moods.append({
+                    "id": entry_id,
+                    "user_id": user_id,
+                    "emotion": self.rng.choice(EMOTIONS),
+                    "emotion_level": self.rng.randint(0, 10),
+                    "energy_level": self.rng.randint(0, 10),
+                    "focus_level": self.rng.randint(0, 10),
+                    "overthinking": self.rng.choice(OVERTHINKING),
+                    "trigger": self.rng.choice(TRIGGERS),
+                    "pattern": None,
+                    "underlying_cause": None,
+                    "additional_notes": None,
+                    "ai_guidance": STUB_GUIDANCE.replace("{name}", f"Bench User {user_index}"),
+                    "guidance_status": "complete",
+                    "timestamp": moment
+                })
+                scores = {pillar: self.rng.randint(1, 10) for pillar in self.server.LIFESTYLE_PILLARS}
+                assessments.append({
+                    "id": str(uuid.uuid4()),
+                    "user_id": user_id,
+                    **scores,
+                    "notes": None,
+                    "date": moment.isoformat().replace("+00:00", "Z"),
+                    "average_score": round(sum(scores.values()) / len(scores), 1)
+                })
+                gratitude.append({
+                    "id": str(uuid.uuid4()),
+                    "user_id": user_id,
+                    "content": "Grateful for a quiet morning coffee",
+                    "date": moment.isoformat().replace("+00:00", "Z")
+                })
+            self.entry_ids.append(moods[0]["id"] if moods else None)
+            if moods:
+                await db.mood_entries.insert_many(moods)
+                await db.lifestyle_assessments.insert_many(assessments)
+                await db.gratitude_entries.insert_many(gratitude)
+
+        await self.server.rebuild_rollups()
+        await self.server.rebuild_trigger_index()
+        print(f"🌱 Seeded {self.args.users} users x {self.args.entries} entries")
+
+    def mood_payload(self):
+        return {
+            "emotion": self.rng.choice(EMOTIONS),
+            "emotion_level": self.rng.randint(0, 10),
+            "energy_level": self.rng.randint(0, 10),
+            "focus_level": self.rng.randint(0, 10),
+            "overthinking": self.rng.choice(OVERTHINKING),
+            "trigger": self.rng.choice(TRIGGERS)
+        }
+
+    def lifestyle_payload(self):
+        return {
+            **{pillar: self.rng.randint(1, 10) for pillar in self.server.LIFESTYLE_PILLARS},
+            "date": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+        }
+
+    def gratitude_payload(self):
+        return {"content": "Grateful for friends", "date": datetime.now(timezone.utc).isoformat()}
+
+    def signup_payload(self):
+        return {"username": f"bench-signup-{uuid.uuid4().hex[:12]}", "password": BENCHMARK_PASSWORD}
+
+    def login_payload(self):
+        return {"username": self.rng.choice(self.usernames), "password": BENCHMARK_PASSWORD}
+
+    def guidance_path(self):
+        index = self.rng.randrange(len(self.user_ids))
+        return f"/api/mood/guidance/{self.entry_ids[index]}", self.user_ids[index]
+
+    def scenarios(self):
+        """(route name, method, path or path factory, body factory) for every endpoint"""
+        return [
+            ("GET /api/", "GET", "/api/", None),
+            ("GET /healthz", "GET", "/healthz", None),
+            ("GET /health", "GET", "/health", None),
+            ("POST /api/mood/submit", "POST", "/api/mood/submit", self.mood_payload),
+            ("POST /api/mood/submit/batch", "POST", "/api/mood/submit/batch",
+             lambda: [self.mood_payload() for _ in range(10)]),
+            ("GET /api/mood/history", "GET", "/api/mood/history?limit=30", None),
+            ("GET /api/mood/guidance/{id}", "GET", self.guidance_path, None),
+            ("GET /api/mood/trends", "GET", "/api/mood/trends?days=14", None),
+            ("GET /api/mood/trends?granularity=day", "GET", "/api/mood/trends?days=30&granularity=day", None),
+            ("GET /api/mood/analytics", "GET", "/api/mood/analytics?days=30", None),
+            ("GET /api/mood/trigger-insights", "GET", "/api/mood/trigger-insights", None),
+            ("GET /api/mood/triggers/search", "GET", "/api/mood/triggers/search?q=wo", None),
+            ("GET /api/mood/trigger-heatmap", "GET", "/api/mood/trigger-heatmap", None),
+            ("POST /api/lifestyle/assess", "POST", "/api/lifestyle/assess", self.lifestyle_payload),
+            ("GET /api/lifestyle/history", "GET", "/api/lifestyle/history?limit=10", None),
+            ("GET /api/lifestyle/weekly-report", "GET", "/api/lifestyle/weekly-report", None),
+            ("POST /api/gratitude/add", "POST", "/api/gratitude/add", self.gratitude_payload),
+            ("POST /api/gratitude/add/batch", "POST", "/api/gratitude/add/batch",
+             lambda: [self.gratitude_payload() for _ in range(10)]),
+            ("GET /api/gratitude/entries", "GET", "/api/gratitude/entries?limit=30", None),
+            ("GET /api/user/export", "GET", "/api/user/export?format=ndjson", None),
+            ("POST /api/auth/signup", "POST", "/api/auth/signup", self.signup_payload),
+            ("POST /api/auth/login", "POST", "/api/auth/login", self.login_payload),
+            ("GET /api/auth/session", "GET", "/api/auth/session", None),
+        ]
+
+    async def run_route(self, client, name, method, path, body_factory):
+        """Fire --requests calls at --concurrency and record per-request latency"""
+        latencies, errors = [], 0
+        remaining = self.args.requests
+
+        async def worker():
+            nonlocal remaining, errors
+            while remaining > 0:
+                remaining -= 1
+                if callable(path):
+                    url, user_id = path()
+                else:
+                    url, user_id = path, self.rng.choice(self.user_ids)
+                body = body_factory() if body_factory else None
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, url, json=body, headers={"Authorization": f"Bearer {self.tokens[user_id]}"})
+                    if response.status_code >= 400:
+                        errors += 1
+                except Exception:
+                    errors += 1
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        self.results[name] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0,
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "max_ms": round(latencies[-1], 3) if latencies else 0
+        }
+        result = self.results[name]
+        status = "✅" if not errors else "⚠️ "
+        print(f"{status} {name:<42} {result['throughput_rps']:>9} req/s  "
+              f"p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  "
+              f"errors {errors}")
+
+    async def run(self):
+        import httpx
+
+        self.setup_app()
+        await self.server.startup_event()
+        await self.server.wait_until_ready()
+        try:
+            await self.seed_dataset()
+            print(f"🚀 Benchmarking {self.args.requests} requests per route at concurrency {self.args.concurrency}")
+            print("=" * 60)
+
+            transport = httpx.ASGITransport(app=self.server.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+                for name, method, path, body_factory in self.scenarios():
+                    if self.args.routes and not any(pattern in name for pattern in self.args.routes):
+                        continue
+                    if name not in READ_PATH_ROUTES:
+                        await self.run_route(client, name, method, path, body_factory)
+                        continue
+                    for suffix, flags in self.read_modes():
+                        if not self.args.mongo_url and name in MONGOMOCK_UNSUPPORTED and not all(flags.values()):
+                            print(f"⏭️  {name + suffix:<42} skipped: mongomock cannot run the raw aggregation, use --mongo-url")
+                            continue
+                        self.set_read_flags(flags)
+                        try:
+                            await self.run_route(client, name + suffix, method, path, body_factory)
+                        finally:
+                            self.set_read_flags(self.shipped_flags)
+        finally:
+            await self.server.shutdown_db_client()
+
+        return {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "database": "mongod" if self.args.mongo_url else "mongomock",
+                "users": self.args.users,
+                "entries": self.args.entries,
+                "requests": self.args.requests,
+                "concurrency": self.args.concurrency,
+                "llm_latency_ms": self.args.llm_latency_ms,
+                "seed": self.args.seed,
+                # Unsuffixed route names were measured with these flags
+                "read_flags": self.shipped_flags,
+                "read_path": self.args.read_path
+            },
+            "routes": self.results
+        }
+
+
+def compare(baseline, current, threshold):
+    """Print p95 deltas against a baseline run and return the regressed routes"""
+    regressions = []
+    print("\n" + "=" * 60)
+    print(f"📊 Comparison against {baseline['meta'].get('commit')} (threshold {threshold}%)")
+    for name, result in current["routes"].items():
+        previous = baseline["routes"].get(name)
+        if not previous or not previous["p95_ms"]:
+            continue
+        delta = (result["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] * 100
+        flag = "❌" if delta > threshold else "✅"
+        print(f"{flag} {name:<42} p95 {previous['p95_ms']:>8} -> {result['p95_ms']:>8} ms ({delta:+.1f}%)")
+        if delta > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mood Sync backend latency benchmark")
+    parser.add_argument("--users", type=int, default=10, help="Number of seeded users")
+    parser.add_argument("--entries", type=int, default=100, help="Entries per user in each collection")
+    parser.add_argument("--days", type=int, default=120, help="Spread seeded entries over this many days")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per route")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent in-flight requests per route")
+    parser.add_argument("--llm-latency-ms", type=float, default=50, help="Simulated LLM response time")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="bcrypt cost used for seeded and new users")
+    parser.add_argument("--mongo-url", help="Use a real MongoDB instead of mongomock-motor")
+    parser.add_argument("--read-path", choices=("shipped", "precomputed", "both"), default="both",
+                        help="Measure rollup/trigger-index backed routes on the configured path, the precomputed one, or both")
+    parser.add_argument("--route", dest="routes", action="append", help="Only run routes containing this text")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the dataset and request mix")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    parser.add_argument("--compare", help="Baseline JSON results to compare p95 latency against")
+    parser.add_argument("--threshold", type=float, default=20.0, help="p95 regression threshold in percent")
+    args = parser.parse_args()
+
+    results = asyncio.run(MoodSyncBenchmark(args).run())
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+        print(f"\n💾 Results written to {args.output}")
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text())
+        if compare(baseline, results, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,7 @@
 import React, { useState, useRef, useEffect } from 'react';
 import { Link, useLocation } from 'react-router-dom';
 import { Volume2, VolumeX, Menu, X, User } from 'lucide-react';
+import { logout } from '../utils/api';
 
 const Layout = ({ children }) => {
   const [mobileMenuOpen, setMobileMenuOpen] = useState(false);
@@ -22,8 +23,8 @@ const Layout = ({ children }) => {
     setMobileMenuOpen(false);
   };
 
-  const handleLogout = () => {
-    localStorage.removeItem('moodSyncUser');
+  const handleLogout = async () => {
+    await logout();
     setUser(null);
     setMobileMenuOpen(false);
     window.location.href = '/';
@@ -77,8 +78,8 @@ const Layout = ({ children }) => {
                 {showUserMenu && (
                   <div className="absolute right-0 top-full mt-2 w-40 bg-white rounded-lg shadow-lg border border-border py-2 z-50">
                     <button
-                      onClick={() => {
-                        localStorage.removeItem('moodSyncUser');
+                      onClick={async () => {
+                        await logout();
                         window.location.reload();
                       }}
                       className="w-full px-4 py-2 text-left text-sm text-red-500 hover:bg-red-50 transition-colors"
@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { useLocation, useNavigate } from 'react-router-dom';
 import { Sparkles, ArrowRight, Calendar } from 'lucide-react';
+import apiClient from '../utils/api';
 
 const Guidance = () => {
   const location = useLocation();
@@ -17,6 +18,32 @@ const Guidance = () => {
     }
   }, [location, navigate]);
 
+  // Guidance generated in the background arrives later, long-poll until it is ready
+  useEffect(() => {
+    if (!moodEntry || moodEntry.guidance_status !== 'pending') return;
+
+    let cancelled = false;
+    const pollGuidance = async () => {
+      while (!cancelled) {
+        try {
+          const response = await apiClient.get(`/mood/guidance/${moodEntry.id}?wait=20`);
+          if (!cancelled && response.data.guidance_status !== 'pending') {
+            setMoodEntry((entry) => ({ ...entry, ...response.data }));
+            return;
+          }
+        } catch (error) {
+          console.error('Error fetching guidance:', error);
+          await new Promise((resolve) => setTimeout(resolve, 3000));
+        }
+      }
+    };
+    pollGuidance();
+
+    return () => {
+      cancelled = true;
+    };
+  }, [moodEntry?.id, moodEntry?.guidance_status]);
+
   if (!moodEntry) {
     return (
       <div className="min-h-[calc(100vh-80px)] flex items-center justify-center">
@@ -101,6 +128,13 @@ const Guidance = () => {
         >
           <div className="prose prose-lg max-w-none">
             <div className="text-foreground/90 leading-relaxed whitespace-pre-line font-manrope">
+              {moodEntry.guidance_status === 'pending' && (
+                <div className="loading-dots">
+                  <span></span>
+                  <span></span>
+                  <span></span>
+                </div>
+              )}
               {moodEntry.ai_guidance.split(/(breathing|breathe|breath)/gi).map((part, index) => {
                 if (part.toLowerCase().match(/breath/)) {
                   return (
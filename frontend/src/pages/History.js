@@ -19,7 +19,7 @@ const History = () => {
     totalEntries: 0,
   });
   const [triggerInsights, setTriggerInsights] = useState({ common_triggers: [], total_entries: 0 });
-  const [triggerHeatmap, setTriggerHeatmap] = useState({ heatmap_data: [] });
+  const [triggerHeatmap, setTriggerHeatmap] = useState([]);
 
   useEffect(() => {
     if (user) {
@@ -43,7 +43,19 @@ const History = () => {
   const fetchTriggerHeatmap = async () => {
     try {
       const response = await apiClient.get('/mood/trigger-heatmap');
-      setTriggerHeatmap(response.data);
+      // Flatten the date x trigger grid into cells, newest day first
+      const { dates, triggers, cells } = response.data;
+      setTriggerHeatmap(
+        cells
+          .map(([day, trigger, count, intensity, emotion]) => ({
+            date: dates[day],
+            trigger: triggers[trigger],
+            count,
+            intensity,
+            emotion
+          }))
+          .reverse()
+      );
     } catch (error) {
       console.error('Error fetching trigger heatmap:', error);
     }
@@ -302,7 +314,7 @@ const History = () => {
             )}
 
             {/* Trigger Heatmap */}
-            {triggerHeatmap.heatmap_data.length > 0 && (
+            {triggerHeatmap.length > 0 && (
               <div data-testid="trigger-heatmap" className="bg-white rounded-3xl p-8 shadow-soft border border-border mb-8">
                 <h2 className="text-2xl font-playfair font-semibold text-foreground mb-6">Trigger Intensity Heatmap</h2>
                 <p className="text-sm text-muted-foreground mb-6">
@@ -310,7 +322,7 @@ const History = () => {
                 </p>
                 
                 <div className="grid grid-cols-7 gap-2">
-                  {triggerHeatmap.heatmap_data.slice(0, 49).map((data, index) => {
+                  {triggerHeatmap.slice(0, 49).map((data, index) => {
                     const intensityColor = data.intensity >= 8 ? 'bg-red-500' : 
                                           data.intensity >= 6 ? 'bg-orange-400' :
                                           data.intensity >= 4 ? 'bg-yellow-400' : 'bg-green-400';
@@ -318,7 +330,7 @@ const History = () => {
                       <div
                         key={index}
                         className={`h-16 rounded-lg ${intensityColor} flex items-center justify-center text-xs text-white font-medium p-2 text-center hover:scale-105 transition-transform cursor-pointer`}
-                        title={`${data.date}: ${data.trigger} - ${data.emotion} (${data.intensity}/10)`}
+                        title={`${data.date}: ${data.trigger} - mostly ${data.emotion} (${data.intensity}/10 over ${data.count} check-in${data.count === 1 ? '' : 's'})`}
                       >
                         {data.intensity}
                       </div>
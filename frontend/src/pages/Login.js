@@ -53,7 +53,7 @@ const Login = () => {
         password
       });
 
-      const user = response.data.user;
+      const user = { ...response.data.user, token: response.data.token };
       localStorage.setItem('moodSyncUser', JSON.stringify(user));
       toast.success('Login successful!');
       navigate('/');
@@ -14,27 +14,17 @@ const PrivacySettings = () => {
     try {
       toast.info('Preparing your data for download...');
       
-      // Fetch all user data
-      const [moodData, gratitudeData, lifestyleData] = await Promise.all([
-        apiClient.get('/mood/history?limit=1000'),
-        apiClient.get('/gratitude/entries?limit=1000'),
-        apiClient.get('/lifestyle/history?limit=1000')
-      ]);
-
-      const exportData = {
-        export_date: new Date().toISOString(),
-        user: user,
-        mood_entries: moodData.data,
-        gratitude_entries: gratitudeData.data,
-        lifestyle_assessments: lifestyleData.data
-      };
+      // Stream every entry from the export endpoint as newline-delimited JSON
+      const response = await apiClient.get('/user/export', {
+        params: { format: 'ndjson' },
+        responseType: 'blob'
+      });
 
       // Create downloadable file
-      const blob = new Blob([JSON.stringify(exportData, null, 2)], { type: 'application/json' });
-      const url = URL.createObjectURL(blob);
+      const url = URL.createObjectURL(response.data);
       const a = document.createElement('a');
       a.href = url;
-      a.download = `mood-sync-data-${new Date().toISOString().split('T')[0]}.json`;
+      a.download = `mood-sync-data-${new Date().toISOString().split('T')[0]}.ndjson`;
       document.body.appendChild(a);
       a.click();
       document.body.removeChild(a);
@@ -54,13 +44,13 @@ const PrivacySettings = () => {
     }
 
     try {
-      // Delete all user data from backend
+      // Queue deletion of all user data on the backend
       await apiClient.delete('/user/data');
       
       // Clear local storage
       localStorage.removeItem('moodSyncUser');
       
-      toast.success('All account data deleted. Redirecting...');
+      toast.success('Account deletion started. Your data will be removed shortly. Redirecting...');
       setTimeout(() => {
         window.location.href = '/';
       }, 2000);
@@ -8,13 +8,47 @@ const apiClient = axios.create({
   baseURL: API,
 });
 
-// Add user_id to all requests
+// Users saved before session tokens existed have no token and must log in again
+const signInAgain = () => {
+  localStorage.removeItem('moodSyncUser');
+  if (window.location.pathname !== '/login') {
+    window.location.href = '/login';
+  }
+};
+
+// Add the session token to all requests
 apiClient.interceptors.request.use((config) => {
   const user = JSON.parse(localStorage.getItem('moodSyncUser') || 'null');
-  if (user && user.id) {
-    config.headers['X-User-Id'] = user.id;
+  if (user && !user.token) {
+    signInAgain();
+    return Promise.reject(new axios.CanceledError('Signed in before session tokens, please log in again'));
+  }
+  if (user) {
+    config.headers['Authorization'] = `Bearer ${user.token}`;
   }
   return config;
 });
 
+// A 401 means the session expired or was revoked: sign out locally so they log in again
+apiClient.interceptors.response.use(
+  (response) => response,
+  (error) => {
+    if (error.response?.status === 401 && localStorage.getItem('moodSyncUser')) {
+      signInAgain();
+    }
+    return Promise.reject(error);
+  }
+);
+
+// Revoke the session server-side, then forget it locally
+export const logout = async () => {
+  try {
+    await apiClient.post('/auth/logout');
+  } catch (error) {
+    console.error('Error during logout:', error);
+  }
+  localStorage.removeItem('moodSyncUser');
+};
+
 export default apiClient;
+
@@ -0,0 +1,10 @@
+import os
+import sys
+from pathlib import Path
+
+# server.py reads its configuration at import time
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "test_database")
+os.environ.setdefault("SESSION_SECRET", "test-session-secret")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
@@ -0,0 +1,151 @@
+"""In-memory stand-ins for the parts of the Motor API the tested code uses"""
+import copy
+from datetime import datetime
+from types import SimpleNamespace
+
+
+def _matches(doc, query):
+    for field, condition in query.items():
+        if field == "$or":
+            if not any(_matches(doc, clause) for clause in condition):
+                return False
+            continue
+        if field == "$and":
+            if not all(_matches(doc, clause) for clause in condition):
+                return False
+            continue
+        value = doc.get(field)
+        if isinstance(condition, dict):
+            for op, operand in condition.items():
+                if op == "$in" and value not in operand:
+                    return False
+                if op == "$nin" and value in operand:
+                    return False
+                if op == "$exists" and (field in doc) != operand:
+                    return False
+                if op == "$lt" and not (type(value) is type(operand) and value < operand):
+                    return False
+                if op == "$ne" and value == operand:
+                    return False
+                if op == "$type" and not (operand == "string" and isinstance(value, str)):
+                    return False
+        elif value != condition:
+            return False
+    return True
+
+
+def _apply_update(doc, update):
+    for field, value in update.get("$set", {}).items():
+        doc[field] = value
+    for field in update.get("$unset", {}):
+        doc.pop(field, None)
+    for path, amount in update.get("$inc", {}).items():
+        target = doc
+        *parents, leaf = path.split(".")
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[leaf] = target.get(leaf, 0) + amount
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, keys):
+        # BSON orders strings before dates, so mixed columns still sort
+        for field, direction in reversed(keys):
+            self.docs.sort(key=lambda doc: (isinstance(doc.get(field), datetime), doc.get(field)), reverse=direction < 0)
+        return self
+
+    def limit(self, count):
+        self.docs = self.docs[:count]
+        return self
+
+    async def to_list(self, length=None):
+        return self.docs if length is None else self.docs[:length]
+
+
+class FakeCollection:
+    def __init__(self, docs=None):
+        self.docs = [copy.deepcopy(doc) for doc in docs or []]
+        self.calls = []
+
+    def _find(self, query):
+        return [doc for doc in self.docs if _matches(doc, query)]
+
+    def find(self, query=None, projection=None):
+        self.calls.append(("find", query))
+        return FakeCursor([copy.deepcopy(doc) for doc in self._find(query or {})])
+
+    async def find_one(self, query, projection=None):
+        found = self._find(query)
+        return copy.deepcopy(found[0]) if found else None
+
+    async def insert_many(self, docs, ordered=True):
+        self.calls.append(("insert_many", len(docs)))
+        self.docs.extend(copy.deepcopy(doc) for doc in docs)
+        return SimpleNamespace(inserted_ids=[doc.get("_id") for doc in docs])
+
+    async def insert_one(self, doc):
+        return await self.insert_many([doc])
+
+    async def update_one(self, query, update, upsert=False):
+        found = self._find(query)
+        if found:
+            _apply_update(found[0], update)
+        elif upsert:
+            doc = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            _apply_update(doc, update)
+            self.docs.append(doc)
+        return SimpleNamespace(matched_count=len(found[:1]), modified_count=len(found[:1]))
+
+    async def update_many(self, query, update):
+        found = self._find(query)
+        for doc in found:
+            _apply_update(doc, update)
+        return SimpleNamespace(matched_count=len(found), modified_count=len(found))
+
+    async def replace_one(self, query, replacement, upsert=False):
+        found = self._find(query)
+        if found:
+            self.docs[self.docs.index(found[0])] = copy.deepcopy(replacement)
+        elif upsert:
+            self.docs.append(copy.deepcopy(replacement))
+        return SimpleNamespace(matched_count=len(found[:1]))
+
+    async def find_one_and_update(self, query, update, upsert=False, **kwargs):
+        found = self._find(query)
+        if found:
+            _apply_update(found[0], update)
+            return copy.deepcopy(found[0])
+        if not upsert:
+            return None
+        doc = {k: v for k, v in query.items() if not isinstance(v, dict)}
+        _apply_update(doc, {**update, "$set": {**update.get("$setOnInsert", {}), **update.get("$set", {})}})
+        self.docs.append(doc)
+        return copy.deepcopy(doc)
+
+    async def delete_many(self, query):
+        self.calls.append(("delete_many", query))
+        kept = [doc for doc in self.docs if not _matches(doc, query)]
+        deleted = len(self.docs) - len(kept)
+        self.docs = kept
+        return SimpleNamespace(deleted_count=deleted)
+
+    def with_options(self, **kwargs):
+        return self
+
+
+class FakeDatabase:
+    """Collections are created on first access, like Mongo's"""
+
+    def __init__(self, **collections):
+        self.collections = collections
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return self.collections.setdefault(name, FakeCollection())
+
+    def __getitem__(self, name):
+        return getattr(self, name)
@@ -0,0 +1,162 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from analytics import MoodColumns, to_datetime64, week_start
+
+LEVELS = ("emotion_level", "energy_level")
+
+
+def entry(timestamp, emotion="calm", trigger="", emotion_level=5, energy_level=5):
+    return {
+        "timestamp": timestamp,
+        "emotion": emotion,
+        "trigger": trigger,
+        "emotion_level": emotion_level,
+        "energy_level": energy_level,
+    }
+
+
+def columns(docs):
+    return MoodColumns.from_docs(docs, LEVELS)
+
+
+def test_empty_input():
+    empty = columns([])
+    assert len(empty) == 0
+    assert empty.trend_labels() == []
+    assert empty.daily_means() == []
+    assert empty.weekly_means(8) == []
+    assert empty.rolling(7, 30) == []
+    assert empty.trigger_histogram(5) == []
+    assert empty.trigger_day_cells("emotion_level") == []
+    assert empty.correlations() == {a: {b: None for b in LEVELS} for a in LEVELS}
+
+
+def test_single_entry():
+    single = columns([entry("2024-03-06T09:15:42.123456", trigger="Work", emotion_level=7, energy_level=3)])
+    assert single.trend_labels() == ["2024-03-06 09:15"]
+    assert single.weekly_means(8) == [
+        {"week": "2024-03-04", "entries_count": 1, "emotion_level": 7.0, "energy_level": 3.0}
+    ]
+    assert single.rolling(7, 30) == [{
+        "date": "2024-03-06",
+        "entries_count": 1,
+        "emotion_level_mean": 7.0,
+        "emotion_level_volatility": 0.0,
+        "energy_level_mean": 3.0,
+        "energy_level_volatility": 0.0,
+    }]
+    assert single.trigger_day_cells("emotion_level") == [("2024-03-06", "work", 1, 7.0, {"calm": 1})]
+    assert single.correlations()["emotion_level"]["energy_level"] is None
+
+
+def test_mixed_string_and_aware_datetimes_are_utc():
+    aware = datetime(2024, 3, 6, 23, 30, tzinfo=timezone.utc).astimezone(timezone.utc)
+    values = to_datetime64(["2024-03-05T10:00:00", aware])
+    assert [str(v) for v in values] == ["2024-03-05T10:00:00", "2024-03-06T23:30:00"]
+
+
+def test_missing_and_malformed_timestamps_become_nat():
+    converted = to_datetime64(["2026-01-05T10:00:00", None, "garbage", datetime(2026, 1, 6)])
+    assert converted[0] == np.datetime64("2026-01-05T10:00:00")
+    assert np.isnat(converted[1]) and np.isnat(converted[2])
+    assert np.isnat(to_datetime64(["2026-01-05T10:00:00", "not a date"])[1])
+
+
+def test_entries_without_a_usable_timestamp_are_left_out():
+    docs = [entry("2026-01-05T10:00:00", emotion_level=4), entry(None, emotion_level=9), entry("bad", emotion_level=9)]
+    dated = columns(docs)
+    assert len(dated) == 1
+    assert dated.levels["emotion_level"].tolist() == [4.0]
+    assert dated.emotions.tolist() == ["calm"]
+    assert dated.trend_labels() == ["2026-01-05 10:00"]
+    assert len(columns([entry(None)])) == 0
+
+
+def test_week_start_is_monday():
+    days = to_datetime64(["2024-03-03T12:00:00", "2024-03-04T00:00:00", "2024-03-10T23:59:59"]).astype("datetime64[D]")
+    assert [str(d) for d in week_start(days)] == ["2024-02-26", "2024-03-04", "2024-03-04"]
+
+
+def test_daily_means_bucket_by_utc_day_newest_first():
+    data = columns([
+        entry("2024-03-02T23:59:59", emotion="sad", emotion_level=2),
+        entry("2024-03-02T00:00:00", emotion="happy", emotion_level=8),
+        entry("2024-03-02T12:00:00", emotion="happy", emotion_level=5),
+        entry("2024-03-01T23:00:00", emotion="calm", emotion_level=4),
+        entry("2024-03-01T22:00:00", emotion="anxious", emotion_level=6),
+    ])
+    assert [(d["date"], d["entries_count"], d["emotion"], d["emotion_level"]) for d in data.daily_means()] == [
+        ("2024-03-02", 3, "happy", 5.0),
+        ("2024-03-01", 2, "anxious", 5.0),
+    ]
+
+
+def test_weekly_means_bucket_by_week_newest_first():
+    data = columns([
+        entry("2024-03-01T08:00:00", emotion_level=2),
+        entry("2024-03-04T08:00:00", emotion_level=4),
+        entry("2024-03-10T20:00:00", emotion_level=8),
+        entry("2024-03-12T08:00:00", emotion_level=6),
+    ])
+    weeks = data.weekly_means(8)
+    assert [(w["week"], w["entries_count"], w["emotion_level"]) for w in weeks] == [
+        ("2024-03-11", 1, 6.0),
+        ("2024-03-04", 2, 6.0),
+        ("2024-02-26", 1, 2.0),
+    ]
+    assert [w["week"] for w in data.weekly_means(2)] == ["2024-03-11", "2024-03-04"]
+
+
+def test_rolling_fills_empty_days_and_weights_by_entry():
+    data = columns([
+        entry("2024-03-01T08:00:00", emotion_level=2),
+        entry("2024-03-01T20:00:00", emotion_level=4),
+        entry("2024-03-03T08:00:00", emotion_level=9),
+    ])
+    rows = data.rolling(2, 30)
+    assert [(r["date"], r["entries_count"], r["emotion_level_mean"]) for r in rows] == [
+        ("2024-03-01", 2, 3.0),
+        ("2024-03-02", 2, 3.0),
+        ("2024-03-03", 1, 9.0),
+    ]
+    assert rows[0]["emotion_level_volatility"] == 1.0
+    assert [r["date"] for r in data.rolling(2, 1)] == ["2024-03-03"]
+
+
+def test_trigger_day_cells_group_by_day_and_trigger():
+    data = columns([
+        entry("2024-03-01T08:00:00", emotion="anxious", trigger="Work", emotion_level=3),
+        entry("2024-03-01T18:00:00", emotion="calm", trigger="work ", emotion_level=7),
+        entry("2024-03-01T19:00:00", emotion="calm", trigger="family", emotion_level=6),
+        entry("2024-03-02T08:00:00", emotion="anxious", trigger="work", emotion_level=2),
+        entry("2024-03-02T09:00:00", emotion="happy", trigger="", emotion_level=9),
+    ])
+    assert data.trigger_day_cells("emotion_level") == [
+        ("2024-03-01", "family", 1, 6.0, {"calm": 1}),
+        ("2024-03-01", "work", 2, 10.0, {"anxious": 1, "calm": 1}),
+        ("2024-03-02", "work", 1, 2.0, {"anxious": 1}),
+    ]
+
+
+def test_trigger_histogram_orders_by_count_then_first_seen():
+    data = columns([
+        entry("2024-03-01T08:00:00", trigger="sleep"),
+        entry("2024-03-01T09:00:00", trigger="work", emotion="anxious"),
+        entry("2024-03-01T10:00:00", trigger="work"),
+        entry("2024-03-01T11:00:00", trigger="family"),
+    ])
+    histogram = data.trigger_histogram(2)
+    assert [(h["trigger"], h["count"]) for h in histogram] == [("work", 2), ("sleep", 1)]
+    assert histogram[0]["emotions"] == {"anxious": 1, "calm": 1}
+
+
+def test_correlations():
+    data = columns([
+        entry("2024-03-01T08:00:00", emotion_level=1, energy_level=2),
+        entry("2024-03-02T08:00:00", emotion_level=2, energy_level=4),
+        entry("2024-03-03T08:00:00", emotion_level=3, energy_level=6),
+    ])
+    assert data.correlations()["emotion_level"]["energy_level"] == pytest.approx(1.0)
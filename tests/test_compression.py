@@ -0,0 +1,71 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response
+
+import server
+
+BODY = "mood " * 1000
+
+
+def make_app():
+    app = FastAPI()
+
+    @app.get("/strong")
+    async def strong():
+        return PlainTextResponse(BODY, headers={"ETag": '"abc"'})
+
+    @app.get("/weak")
+    async def weak():
+        return PlainTextResponse(BODY, headers={"ETag": 'W/"abc"'})
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("ok", headers={"ETag": '"abc"'})
+
+    @app.get("/binary")
+    async def binary():
+        return Response(b"\x00" * 4096, media_type="application/octet-stream")
+
+    app.add_middleware(server.CompressionMiddleware, minimum_size=1024)
+    return app
+
+
+def get(path, encoding="gzip"):
+    async def send():
+        transport = httpx.ASGITransport(app=make_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path, headers={"Accept-Encoding": encoding})
+    return asyncio.run(send())
+
+
+def test_compresses_large_bodies_and_weakens_strong_etags():
+    response = get("/strong")
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["ETag"] == 'W/"abc"'
+    assert "Accept-Encoding" in response.headers["Vary"]
+    assert response.text == BODY
+
+
+def test_weak_etag_is_kept():
+    assert get("/weak").headers["ETag"] == 'W/"abc"'
+
+
+def test_small_and_uncompressible_bodies_pass_through():
+    small = get("/small")
+    assert "Content-Encoding" not in small.headers
+    assert small.headers["ETag"] == '"abc"'
+    assert "Content-Encoding" not in get("/binary").headers
+
+
+def test_identity_requested():
+    response = get("/strong", encoding="identity")
+    assert "Content-Encoding" not in response.headers
+    assert response.headers["ETag"] == '"abc"'
+
+
+def test_accepted_encoding():
+    assert server.accepted_encoding("gzip, deflate") == "gzip"
+    assert server.accepted_encoding("gzip;q=0") is None
+    assert server.accepted_encoding("") is None
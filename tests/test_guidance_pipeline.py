@@ -0,0 +1,105 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+from tests.fakes import FakeCollection, FakeDatabase
+
+
+def pending_entry(entry_id, **fields):
+    return {
+        "_id": entry_id,
+        "id": entry_id,
+        "user_id": None,
+        "emotion": "calm",
+        "emotion_level": 5,
+        "energy_level": 5,
+        "focus_level": 5,
+        "overthinking": "no",
+        "guidance_status": server.GUIDANCE_PENDING,
+        **fields,
+    }
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase(mood_entries=FakeCollection())
+    monkeypatch.setattr(server, "db", database)
+    return database
+
+
+def pipeline(queue_size=10):
+    return server.GuidancePipeline(workers=1, queue_size=queue_size, lease_seconds=300, requeue_interval=60)
+
+
+def test_replicas_never_claim_the_same_entry(database):
+    database.mood_entries.docs = [pending_entry(f"e{i}") for i in range(5)]
+    first, second = pipeline(queue_size=3), pipeline(queue_size=3)
+
+    async def claim():
+        return await first.requeue_pending(), await second.requeue_pending()
+
+    assert asyncio.run(claim()) == (3, 2)
+    first_ids = {job[0] for job in first.queue._queue}
+    second_ids = {job[0] for job in second.queue._queue}
+    assert first_ids.isdisjoint(second_ids)
+    assert first_ids | second_ids == {f"e{i}" for i in range(5)}
+
+
+def test_live_leases_are_respected_and_expired_ones_reclaimed(database):
+    now = datetime.now(timezone.utc)
+    database.mood_entries.docs = [
+        pending_entry("live", guidance_owner="other", guidance_lease_until=now + timedelta(minutes=5)),
+        pending_entry("expired", guidance_owner="other", guidance_lease_until=now - timedelta(seconds=1)),
+        pending_entry("done", guidance_status=server.GUIDANCE_COMPLETE),
+    ]
+    replica = pipeline()
+
+    assert asyncio.run(replica.requeue_pending()) == 1
+    assert [job[0] for job in replica.queue._queue] == ["expired"]
+    assert database.mood_entries.docs[1]["guidance_owner"] == replica.owner
+
+
+def test_worker_skips_entries_claimed_elsewhere(monkeypatch, database):
+    replica = pipeline()
+    database.mood_entries.docs = [
+        pending_entry("mine", **replica.lease()),
+        pending_entry("taken", guidance_owner="other", guidance_lease_until=datetime.now(timezone.utc)),
+    ]
+    generated = []
+
+    async def fake_guidance(mood_data, user_name=None):
+        generated.append(mood_data.emotion)
+        return "Breathe."
+
+    monkeypatch.setattr(server, "generate_mood_guidance", fake_guidance)
+    monkeypatch.setattr(server, "record_user_write", lambda user_id: asyncio.sleep(0))
+
+    async def process():
+        for doc in database.mood_entries.docs:
+            replica.enqueue(doc["id"], server.MoodEntryCreate(**doc), None)
+        worker = asyncio.create_task(replica._worker(0))
+        await asyncio.wait_for(replica.queue.join(), timeout=2)
+        worker.cancel()
+
+    asyncio.run(process())
+    mine, taken = database.mood_entries.docs
+    assert generated == ["calm"]
+    assert mine["guidance_status"] == server.GUIDANCE_COMPLETE and mine["ai_guidance"] == "Breathe."
+    assert "guidance_owner" not in mine and "guidance_lease_until" not in mine
+    assert taken["guidance_status"] == server.GUIDANCE_PENDING
+    assert not replica.held
+
+
+def test_sweep_renews_queued_entries_instead_of_claiming_them_again(database):
+    replica = pipeline()
+    lapsed = {"guidance_owner": replica.owner, "guidance_lease_until": datetime.now(timezone.utc) - timedelta(seconds=1)}
+    database.mood_entries.docs = [pending_entry("queued", **lapsed)]
+    replica.enqueue("queued", server.MoodEntryCreate(**database.mood_entries.docs[0]), None)
+
+    assert asyncio.run(replica.requeue_pending()) == 0
+    assert replica.queue.qsize() == 1
+    assert database.mood_entries.docs[0]["guidance_lease_until"] > datetime.now(timezone.utc)
+    # The renewed lease also keeps other replicas away
+    assert asyncio.run(pipeline().requeue_pending()) == 0
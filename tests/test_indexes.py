@@ -0,0 +1,75 @@
+import asyncio
+
+import server
+
+IXSCAN_PLAN = {
+    "stage": "FETCH",
+    "inputStage": {"stage": "IXSCAN", "indexName": "user_id_1_timestamp_-1_id_-1"},
+}
+SORTED_COLLSCAN_PLAN = {
+    "stage": "SORT",
+    "inputStage": {"stage": "OR", "inputStages": [{"stage": "IXSCAN"}, {"stage": "COLLSCAN"}]},
+}
+
+
+class ExplainCursor:
+    def __init__(self, plan):
+        self.plan = plan
+
+    def sort(self, sort):
+        return self
+
+    async def explain(self):
+        return {"queryPlanner": {"winningPlan": self.plan}}
+
+
+class ExplainCollection:
+    def __init__(self, plan):
+        self.plan = plan
+
+    def find(self, query):
+        if self.plan is None:
+            raise RuntimeError("explain not supported")
+        return ExplainCursor(self.plan)
+
+
+class ExplainDatabase:
+    def __init__(self, plans):
+        self.plans = plans
+
+    def __getitem__(self, name):
+        return ExplainCollection(self.plans.get(name, IXSCAN_PLAN))
+
+
+def index_keys(collection):
+    return [list(model.document["key"].items()) for model in server.INDEX_SPECS[collection]]
+
+
+def test_plan_stages_walks_nested_and_listed_stages():
+    assert list(server._plan_stages(IXSCAN_PLAN)) == ["FETCH", "IXSCAN"]
+    assert set(server._plan_stages(SORTED_COLLSCAN_PLAN)) == {"SORT", "OR", "IXSCAN", "COLLSCAN"}
+    assert list(server._plan_stages({})) == []
+
+
+def test_verify_query_plans_flags_collection_scans(monkeypatch):
+    monkeypatch.setattr(server, "db", ExplainDatabase({"lifestyle_assessments": SORTED_COLLSCAN_PLAN, "users": None}))
+    results = asyncio.run(server.verify_query_plans())
+
+    assert results["weekly_report"] is False
+    assert results["mood_history"] is True
+    # Queries that cannot be explained are skipped rather than failing startup
+    assert "user_login" not in results
+
+
+def test_every_hot_query_has_an_index_with_its_equality_field_first():
+    for name, collection, query, sort in server.HOT_QUERIES:
+        equality = next(field for field, value in query.items() if not isinstance(value, dict))
+        candidates = [keys for keys in index_keys(collection) if keys[0][0] == equality]
+        assert candidates, f"{name} has no index led by {equality}"
+        if sort:
+            assert any(keys[1:1 + len(sort)] == sort for keys in candidates), f"{name} cannot use an index for its sort"
+
+
+def test_list_indexes_end_with_the_cursor_tiebreaker():
+    for collection, sort_field in (("mood_entries", "timestamp"), ("gratitude_entries", "date"), ("lifestyle_assessments", "date")):
+        assert [("user_id", 1), (sort_field, -1), ("id", -1)] in index_keys(collection)
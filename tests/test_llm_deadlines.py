@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def fast_deadlines(monkeypatch):
+    monkeypatch.setattr(server, "LLM_TIMEOUT_SECONDS", 0.3)
+    monkeypatch.setattr(server, "LLM_HEDGE_ENABLED", True)
+    monkeypatch.setattr(server, "LLM_HEDGE_MIN_DELAY_SECONDS", 0.05)
+    monkeypatch.setattr(server, "llm_latency", server.LatencyTracker())
+
+
+def scripted_guidance(monkeypatch, *attempts):
+    """Each LLM attempt sleeps for the given seconds, then returns or raises its outcome"""
+    calls = []
+
+    async def fake_request(api_key, mood_data, greeting_name):
+        delay, outcome = attempts[len(calls)]
+        calls.append(delay)
+        await asyncio.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(server, "request_mood_guidance", fake_request)
+    return calls
+
+
+def guide():
+    return asyncio.run(server.request_guidance_with_deadline("key", None, "friend"))
+
+
+def test_fast_primary_is_not_hedged(fast_deadlines, monkeypatch):
+    calls = scripted_guidance(monkeypatch, (0.0, "primary"))
+    assert guide() == "primary"
+    assert len(calls) == 1
+
+
+def test_slow_primary_is_hedged_and_the_faster_attempt_wins(fast_deadlines, monkeypatch):
+    calls = scripted_guidance(monkeypatch, (0.25, "primary"), (0.0, "hedge"))
+    assert guide() == "hedge"
+    assert len(calls) == 2
+
+
+def test_hedging_can_be_disabled(fast_deadlines, monkeypatch):
+    monkeypatch.setattr(server, "LLM_HEDGE_ENABLED", False)
+    calls = scripted_guidance(monkeypatch, (0.1, "primary"), (0.0, "hedge"))
+    assert guide() == "primary"
+    assert len(calls) == 1
+
+
+def test_deadline_raises_timeout_when_both_attempts_hang(fast_deadlines, monkeypatch):
+    scripted_guidance(monkeypatch, (5, "primary"), (5, "hedge"))
+    with pytest.raises(asyncio.TimeoutError):
+        guide()
+
+
+def test_error_is_raised_once_every_attempt_failed(fast_deadlines, monkeypatch):
+    scripted_guidance(monkeypatch, (0.1, ValueError("first")), (0.0, ValueError("hedge")))
+    with pytest.raises(ValueError):
+        guide()
+
+
+def test_hedge_delay_uses_the_latency_percentile(monkeypatch):
+    monkeypatch.setattr(server, "LLM_HEDGE_MIN_DELAY_SECONDS", 0.5)
+    tracker = server.LatencyTracker()
+    for _ in range(tracker.MIN_SAMPLES - 1):
+        tracker.record(10.0)
+    assert tracker.hedge_delay() == 0.5
+
+    tracker = server.LatencyTracker()
+    for seconds in range(1, 101):
+        tracker.record(seconds / 10)
+    assert tracker.hedge_delay() == pytest.approx(9.6)
+    tracker.samples.clear()
+    tracker.samples.extend([0.1] * 50)
+    assert tracker.hedge_delay() == 0.5
+
+
+def test_breaker_opens_after_consecutive_failures_and_probes_once():
+    breaker = server.CircuitBreaker(failure_threshold=2, reset_seconds=30)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.allow() and breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    breaker.opened_at -= 30
+    assert breaker.allow() and breaker.state == "half_open"
+    assert not breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    breaker.opened_at -= 30
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.snapshot() == {"state": "closed", "consecutive_failures": 0}
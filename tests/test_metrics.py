@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = server.MetricsRegistry()
+    registry.histogram("mongo_command_duration_seconds", "test")
+    registry.counter("mongo_command_failures_total", "test")
+    monkeypatch.setattr(server, "metrics", registry)
+    return registry
+
+
+def run_command(listener, request_id, command_name, command, failed=False):
+    listener.started(SimpleNamespace(request_id=request_id, command_name=command_name, command=command))
+    finished = SimpleNamespace(request_id=request_id, command_name=command_name, duration_micros=1500)
+    (listener.failed if failed else listener.succeeded)(finished)
+
+
+def labels(registry, name):
+    return [dict(key) for key in registry.families[name]["series"]]
+
+
+def test_commands_are_labelled_with_their_collection(registry):
+    listener = server.MongoCommandMetrics()
+    run_command(listener, 1, "find", {"find": "mood_entries", "filter": {}})
+    run_command(listener, 2, "getMore", {"getMore": 8123456789, "collection": "mood_entries"})
+    run_command(listener, 3, "insert", {"insert": "gratitude_entries"}, failed=True)
+
+    assert labels(registry, "mongo_command_duration_seconds") == [
+        {"collection": "mood_entries", "operation": "find"},
+        {"collection": "mood_entries", "operation": "getMore"},
+        {"collection": "gratitude_entries", "operation": "insert"},
+    ]
+    assert labels(registry, "mongo_command_failures_total") == [{"collection": "gratitude_entries", "operation": "insert"}]
+    assert not listener.in_flight
+
+
+def test_commands_without_a_collection_are_labelled_unknown(registry):
+    listener = server.MongoCommandMetrics()
+    run_command(listener, 1, "ping", {"ping": 1})
+    run_command(listener, 2, "aggregate", {"aggregate": 1, "pipeline": [{"$currentOp": {}}]})
+
+    assert {series["collection"] for series in labels(registry, "mongo_command_duration_seconds")} == {"unknown"}
+
+
+def test_histogram_render(registry):
+    registry.observe("mongo_command_duration_seconds", 0.003, collection="users", operation="find")
+    text = registry.render()
+    assert 'mongo_command_duration_seconds_count{collection="users",operation="find"} 1' in text
+    assert "# TYPE mongo_command_failures_total counter" in text
@@ -0,0 +1,42 @@
+import pytest
+from pymongo.read_preferences import Primary, SecondaryPreferred
+
+import server
+
+
+def test_client_options_only_include_configured_values(monkeypatch):
+    for env_name, _ in server.MONGO_CLIENT_OPTIONS.values():
+        monkeypatch.delenv(env_name, raising=False)
+    assert server.mongo_client_options() == {}
+
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "50")
+    monkeypatch.setenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "2000")
+    monkeypatch.setenv("MONGO_COMPRESSORS", "zstd,zlib")
+    monkeypatch.setenv("MONGO_MIN_POOL_SIZE", "")
+    assert server.mongo_client_options() == {"maxPoolSize": 50, "waitQueueTimeoutMS": 2000, "compressors": "zstd,zlib"}
+
+
+def test_client_options_reject_non_numeric_values(monkeypatch):
+    monkeypatch.setenv("MONGO_MAX_POOL_SIZE", "lots")
+    with pytest.raises(ValueError):
+        server.mongo_client_options()
+
+
+def test_analytics_read_preference_defaults_to_secondary_preferred(monkeypatch):
+    monkeypatch.setattr(server, "MONGO_ANALYTICS_READ_PREFERENCE", "secondaryPreferred")
+    monkeypatch.setattr(server, "MONGO_ANALYTICS_MAX_STALENESS_SECONDS", 120)
+    preference = server.analytics_read_preference()
+    assert isinstance(preference, SecondaryPreferred)
+    assert preference.max_staleness == 120
+
+
+def test_analytics_read_preference_primary_ignores_staleness(monkeypatch):
+    monkeypatch.setattr(server, "MONGO_ANALYTICS_READ_PREFERENCE", "primary")
+    monkeypatch.setattr(server, "MONGO_ANALYTICS_MAX_STALENESS_SECONDS", 120)
+    assert isinstance(server.analytics_read_preference(), Primary)
+
+
+def test_unknown_analytics_read_preference_is_an_error(monkeypatch):
+    monkeypatch.setattr(server, "MONGO_ANALYTICS_READ_PREFERENCE", "secondary_preferred")
+    with pytest.raises(ValueError):
+        server.analytics_read_preference()
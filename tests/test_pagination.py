@@ -0,0 +1,65 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from tests.fakes import FakeCollection
+
+
+def test_cursor_round_trips_strings_and_datetimes():
+    moment = datetime(2026, 3, 1, 8, 30, tzinfo=timezone.utc)
+    for sort_value in ("2026-03-01", moment):
+        cursor = server.encode_page_cursor(sort_value, "entry-1")
+        assert "=" not in cursor
+        assert server.decode_page_cursor(cursor) == (sort_value, "entry-1")
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "", "e30", server.encode_page_cursor("x", "y")[:-3] + "!!!"])
+def test_garbage_cursors_are_rejected_with_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        server.decode_page_cursor(cursor)
+    assert error.value.status_code == 400
+
+
+def test_fetch_page_walks_every_entry_once_across_equal_sort_values():
+    # Two entries per day so the id tiebreaker decides page boundaries
+    docs = [{"user_id": "u1", "date": f"2026-01-0{day}", "id": f"{day}-{n}"} for day in range(1, 6) for n in "ab"]
+    docs.append({"user_id": "u2", "date": "2026-01-09", "id": "other"})
+    collection = FakeCollection(docs)
+
+    async def walk():
+        seen, cursor, pages = [], None, 0
+        while True:
+            page, cursor = await server.fetch_page(collection, {"user_id": "u1"}, "date", 3, cursor)
+            seen.extend(doc["id"] for doc in page)
+            pages += 1
+            if not cursor:
+                return seen, pages
+
+    seen, pages = asyncio.run(walk())
+    assert seen == [f"{day}-{n}" for day in range(5, 0, -1) for n in "ba"]
+    assert pages == 4
+
+
+def test_fetch_page_keeps_legacy_string_rows_after_migrated_dates():
+    newest = datetime(2026, 2, 2, tzinfo=timezone.utc)
+    collection = FakeCollection([
+        {"user_id": "u1", "timestamp": newest, "id": "b"},
+        {"user_id": "u1", "timestamp": newest - timedelta(days=1), "id": "a"},
+        {"user_id": "u1", "timestamp": "2025-12-01T00:00:00", "id": "legacy"},
+    ])
+
+    first, cursor = asyncio.run(server.fetch_page(collection, {"user_id": "u1"}, "timestamp", 1, None))
+    rest, end = asyncio.run(server.fetch_page(collection, {"user_id": "u1"}, "timestamp", 5, cursor))
+
+    assert [doc["id"] for doc in first] == ["b"]
+    assert [doc["id"] for doc in rest] == ["a", "legacy"]
+    assert end is None
+
+
+def test_fetch_page_clamps_the_limit():
+    collection = FakeCollection([{"user_id": "u1", "date": "2026-01-01", "id": str(i)} for i in range(3)])
+    page, cursor = asyncio.run(server.fetch_page(collection, {"user_id": "u1"}, "date", 0, None))
+    assert len(page) == 1 and cursor
@@ -0,0 +1,58 @@
+import asyncio
+import threading
+
+import bcrypt
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+@pytest.fixture(autouse=True)
+def cheap_rounds(monkeypatch):
+    monkeypatch.setattr(server, "BCRYPT_ROUNDS", 4)
+
+
+def test_hash_and_verify_on_the_pool():
+    hasher = server.PasswordHasher(workers=2, max_queue=2)
+
+    async def run():
+        password_hash = await hasher.hash("correct horse")
+        return password_hash, await hasher.verify("correct horse", password_hash), await hasher.verify("wrong", password_hash)
+
+    try:
+        password_hash, good, bad = asyncio.run(run())
+    finally:
+        hasher.shutdown()
+    assert password_hash.startswith("$2b$04$")
+    assert good and not bad
+    assert hasher.in_flight == 0
+
+
+def test_needs_rehash_compares_the_cost_factor():
+    assert not server.password_needs_rehash(bcrypt.hashpw(b"pw", bcrypt.gensalt(rounds=4)).decode())
+    assert server.password_needs_rehash(bcrypt.hashpw(b"pw", bcrypt.gensalt(rounds=5)).decode())
+    assert not server.password_needs_rehash("not-a-bcrypt-hash")
+
+
+def test_requests_beyond_capacity_are_shed_with_503():
+    hasher = server.PasswordHasher(workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def run():
+        blocked = [asyncio.ensure_future(hasher._run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as error:
+            await hasher.hash("pw")
+        release.set()
+        await asyncio.gather(*blocked)
+        return error.value
+
+    try:
+        error = asyncio.run(run())
+    finally:
+        release.set()
+        hasher.shutdown()
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "1"
+    assert hasher.in_flight == 0
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+from starlette.requests import Request
+
+import server
+
+
+def make_request(headers=None, client=("10.0.0.5", 4321), identity=None):
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/api/mood/submit",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client": client,
+    }
+    request = Request(scope)
+    if identity:
+        request.state.identity = identity
+    return request
+
+
+def test_verified_identity_is_the_key():
+    request = make_request(identity={"sub": "user-1"})
+    assert server.rate_limit_key(request) == "user:user-1"
+
+
+def test_user_id_header_is_ignored(monkeypatch):
+    monkeypatch.setattr(server, "ALLOW_USER_ID_HEADER", True)
+    first = make_request(headers={"X-User-Id": "spoof-1"})
+    second = make_request(headers={"X-User-Id": "spoof-2"})
+    assert server.rate_limit_key(first) == server.rate_limit_key(second) == "ip:10.0.0.5"
+
+
+def test_forwarded_address_counts_trusted_hops_from_the_right(monkeypatch):
+    monkeypatch.setattr(server, "RATE_LIMIT_PROXY_HOPS", 1)
+    request = make_request(headers={"X-Forwarded-For": "6.6.6.6, 203.0.113.7"})
+    assert server.rate_limit_key(request) == "ip:203.0.113.7"
+
+    monkeypatch.setattr(server, "RATE_LIMIT_PROXY_HOPS", 2)
+    assert server.rate_limit_key(request) == "ip:6.6.6.6"
+
+
+def test_forwarded_header_ignored_without_proxy(monkeypatch):
+    monkeypatch.setattr(server, "RATE_LIMIT_PROXY_HOPS", 0)
+    request = make_request(headers={"X-Forwarded-For": "6.6.6.6"})
+    assert server.rate_limit_key(request) == "ip:10.0.0.5"
+
+
+def test_missing_forwarded_header_uses_peer(monkeypatch):
+    monkeypatch.setattr(server, "RATE_LIMIT_PROXY_HOPS", 1)
+    assert server.rate_limit_key(make_request()) == "ip:10.0.0.5"
+    assert server.rate_limit_key(make_request(client=None)) == "ip:unknown"
+
+
+def test_memory_store_limits_each_key():
+    store = server.MemoryRateLimitStore(rate=1, capacity=20, max_keys=10)
+
+    async def spend():
+        return [await store.consume("ip:a", 10) for _ in range(3)], await store.consume("ip:b", 10)
+
+    results, other = asyncio.run(spend())
+    assert results[:2] == [0.0, 0.0]
+    assert results[2] == pytest.approx(10, abs=0.1)
+    assert other == 0.0
+
+
+def test_memory_store_evicts_least_recent_key():
+    store = server.MemoryRateLimitStore(rate=1, capacity=10, max_keys=2)
+
+    async def spend():
+        for key in ("a", "b", "a", "c"):
+            await store.consume(key, 1)
+
+    asyncio.run(spend())
+    assert list(store.buckets) == ["a", "c"]
+
+
+def test_default_costs_allow_a_burst_of_check_ins():
+    cost, uses_llm = server.ROUTE_COSTS["POST /api/mood/submit"]
+    assert uses_llm
+    assert server.RATE_LIMIT_BURST // cost >= 20
+    assert server.ROUTE_COSTS["POST /api/mood/submit/batch"][0] == cost
+
+
+def test_charge_rate_limit_raises_429(monkeypatch):
+    monkeypatch.setattr(server, "RATE_LIMIT_ENABLED", True)
+    store = server.MemoryRateLimitStore(rate=1, capacity=30, max_keys=10)
+    monkeypatch.setattr(server.admission, "store", store)
+    request = make_request(identity={"sub": "user-1"})
+
+    async def charge():
+        await server.charge_rate_limit(request, 20)
+        await server.charge_rate_limit(request, 20)
+
+    with pytest.raises(server.HTTPException) as raised:
+        asyncio.run(charge())
+    assert raised.value.status_code == 429
+    assert int(raised.value.headers["Retry-After"]) >= 1
@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+import server
+
+
+class Source:
+    """compute() stand-in that counts calls and waits until released"""
+
+    def __init__(self):
+        self.calls = 0
+        self.value = "v1"
+        self.release = None
+
+    async def __call__(self):
+        self.calls += 1
+        value = self.value
+        if self.release is not None:
+            await self.release.wait()
+        return value
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_concurrent_identical_reads_share_one_computation():
+    coalescer = server.ReadCoalescer(ttl_seconds=0, max_entries=10)
+    source = Source()
+
+    async def scenario():
+        source.release = asyncio.Event()
+        readers = [asyncio.create_task(coalescer.run("history", "u1", (30,), source)) for _ in range(5)]
+        await asyncio.sleep(0)
+        source.release.set()
+        return await asyncio.gather(*readers)
+
+    assert run(scenario()) == ["v1"] * 5
+    assert source.calls == 1
+    assert coalescer.stats["joins"] == 4
+
+
+def test_different_params_do_not_share():
+    coalescer = server.ReadCoalescer(ttl_seconds=0, max_entries=10)
+    source = Source()
+
+    async def scenario():
+        await asyncio.gather(coalescer.run("history", "u1", (10,), source), coalescer.run("history", "u1", (30,), source))
+
+    run(scenario())
+    assert source.calls == 2
+
+
+def test_ttl_cache_is_dropped_by_a_write():
+    coalescer = server.ReadCoalescer(ttl_seconds=60, max_entries=10)
+    source = Source()
+
+    async def scenario():
+        first = await coalescer.run("history", "u1", (), source)
+        source.value = "v2"
+        cached = await coalescer.run("history", "u1", (), source)
+        coalescer.invalidate("u1")
+        fresh = await coalescer.run("history", "u1", (), source)
+        return first, cached, fresh
+
+    assert run(scenario()) == ("v1", "v1", "v2")
+    assert source.calls == 2
+
+
+def test_read_started_before_a_write_is_not_cached_or_joined():
+    coalescer = server.ReadCoalescer(ttl_seconds=60, max_entries=10)
+    source = Source()
+
+    async def scenario():
+        source.release = asyncio.Event()
+        stale = asyncio.create_task(coalescer.run("history", "u1", (), source))
+        await asyncio.sleep(0)
+        coalescer.invalidate("u1")
+        source.value = "v2"
+        fresh = asyncio.create_task(coalescer.run("history", "u1", (), source))
+        await asyncio.sleep(0)
+        source.release.set()
+        return await stale, await fresh, await coalescer.run("history", "u1", (), source)
+
+    assert run(scenario()) == ("v1", "v2", "v2")
+    assert source.calls == 2
+
+
+def test_generations_are_pruned_once_nothing_references_the_user():
+    coalescer = server.ReadCoalescer(ttl_seconds=0, max_entries=10)
+    source = Source()
+
+    async def scenario():
+        for index in range(100):
+            coalescer.invalidate(f"writer-{index}")
+        await coalescer.run("history", "u1", (), source)
+        source.release = asyncio.Event()
+        pending = asyncio.create_task(coalescer.run("history", "u1", (), source))
+        await asyncio.sleep(0)
+        coalescer.invalidate("u1")
+        assert coalescer.generations == {"u1": 1}
+        source.release.set()
+        await pending
+
+    run(scenario())
+    assert coalescer.generations == {}
+    assert coalescer.references == {}
+
+
+def test_cached_entries_are_bounded_and_release_their_user():
+    coalescer = server.ReadCoalescer(ttl_seconds=60, max_entries=2)
+    source = Source()
+
+    async def scenario():
+        for user in ("a", "b", "c"):
+            await coalescer.run("history", user, (), source)
+
+    run(scenario())
+    assert [key[1] for key in coalescer.entries] == ["b", "c"]
+    assert coalescer.references == {"b": 1, "c": 1}
+
+
+def test_failure_is_shared_and_not_cached():
+    coalescer = server.ReadCoalescer(ttl_seconds=60, max_entries=10)
+
+    async def failing():
+        raise RuntimeError("mongo down")
+
+    with pytest.raises(RuntimeError):
+        run(coalescer.run("history", "u1", (), failing))
+    assert coalescer.entries == {}
+    assert coalescer.references == {}
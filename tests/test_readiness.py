@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+import server
+
+
+@pytest.fixture
+def readiness(monkeypatch):
+    readiness = server.StartupReadiness(("database", "llm_client"))
+    monkeypatch.setattr(server, "readiness", readiness)
+    monkeypatch.setattr(server, "LLM_IMPORT_RETRY_SECONDS", 0.01)
+    return readiness
+
+
+def test_steps_gate_readiness(readiness):
+    assert not readiness.ready
+    readiness.mark("database")
+    readiness.mark("llm_client")
+    assert readiness.ready and not readiness.degraded
+
+
+def test_failed_step_is_not_ready(readiness):
+    readiness.mark("database", RuntimeError("no indexes"))
+    readiness.mark("llm_client")
+    assert not readiness.ready and readiness.failed
+
+
+def test_llm_import_is_retried_and_degraded_meanwhile(monkeypatch, readiness):
+    attempts = []
+    observed = []
+
+    async def flaky_import():
+        attempts.append(len(attempts))
+        observed.append(dict(readiness.steps))
+        if len(attempts) < 3:
+            raise ImportError("emergentintegrations is not installed")
+
+    monkeypatch.setattr(server, "ensure_llm_client", flaky_import)
+    readiness.mark("database")
+    asyncio.run(asyncio.wait_for(server.prewarm_llm_client(), timeout=2))
+
+    assert len(attempts) == 3
+    assert observed[1]["llm_client"] == "degraded"
+    assert readiness.steps["llm_client"] == "ready"
+    assert readiness.errors == {}
+
+
+def test_degraded_step_still_counts_as_ready(readiness):
+    readiness.mark("database")
+    readiness.mark("llm_client", ImportError("missing"), degraded=True)
+    assert readiness.ready and readiness.degraded and not readiness.failed
+    assert readiness.snapshot()["errors"] == {"llm_client": "missing"}
@@ -0,0 +1,151 @@
+import asyncio
+
+import httpx
+import pytest
+
+import server
+from tests.fakes import FakeCollection, FakeDatabase
+
+
+@pytest.fixture
+def token():
+    token, payload = server.issue_session_token("user-1", "Ada")
+    return token, payload
+
+
+def test_round_trip(token):
+    token, payload = token
+    decoded = server.decode_session_token(token)
+    assert decoded == payload
+    assert decoded["sub"] == "user-1" and decoded["name"] == "Ada"
+
+
+def test_tampered_payload_is_rejected(token):
+    token, _ = token
+    forged_body = server._b64encode(b'{"sub":"admin","sid":"x","exp":9999999999}')
+    assert server.decode_session_token(f"{forged_body}.{token.split('.')[1]}") is None
+
+
+def test_tampered_signature_is_rejected(token):
+    token, _ = token
+    body, signature = token.split(".")
+    flipped = ("A" if signature[0] != "A" else "B") + signature[1:]
+    assert server.decode_session_token(f"{body}.{flipped}") is None
+
+
+def test_other_secret_is_rejected(monkeypatch, token):
+    token, _ = token
+    monkeypatch.setattr(server, "SESSION_SECRET", "another-secret")
+    assert server.decode_session_token(token) is None
+
+
+def test_expired_token_is_rejected(monkeypatch):
+    monkeypatch.setattr(server, "SESSION_TTL_SECONDS", -1)
+    token, _ = server.issue_session_token("user-1", "Ada")
+    assert server.decode_session_token(token) is None
+
+
+@pytest.mark.parametrize("value", ["", ".", "abc", "abc.", ".abc", "é.x", "abc.é", "!!!.###", "a.b.c"])
+def test_malformed_token_is_rejected(value):
+    assert server.decode_session_token(value) is None
+
+
+def test_signed_body_that_is_not_json_is_rejected():
+    body = server._b64encode(b"\xff\xfenot json")
+    assert server.decode_session_token(f"{body}.{server._sign(body)}") is None
+
+
+def test_identity_cache_requires_a_live_session(monkeypatch, token):
+    token, payload = token
+    cache = server.IdentityCache(max_entries=10, ttl_seconds=60)
+    monkeypatch.setattr(server, "db", FakeDatabase(sessions=FakeCollection()))
+    assert asyncio.run(cache.verify(token)) is None
+
+    monkeypatch.setattr(server, "db", FakeDatabase(sessions=FakeCollection([{"_id": payload["sid"]}])))
+    assert asyncio.run(cache.verify(token)) == payload
+    assert asyncio.run(cache.verify(token)) == payload
+    assert cache.stats["hits"] == 1
+
+
+def test_identity_cache_revocation(monkeypatch, token):
+    token, payload = token
+    cache = server.IdentityCache(max_entries=10, ttl_seconds=60)
+    monkeypatch.setattr(server, "db", FakeDatabase(sessions=FakeCollection([{"_id": payload["sid"]}])))
+    assert asyncio.run(cache.verify(token)) == payload
+
+    cache.revoke_user("user-1")
+    assert asyncio.run(cache.verify(token)) is None
+    assert payload["sid"] in cache.revoked
+
+
+def test_identity_cache_is_bounded(monkeypatch):
+    tokens = [server.issue_session_token(f"user-{i}", None) for i in range(3)]
+    sessions = FakeCollection([{"_id": payload["sid"]} for _, payload in tokens])
+    monkeypatch.setattr(server, "db", FakeDatabase(sessions=sessions))
+    cache = server.IdentityCache(max_entries=2, ttl_seconds=60)
+    for token, _ in tokens:
+        asyncio.run(cache.verify(token))
+    assert list(cache.entries) == [tokens[1][0], tokens[2][0]]
+
+
+def request(method, path, token, headers=None):
+    headers = dict(headers or {})
+    if token:
+        headers["Authorization"] = f"Bearer {token}".encode("utf-8")
+
+    async def send():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, path, headers=headers)
+    return asyncio.run(send())
+
+
+def test_middleware_rejects_bad_tokens_with_401(monkeypatch):
+    monkeypatch.setattr(server, "db", FakeDatabase())
+    for value in ("é.x", "abc.é", "garbage"):
+        response = request("GET", "/api/auth/session", value)
+        assert response.status_code == 401
+        assert response.headers["WWW-Authenticate"] == "Bearer"
+
+
+def test_revoked_token_can_still_poll_its_deletion_job(monkeypatch, token):
+    token, payload = token
+    job = {"_id": "user-1", "status": "running", "deleted": {}}
+    monkeypatch.setattr(server, "db", FakeDatabase(deletion_jobs=FakeCollection([job])))
+    monkeypatch.setattr(server, "identity_cache", server.IdentityCache(max_entries=10, ttl_seconds=60))
+
+    assert request("GET", "/api/auth/session", token).status_code == 401
+    response = request("GET", "/api/user/data/deletion", token)
+    assert response.status_code == 200
+    assert response.json()["status"] == "running"
+
+
+def mood_entry(user_id, entry_id):
+    return {
+        "id": entry_id, "user_id": user_id, "emotion": "Calm", "emotion_level": 5, "energy_level": 5,
+        "focus_level": 5, "trigger": "work", "timestamp": "2026-01-01T00:00:00", "ai_guidance": ""
+    }
+
+
+@pytest.mark.parametrize("path", [
+    "/api/mood/history", "/api/mood/trends", "/api/mood/trends?granularity=day", "/api/lifestyle/history",
+    "/api/lifestyle/weekly-report", "/api/gratitude/entries", "/api/mood/trigger-insights", "/api/mood/trigger-heatmap",
+])
+def test_reads_without_a_session_are_rejected_not_unscoped(monkeypatch, path):
+    entries = FakeCollection([mood_entry("alice", "a1"), mood_entry("bob", "b1")])
+    monkeypatch.setattr(server, "db", FakeDatabase(mood_entries=entries))
+    monkeypatch.setattr(server, "analytics_db", server.db)
+    assert request("GET", path, None).status_code == 401
+    assert request("GET", path, None, {"X-User-Id": "alice"}).status_code == 401
+
+
+def test_history_only_returns_the_callers_entries(monkeypatch, token):
+    token, payload = token
+    entries = FakeCollection([mood_entry("user-1", "mine"), mood_entry("bob", "theirs")])
+    sessions = FakeCollection([{"_id": payload["sid"]}])
+    monkeypatch.setattr(server, "db", FakeDatabase(mood_entries=entries, sessions=sessions))
+    monkeypatch.setattr(server, "identity_cache", server.IdentityCache(max_entries=10, ttl_seconds=60))
+
+    response = request("GET", "/api/mood/history", token)
+    assert response.status_code == 200
+    assert [entry["id"] for entry in response.json()] == ["mine"]
@@ -0,0 +1,40 @@
+from datetime import datetime, timezone
+
+import server
+
+
+def entry(trigger, timestamp, emotion="Anxious"):
+    return {"trigger": trigger, "emotion": emotion, "timestamp": timestamp}
+
+
+def updates_by_term(docs):
+    return {
+        (update._filter["kind"], update._filter["term"]): update._doc
+        for update in server.trigger_index_updates("u1", docs)
+    }
+
+
+def test_triggers_are_normalized_before_indexing():
+    assert server.normalize_trigger("  Work   DEADLINE!! ") == "work deadline"
+    assert server.trigger_words("work deadline at the office") == ["deadline", "office", "work"]
+
+
+def test_phrase_and_word_updates_are_merged_per_term():
+    updates = updates_by_term([
+        entry("Work deadline", "2026-01-01T09:00:00"),
+        entry("work", "2026-01-03T09:00:00", emotion="Tired"),
+    ])
+    assert updates[(server.TRIGGER_WORD, "work")]["$inc"] == {"count": 2, "emotions.Anxious": 1, "emotions.Tired": 1}
+    assert updates[(server.TRIGGER_WORD, "work")]["$max"]["last_seen"] == datetime(2026, 1, 3, 9, tzinfo=timezone.utc)
+    assert updates[(server.TRIGGER_PHRASE, "work deadline")]["$inc"]["count"] == 1
+
+
+def test_entries_without_a_timestamp_count_but_do_not_move_last_seen():
+    updates = updates_by_term([entry("family", None), entry("family", "not a date"), entry("family", "2026-02-01T00:00:00")])
+    family = updates[(server.TRIGGER_PHRASE, "family")]
+    assert family["$inc"]["count"] == 3
+    assert family["$max"] == {"last_seen": datetime(2026, 2, 1, tzinfo=timezone.utc)}
+
+    legacy_only = updates_by_term([entry("traffic", None)])[(server.TRIGGER_PHRASE, "traffic")]
+    assert legacy_only["$inc"]["count"] == 1
+    assert "$max" not in legacy_only
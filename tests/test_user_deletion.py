@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+import server
+from tests.fakes import FakeCollection, FakeDatabase
+
+
+class RecordingBucket(server.TokenBucket):
+    def __init__(self):
+        super().__init__(rate=1000, capacity=1000)
+        self.acquired = []
+
+    async def acquire(self, amount: float = 1):
+        self.acquired.append(amount)
+        await super().acquire(amount)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase(
+        users=FakeCollection([{"_id": "doc-u1", "id": "u1"}, {"_id": "doc-u2", "id": "u2"}]),
+        mood_entries=FakeCollection(
+            [{"_id": f"m{i}", "user_id": "u1"} for i in range(7)] + [{"_id": "m-other", "user_id": "u2"}]
+        ),
+        gratitude_entries=FakeCollection([{"_id": "g1", "user_id": "u1"}]),
+    )
+    monkeypatch.setattr(server, "db", database)
+    return database
+
+
+def run_job(jobs, user_id):
+    async def run():
+        await jobs.submit(user_id)
+        await jobs._run(user_id)
+    asyncio.run(run())
+
+
+def test_purges_every_collection_in_batches(database):
+    throttle = RecordingBucket()
+    jobs = server.UserDeletionJobs(workers=1, batch_size=3, throttle=throttle)
+    run_job(jobs, "u1")
+
+    assert [doc["_id"] for doc in database.mood_entries.docs] == ["m-other"]
+    assert database.gratitude_entries.docs == []
+    assert [doc["id"] for doc in database.users.docs] == ["u2"]
+
+    job = database.deletion_jobs.docs[0]
+    assert job["status"] == "complete"
+    assert job["deleted"] == {"mood_entries": 7, "gratitude_entries": 1, "users": 1}
+    assert len([call for call in database.mood_entries.calls if call[0] == "delete_many"]) == 3
+
+
+def test_throttle_charges_only_deleted_documents(database):
+    throttle = RecordingBucket()
+    jobs = server.UserDeletionJobs(workers=1, batch_size=500, throttle=throttle)
+    run_job(jobs, "u1")
+
+    assert sum(throttle.acquired) == 7 + 1 + 1
+    assert all(amount > 0 for amount in throttle.acquired)
+
+
+def test_small_purge_is_not_charged_whole_batches(database):
+    # One document per second: charging whole batches would stall for minutes
+    throttle = server.TokenBucket(rate=1, capacity=500)
+    throttle.tokens = 500
+    jobs = server.UserDeletionJobs(workers=1, batch_size=500, throttle=throttle)
+    database.mood_entries.docs = database.mood_entries.docs[:1]
+
+    async def run():
+        await jobs.submit("u1")
+        await asyncio.wait_for(jobs._run("u1"), timeout=2)
+    asyncio.run(run())
+    assert database.deletion_jobs.docs[0]["status"] == "complete"
+
+
+def test_submit_returns_the_active_job(database):
+    jobs = server.UserDeletionJobs(workers=1, batch_size=10, throttle=RecordingBucket())
+
+    async def submit_twice():
+        first = await jobs.submit("u1")
+        second = await jobs.submit("u1")
+        return first, second
+    first, second = asyncio.run(submit_twice())
+    assert first["status"] == second["status"] == "queued"
+    assert jobs.queue.qsize() == 1
@@ -0,0 +1,184 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from pymongo import WriteConcern
+from pymongo.errors import BulkWriteError
+
+import server
+from tests.fakes import FakeCollection, FakeDatabase
+
+
+class FailingCollection(FakeCollection):
+    def __init__(self, error):
+        super().__init__()
+        self.error = error
+
+    async def insert_many(self, docs, ordered=True):
+        raise self.error
+
+
+@pytest.fixture
+def fake_db(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(server, "db", database)
+    monkeypatch.setattr(server, "WRITE_BUFFER_ACK", "flush")
+    return database
+
+
+def make_buffer(**overrides):
+    options = {"flushers": 1, "queue_size": 100, "max_batch": 10, "max_delay": 0.05, "write_concern": WriteConcern()}
+    options.update(overrides)
+    return server.WriteBuffer(**options)
+
+
+def test_concurrent_inserts_share_insert_many_batches(fake_db):
+    buffer = make_buffer()
+
+    async def run():
+        await buffer.start()
+        await asyncio.gather(*(buffer.insert("mood_entries", {"id": str(i)}, "u1") for i in range(25)))
+        await buffer.stop()
+
+    asyncio.run(run())
+    entries = fake_db.mood_entries
+    assert sorted(doc["id"] for doc in entries.docs) == sorted(str(i) for i in range(25))
+    assert [size for call, size in entries.calls if call == "insert_many"] == [10, 10, 5]
+    assert buffer.stats["batches"] == 3 and buffer.stats["inserted"] == 25
+    assert fake_db.user_versions.docs[0]["_id"] == "u1"
+
+
+def test_inserts_write_directly_when_the_buffer_is_stopped(fake_db):
+    buffer = make_buffer()
+    asyncio.run(buffer.insert("gratitude_entries", {"id": "g1"}))
+    assert fake_db.gratitude_entries.docs == [{"id": "g1"}]
+    assert buffer.stats["queued"] == 0
+
+
+def test_flush_ack_surfaces_write_errors(fake_db):
+    fake_db.collections["mood_entries"] = FailingCollection(RuntimeError("primary stepped down"))
+    buffer = make_buffer()
+
+    async def run():
+        await buffer.start()
+        try:
+            await buffer.insert("mood_entries", {"id": "m1"})
+        finally:
+            await buffer.stop()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
+    assert buffer.stats["failed"] == 1
+
+
+def test_bulk_write_errors_fail_only_the_affected_documents(fake_db):
+    error = BulkWriteError({"writeErrors": [{"index": 1, "errmsg": "duplicate key"}]})
+    fake_db.collections["mood_entries"] = FailingCollection(error)
+    buffer = make_buffer()
+
+    async def run():
+        await buffer.start()
+        results = await asyncio.gather(
+            *(buffer.insert("mood_entries", {"id": str(i)}) for i in range(3)), return_exceptions=True
+        )
+        await buffer.stop()
+        return results
+
+    results = asyncio.run(run())
+    assert results[0] is None and results[2] is None
+    assert str(results[1]) == "duplicate key"
+    assert buffer.stats["inserted"] == 2 and buffer.stats["failed"] == 1
+
+
+def test_enqueue_ack_returns_before_the_write_and_stop_drains(fake_db, monkeypatch):
+    monkeypatch.setattr(server, "WRITE_BUFFER_ACK", "enqueue")
+    buffer = make_buffer(max_delay=10)
+
+    async def run():
+        await buffer.start()
+        for i in range(3):
+            await buffer.insert("lifestyle_assessments", {"id": str(i)})
+        written_before_stop = len(fake_db.lifestyle_assessments.docs)
+        await buffer.stop()
+        return written_before_stop
+
+    assert asyncio.run(run()) == 0
+    assert len(fake_db.lifestyle_assessments.docs) == 3
+    assert not buffer.running
+
+
+def test_full_queue_sheds_writers_with_503(fake_db, monkeypatch):
+    monkeypatch.setattr(server, "WRITE_BUFFER_ACK", "enqueue")
+    monkeypatch.setattr(server, "WRITE_BUFFER_ENQUEUE_TIMEOUT_SECONDS", 0.01)
+    buffer = make_buffer(queue_size=1)
+
+    async def run():
+        # Pretend to be running without a flusher so the queue never drains
+        buffer.flushers = [asyncio.ensure_future(asyncio.sleep(0))]
+        await buffer.insert("mood_entries", {"id": "1"})
+        with pytest.raises(HTTPException) as error:
+            await buffer.insert("mood_entries", {"id": "2"})
+        return error.value
+
+    error = asyncio.run(run())
+    assert error.status_code == 503
+    assert buffer.stats["rejected"] == 1
+
+
+def test_write_concern_comes_from_the_environment(monkeypatch):
+    monkeypatch.setattr(server, "WRITE_BUFFER_W", "majority")
+    monkeypatch.setattr(server, "WRITE_BUFFER_JOURNAL", "true")
+    monkeypatch.setattr(server, "WRITE_BUFFER_WTIMEOUT_MS", "500")
+    assert server.write_buffer_concern().document == {"w": "majority", "j": True, "wtimeout": 500}
+
+    monkeypatch.setattr(server, "WRITE_BUFFER_W", "2")
+    monkeypatch.setattr(server, "WRITE_BUFFER_JOURNAL", "")
+    monkeypatch.setattr(server, "WRITE_BUFFER_WTIMEOUT_MS", "")
+    assert server.write_buffer_concern().document == {"w": 2}
+
+
+def recorded_side_effects(monkeypatch):
+    calls = []
+
+    async def record_rollups(user_id, docs):
+        calls.append(("rollups", user_id, [doc["id"] for doc in docs]))
+
+    async def record_user_write(user_id):
+        calls.append(("version", user_id))
+
+    monkeypatch.setattr(server, "WRITE_BUFFER_SIDE_EFFECTS", {"mood_entries": (record_rollups,)})
+    monkeypatch.setattr(server, "record_user_write", record_user_write)
+    return calls
+
+
+@pytest.mark.parametrize("running", [True, False])
+def test_side_effects_run_once_per_user_after_the_write(fake_db, monkeypatch, running):
+    calls = recorded_side_effects(monkeypatch)
+    buffer = make_buffer()
+
+    async def run():
+        if running:
+            await buffer.start()
+        await asyncio.gather(buffer.insert("mood_entries", {"id": "1"}, "u1"), buffer.insert("gratitude_entries", {"id": "2"}, "u1"))
+        await buffer.stop()
+
+    asyncio.run(run())
+    assert sorted(calls) == [("rollups", "u1", ["1"]), ("version", "u1"), ("version", "u1")]
+
+
+def test_failed_flush_applies_no_side_effects(fake_db, monkeypatch):
+    monkeypatch.setattr(server, "WRITE_BUFFER_ACK", "enqueue")
+    calls = recorded_side_effects(monkeypatch)
+    error = BulkWriteError({"writeErrors": [{"index": 0, "errmsg": "duplicate key"}]})
+    fake_db.collections["mood_entries"] = FailingCollection(error)
+    buffer = make_buffer()
+
+    async def run():
+        await buffer.start()
+        await buffer.insert("mood_entries", {"id": "dup"}, "u1")
+        await buffer.insert("mood_entries", {"id": "ok"}, "u1")
+        await buffer.stop()
+
+    asyncio.run(run())
+    assert ("rollups", "u1", ["ok"]) in calls
+    assert not any(call[0] == "rollups" and "dup" in call[2] for call in calls)